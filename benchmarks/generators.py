@@ -0,0 +1,229 @@
+"""
+Synthetic rule sets and facts for the benchmarks.
+
+A fact is a dict holding a value for every variable of the Variables class
+built by make_variables_class. Rules are generated from the same description,
+so every generated rule is valid for the generated classes.
+"""
+
+import random
+from datetime import datetime, timedelta
+
+from business_rules.actions import BaseActions, rule_action
+from business_rules.fields import FIELD_NUMERIC
+from business_rules.variables import (
+    BaseVariables,
+    boolean_rule_variable,
+    datetime_rule_variable,
+    numeric_rule_variable,
+    select_multiple_rule_variable,
+    select_rule_variable,
+    string_rule_variable,
+    time_rule_variable,
+)
+
+# field type -> (decorator, operators used in generated conditions)
+FIELD_TYPES = {
+    "numeric": (
+        numeric_rule_variable,
+        [
+            "equal_to",
+            "greater_than",
+            "greater_than_or_equal_to",
+            "less_than",
+            "less_than_or_equal_to",
+        ],
+    ),
+    "string": (
+        string_rule_variable,
+        [
+            "equal_to",
+            "equal_to_case_insensitive",
+            "starts_with",
+            "contains",
+            "non_empty",
+        ],
+    ),
+    "boolean": (boolean_rule_variable, ["is_true", "is_false"]),
+    "select": (select_rule_variable, ["contains", "does_not_contain"]),
+    "select_multiple": (
+        select_multiple_rule_variable,
+        ["contains_all", "shares_at_least_one_element_with", "shares_no_elements_with"],
+    ),
+    "datetime": (datetime_rule_variable, ["after_than", "before_than_or_equal_to"]),
+    "time": (time_rule_variable, ["after_than", "before_than"]),
+}
+
+DEFAULT_OPERATOR_MIX = {
+    "numeric": 5,
+    "string": 2,
+    "boolean": 1,
+    "select": 1,
+    "select_multiple": 1,
+    "datetime": 1,
+    "time": 1,
+}
+
+WORDS = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "eta", "theta"]
+EPOCH = datetime(2024, 1, 1)
+
+
+class SyntheticActions(BaseActions):
+    def __init__(self, fact=None):
+        self.fact = fact
+        self.calls = 0
+
+    @rule_action(params={"amount": FIELD_NUMERIC})
+    def record(self, amount):
+        self.calls += 1
+
+    @rule_action()
+    def flag(self):
+        self.calls += 1
+
+
+def make_variables_class(variables_per_type=2, variable_cost=0):
+    """
+    Builds a Variables class with `variables_per_type` variables of each field type.
+    :param variables_per_type: Number of variables of each field type
+    :param variable_cost: Iterations of busy work done each time a variable is computed
+    :return: BaseVariables subclass taking a fact dict
+    """
+    attributes = {"__init__": _init_variables, "variable_cost": variable_cost}
+    for field_type, (decorator, _) in FIELD_TYPES.items():
+        for i in range(variables_per_type):
+            name = variable_name(field_type, i)
+            attributes[name] = decorator()(_make_variable(name))
+    return type("SyntheticVariables", (BaseVariables,), attributes)
+
+
+def variable_name(field_type, i):
+    return "{0}_{1}".format(field_type, i)
+
+
+def _init_variables(self, fact):
+    self.fact = fact
+
+
+def _make_variable(name):
+    def variable(self):
+        for _ in range(self.variable_cost):
+            pass
+        return self.fact[name]
+
+    variable.__name__ = name
+    return variable
+
+
+def generate_fact(rng, variables_per_type=2):
+    fact = {}
+    for i in range(variables_per_type):
+        fact[variable_name("numeric", i)] = rng.randint(0, 100)
+        fact[variable_name("string", i)] = rng.choice(WORDS)
+        fact[variable_name("boolean", i)] = rng.random() < 0.5
+        fact[variable_name("select", i)] = rng.sample(WORDS, 3)
+        fact[variable_name("select_multiple", i)] = rng.sample(WORDS, 3)
+        fact[variable_name("datetime", i)] = EPOCH + timedelta(days=rng.randint(0, 365))
+        fact[variable_name("time", i)] = "{0:02d}:{1:02d}:00".format(
+            rng.randint(0, 23), rng.randint(0, 59)
+        )
+    return fact
+
+
+def generate_facts(count, variables_per_type=2, seed=0):
+    rng = random.Random(seed)
+    return [generate_fact(rng, variables_per_type) for _ in range(count)]
+
+
+def generate_condition(rng, operator_mix, variables_per_type):
+    field_types = list(operator_mix)
+    field_type = rng.choices(
+        field_types, weights=[operator_mix[t] for t in field_types]
+    )[0]
+    operator = rng.choice(FIELD_TYPES[field_type][1])
+    name = variable_name(field_type, rng.randrange(variables_per_type))
+    return {
+        "name": name,
+        "operator": operator,
+        "value": _condition_value(rng, field_type),
+    }
+
+
+def _condition_value(rng, field_type):
+    if field_type == "numeric":
+        return rng.randint(0, 100)
+    if field_type == "string":
+        return rng.choice(WORDS)[: rng.randint(1, 5)]
+    if field_type == "boolean":
+        return ""
+    if field_type == "select":
+        return rng.choice(WORDS)
+    if field_type == "select_multiple":
+        return rng.sample(WORDS, 2)
+    if field_type == "datetime":
+        return (EPOCH + timedelta(days=rng.randint(0, 365))).strftime("%Y-%m-%d")
+    return "{0:02d}:00:00".format(rng.randint(0, 23))
+
+
+def generate_conditions(rng, depth, operator_mix, variables_per_type, width=3):
+    if depth <= 0:
+        return generate_condition(rng, operator_mix, variables_per_type)
+    return {
+        rng.choice(["all", "any"]): [
+            generate_conditions(rng, depth - 1, operator_mix, variables_per_type, width)
+            for _ in range(rng.randint(1, width))
+        ]
+    }
+
+
+def generate_rules(
+    rule_count,
+    depth=2,
+    operator_mix=None,
+    variables_per_type=2,
+    width=3,
+    seed=0,
+    trigger_rate=None,
+):
+    """
+    Generates `rule_count` random rules.
+    :param rule_count: Number of rules
+    :param depth: Nesting depth of all/any groups, 0 for rules with a single condition
+    :param operator_mix: Relative weight of each field type among the conditions,
+                         defaults to DEFAULT_OPERATOR_MIX
+    :param variables_per_type: Number of variables of each field type to pick from
+    :param width: Maximum number of children in a group
+    :param seed: Seed of the random generator
+    :param trigger_rate: If set, rules are single numeric thresholds that a
+                         uniform random fact passes with this probability
+    :return: List of rules
+    """
+    rng = random.Random(seed)
+    operator_mix = operator_mix or DEFAULT_OPERATOR_MIX
+    if trigger_rate is not None:
+        return [
+            _threshold_rule(rng, variables_per_type, trigger_rate)
+            for _ in range(rule_count)
+        ]
+
+    return [
+        {
+            "conditions": generate_conditions(
+                rng, depth, operator_mix, variables_per_type, width
+            ),
+            "actions": [{"name": "record", "params": {"amount": rng.randint(1, 10)}}],
+        }
+        for _ in range(rule_count)
+    ]
+
+
+def _threshold_rule(rng, variables_per_type, trigger_rate):
+    # Numeric values of facts are uniform in [0, 100]
+    return {
+        "conditions": {
+            "name": variable_name("numeric", rng.randrange(variables_per_type)),
+            "operator": "greater_than_or_equal_to",
+            "value": int(100 * (1 - trigger_rate)),
+        },
+        "actions": [{"name": "flag"}],
+    }
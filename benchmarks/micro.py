@@ -0,0 +1,169 @@
+"""
+Microbenchmarks. Each benchmark is a setup function registered under a name,
+returning the callable to time.
+"""
+
+from datetime import datetime, time
+
+from business_rules import engine, utils
+from business_rules.bitset import BitsetRuleSet
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.operators import (
+    BooleanType,
+    DateTimeType,
+    NumericType,
+    SelectMultipleType,
+    SelectType,
+    StringType,
+    TimeType,
+)
+
+from .generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def wrapper(setup):
+        BENCHMARKS[name] = setup
+        return setup
+
+    return wrapper
+
+
+# field type -> (variable value, comparison value for operators taking one)
+OPERATOR_VALUES = {
+    NumericType: (42, 41.5),
+    StringType: ("Hello World", "hello"),
+    BooleanType: (True, None),
+    SelectType: (["alpha", "beta", "gamma"], "Gamma"),
+    SelectMultipleType: (["alpha", "beta", "gamma"], ["beta", "delta"]),
+    DateTimeType: (datetime(2024, 6, 1, 12, 0), "2024-05-01"),
+    TimeType: (time(12, 30), "10:00"),
+}
+
+
+def _register_operator_benchmarks():
+    for field_type, (value, other) in OPERATOR_VALUES.items():
+        for operator in field_type.get_all_operators():
+            name = "operators.{0}.{1}".format(field_type.name, operator["name"])
+            BENCHMARKS[name] = _operator_setup(field_type, operator, value, other)
+
+        BENCHMARKS["cast.{0}".format(field_type.name)] = _cast_setup(field_type, value)
+
+
+def _operator_setup(field_type, operator, value, other):
+    def setup():
+        method = getattr(field_type(value), operator["name"])
+        if operator["input_type"] == "none":
+            return method
+        if operator["name"] == "matches_regex":
+            return lambda: method("^Hello")
+        return lambda: method(other)
+
+    return setup
+
+
+def _cast_setup(field_type, value):
+    def setup():
+        return lambda: field_type(value)
+
+    return setup
+
+
+_register_operator_benchmarks()
+
+
+def _rule_set(rule_count=100, depth=2):
+    variables_class = make_variables_class()
+    rules = generate_rules(rule_count, depth=depth)
+    fact = generate_facts(1)[0]
+    return variables_class, rules, fact
+
+
+@benchmark("engine.run_all")
+def run_all_setup():
+    variables_class, rules, fact = _rule_set()
+    defined_variables = variables_class(fact)
+    defined_actions = SyntheticActions(fact)
+    return lambda: engine.run_all(rules, defined_variables, defined_actions)
+
+
+@benchmark("engine.run_all_stop_on_first_trigger")
+def run_all_stop_on_first_trigger_setup():
+    variables_class, rules, fact = _rule_set()
+    defined_variables = variables_class(fact)
+    defined_actions = SyntheticActions(fact)
+    return lambda: engine.run_all(
+        rules, defined_variables, defined_actions, stop_on_first_trigger=True
+    )
+
+
+@benchmark("compiled.run_all")
+def compiled_run_all_setup():
+    variables_class, rules, fact = _rule_set()
+    rule_set = compile_rules(rules, variables_class, SyntheticActions)
+    defined_variables = variables_class(fact)
+    defined_actions = SyntheticActions(fact)
+    return lambda: rule_set.run_all(defined_variables, defined_actions)
+
+
+@benchmark("bitset.run_all")
+def bitset_run_all_setup():
+    variables_class, rules, fact = _rule_set()
+    bitset_rules = BitsetRuleSet(
+        compile_rules(rules, variables_class, SyntheticActions)
+    )
+    defined_variables = variables_class(fact)
+    defined_actions = SyntheticActions(fact)
+    return lambda: bitset_rules.run_all(defined_variables, defined_actions)
+
+
+@benchmark("codegen.run_all")
+def codegen_run_all_setup():
+    variables_class, rules, fact = _rule_set()
+    codegen_rules = CodegenRuleSet(
+        compile_rules(rules, variables_class, SyntheticActions)
+    )
+    defined_variables = variables_class(fact)
+    defined_actions = SyntheticActions(fact)
+    return lambda: codegen_rules.run_all(defined_variables, defined_actions)
+
+
+@benchmark("engine.check_conditions_recursively")
+def check_conditions_recursively_setup():
+    variables_class, rules, fact = _rule_set(rule_count=1, depth=4)
+    rule = rules[0]
+    defined_variables = variables_class(fact)
+    return lambda: engine.check_conditions_recursively(
+        rule["conditions"], defined_variables, rule
+    )
+
+
+@benchmark("utils.validate_rule_data")
+def validate_rule_data_setup():
+    variables_class, rules, _ = _rule_set(rule_count=10)
+
+    def validate():
+        for rule in rules:
+            utils.validate_rule_data(variables_class, SyntheticActions, rule)
+
+    return validate
+
+
+@benchmark("utils.export_rule_data")
+def export_rule_data_setup():
+    variables_class = make_variables_class()
+    return lambda: utils.export_rule_data(variables_class, SyntheticActions)
+
+
+@benchmark("compiler.compile_rules")
+def compile_rules_setup():
+    variables_class, rules, _ = _rule_set()
+    return lambda: compile_rules(rules, variables_class, SyntheticActions)
@@ -0,0 +1,128 @@
+"""
+Runs the benchmarks and compares results.
+
+    python -m benchmarks run --output results.json [--filter engine.]
+    python -m benchmarks compare baseline.json results.json [--threshold 0.1]
+
+`compare` exits with status 1 when a benchmark got slower than the threshold.
+"""
+
+import argparse
+import json
+import platform
+import statistics
+import timeit
+from datetime import datetime
+
+from .micro import BENCHMARKS
+
+
+def time_benchmark(setup, repeat=5, min_time=0.2):
+    """
+    Times the callable returned by `setup`.
+    :param setup: Function returning the callable to time
+    :param repeat: Number of measures
+    :param min_time: Minimum duration of a measure, in seconds
+    :return: Dict with the number of calls per measure and the min, mean and
+             standard deviation of the time per call, in seconds
+    """
+    timer = timeit.Timer(setup())
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    times = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {
+        "number": number,
+        "min": min(times),
+        "mean": statistics.mean(times),
+        "stdev": statistics.stdev(times) if len(times) > 1 else 0.0,
+    }
+
+
+def run_benchmarks(names=None, repeat=5, min_time=0.2):
+    """
+    Runs the benchmarks with the given names, all of them by default.
+    :return: Results, as written by `run`
+    """
+    names = sorted(BENCHMARKS) if names is None else names
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "implementation": platform.python_implementation(),
+            "machine": platform.machine(),
+            "date": datetime.now().isoformat(),
+        },
+        "results": {
+            name: time_benchmark(BENCHMARKS[name], repeat=repeat, min_time=min_time)
+            for name in names
+        },
+    }
+
+
+def compare(baseline, results, threshold=0.1):
+    """
+    Compares the minimum time per call of the benchmarks present in both results.
+    :param baseline: Results used as reference
+    :param results: Results to check
+    :param threshold: Relative slowdown above which a benchmark is a regression
+    :return: List of (name, baseline time, time, relative change), regressions only,
+             worst first
+    """
+    regressions = []
+    for name, result in results["results"].items():
+        base = baseline["results"].get(name)
+        if base is None or not base["min"]:
+            continue
+        change = result["min"] / base["min"] - 1
+        if change > threshold:
+            regressions.append((name, base["min"], result["min"], change))
+    regressions.sort(key=lambda regression: regression[3], reverse=True)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="Run the benchmarks")
+    run_parser.add_argument(
+        "--output", "-o", help="JSON file to write, stdout by default"
+    )
+    run_parser.add_argument(
+        "--filter",
+        "-k",
+        default="",
+        help="Only run benchmarks whose name contains this",
+    )
+    run_parser.add_argument("--repeat", type=int, default=5)
+    run_parser.add_argument("--min-time", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="Compare two result files")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("results")
+    compare_parser.add_argument("--threshold", type=float, default=0.1)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "run":
+        names = [name for name in sorted(BENCHMARKS) if args.filter in name]
+        results = run_benchmarks(names, repeat=args.repeat, min_time=args.min_time)
+        output = json.dumps(results, indent=2, sort_keys=True)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(output)
+        else:
+            print(output)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.results) as f:
+        results = json.load(f)
+    regressions = compare(baseline, results, threshold=args.threshold)
+    for name, base_time, new_time, change in regressions:
+        print(
+            "{0}: {1:.3g}s -> {2:.3g}s ({3:+.1%})".format(
+                name, base_time, new_time, change
+            )
+        )
+    return 1 if regressions else 0
@@ -0,0 +1,232 @@
+"""
+Measures how the engines scale with the number of rules, the number of facts
+per batch and the share of rules that trigger.
+
+    python -m benchmarks.scaling --rules 10 100 1000 10000 100000 \\
+        --facts 100 --trigger-rates 0.01 0.1 --output report.csv
+
+The report has one row per engine and configuration, as CSV or JSON depending
+on the extension of the output file.
+"""
+
+import argparse
+import csv
+import gc
+import json
+import sys
+import tracemalloc
+from time import perf_counter
+
+from business_rules import engine
+from business_rules.bitset import BitsetRuleSet
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.diagram import DecisionDiagramRuleSet
+from business_rules.expression_index import ExpressionIndex
+from business_rules.result_cache import CachedRuleSet
+
+from .generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+
+def _interpreter(rules, variables_class, actions_class):
+    return lambda defined_variables, defined_actions: engine.run_all(
+        rules, defined_variables, defined_actions
+    )
+
+
+def _compiled(rules, variables_class, actions_class):
+    return compile_rules(rules, variables_class, actions_class).run_all
+
+
+def _bitset(rules, variables_class, actions_class):
+    return BitsetRuleSet(compile_rules(rules, variables_class, actions_class)).run_all
+
+
+def _codegen(rules, variables_class, actions_class):
+    return CodegenRuleSet(compile_rules(rules, variables_class, actions_class)).run_all
+
+
+def _diagram(rules, variables_class, actions_class):
+    return DecisionDiagramRuleSet(
+        compile_rules(rules, variables_class, actions_class)
+    ).run_all
+
+
+def _index(rules, variables_class, actions_class):
+    return ExpressionIndex(compile_rules(rules, variables_class, actions_class)).run_all
+
+
+def _cached(rules, variables_class, actions_class):
+    return CachedRuleSet(compile_rules(rules, variables_class, actions_class)).run_all
+
+
+# engine name -> function(rules, variables class, actions class) returning a
+# function(defined_variables, defined_actions) that runs every rule for one fact
+ENGINES = {
+    "interpreter": _interpreter,
+    "compiled": _compiled,
+    "bitset": _bitset,
+    "codegen": _codegen,
+    "diagram": _diagram,
+    "index": _index,
+    "cached": _cached,
+}
+
+FIELDS = [
+    "engine",
+    "rules",
+    "facts",
+    "trigger_rate",
+    "setup_time",
+    "p50",
+    "p95",
+    "p99",
+    "throughput",
+    "triggered",
+    "tracemalloc_peak",
+    "max_rss",
+]
+
+
+def percentile(sorted_values, fraction):
+    """Nearest rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = min(
+        len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1)
+    )
+    return sorted_values[index]
+
+
+def measure(engine_name, rule_count, fact_count, trigger_rate, variable_cost=0, seed=0):
+    """
+    Runs `fact_count` facts through `rule_count` rules with one engine.
+    :return: Dict with the FIELDS of a report row. Times are in seconds, memory
+             in bytes.
+    """
+    variables_class = make_variables_class(variable_cost=variable_cost)
+    rules = generate_rules(rule_count, trigger_rate=trigger_rate, seed=seed)
+    facts = generate_facts(fact_count, seed=seed)
+
+    start = perf_counter()
+    run = ENGINES[engine_name](rules, variables_class, SyntheticActions)
+    setup_time = perf_counter() - start
+
+    gc.collect()
+    latencies = []
+    triggered = 0
+    batch_start = perf_counter()
+    for fact in facts:
+        start = perf_counter()
+        results = run(variables_class(fact), SyntheticActions(fact))
+        latencies.append(perf_counter() - start)
+        triggered += sum(results)
+    batch_time = perf_counter() - batch_start
+
+    # Memory is measured on a separate pass, tracemalloc slows everything down
+    gc.collect()
+    tracemalloc.start()
+    try:
+        for fact in facts:
+            run(variables_class(fact), SyntheticActions(fact))
+        _, tracemalloc_peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    latencies.sort()
+    return {
+        "engine": engine_name,
+        "rules": rule_count,
+        "facts": fact_count,
+        "trigger_rate": trigger_rate,
+        "setup_time": setup_time,
+        "p50": percentile(latencies, 0.50),
+        "p95": percentile(latencies, 0.95),
+        "p99": percentile(latencies, 0.99),
+        "throughput": fact_count / batch_time if batch_time else 0.0,
+        "triggered": triggered / float(rule_count * fact_count) if fact_count else 0.0,
+        "tracemalloc_peak": tracemalloc_peak,
+        "max_rss": _max_rss(),
+    }
+
+
+def sweep(
+    rule_counts, fact_counts, trigger_rates, engines=None, variable_cost=0, seed=0
+):
+    """
+    Measures every combination of the given parameters.
+    :return: List of report rows
+    """
+    engines = engines or sorted(ENGINES)
+    return [
+        measure(engine_name, rule_count, fact_count, trigger_rate, variable_cost, seed)
+        for rule_count in rule_counts
+        for fact_count in fact_counts
+        for trigger_rate in trigger_rates
+        for engine_name in engines
+    ]
+
+
+def write_report(rows, f, output_format="csv"):
+    if output_format == "json":
+        json.dump(rows, f, indent=2)
+        return
+    writer = csv.DictWriter(f, fieldnames=FIELDS)
+    writer.writeheader()
+    writer.writerows(rows)
+
+
+def _max_rss():
+    """Peak resident set size of the process so far, in bytes."""
+    if resource is None:
+        return None
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.scaling")
+    parser.add_argument("--rules", type=int, nargs="+", default=[10, 100, 1000, 10000])
+    parser.add_argument("--facts", type=int, nargs="+", default=[100])
+    parser.add_argument(
+        "--trigger-rates", type=float, nargs="+", default=[0.01, 0.1, 0.5]
+    )
+    parser.add_argument("--engines", nargs="+", choices=sorted(ENGINES))
+    parser.add_argument("--variable-cost", type=int, default=0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", "-o", help="CSV or JSON file, CSV on stdout by default"
+    )
+    args = parser.parse_args(argv)
+
+    rows = sweep(
+        args.rules,
+        args.facts,
+        args.trigger_rates,
+        engines=args.engines,
+        variable_cost=args.variable_cost,
+        seed=args.seed,
+    )
+
+    if not args.output:
+        write_report(rows, sys.stdout)
+        return 0
+    output_format = "json" if args.output.endswith(".json") else "csv"
+    with open(args.output, "w", newline="") as f:
+        write_report(rows, f, output_format)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,10 +1,15 @@
 __version__ = "1.5.4"
 
-from .engine import run_all, check_conditions_recursively
-from .utils import export_rule_data, validate_rule_data
+from .compiler import compile_rules
+from .engine import run_all, check_conditions_recursively, evaluate, commit
+from .utils import export_rule_data, export_variable_options, validate_rule_data
 
 # Appease pyflakes by "using" these exports
 assert run_all
+assert evaluate
+assert commit
+assert compile_rules
 assert export_rule_data
+assert export_variable_options
 assert check_conditions_recursively
 assert validate_rule_data
@@ -1,5 +1,6 @@
 import inspect
 
+from .util.compat import getfullargspec
 from .utils import fn_name_to_pretty_label, get_valid_fields
 
 
@@ -18,10 +19,11 @@ class BaseActions(object):
         ]
 
 
-def _validate_action_parameters(func, params):
+def _validate_action_parameters(func, params, batch=False):
     """
     Verifies that the parameters specified are actual parameters for the
     function `func`, and that the field types are FIELD_* types in fields.
+    Parameters of batch actions are not arguments of the function.
     :param func:
     :param params:
                 {
@@ -38,7 +40,7 @@ def _validate_action_parameters(func, params):
 
         for param in params:
             param_name, field_type = param["name"], param["fieldType"]
-            if param_name not in func.__code__.co_varnames:
+            if not batch and param_name not in func.__code__.co_varnames:
                 raise AssertionError(
                     "Unknown parameter name {0} specified for action {1}".format(
                         param_name, func.__name__
@@ -53,7 +55,7 @@ def _validate_action_parameters(func, params):
                 )
 
 
-def rule_action(label=None, params=None):
+def rule_action(label=None, params=None, batch=False, idempotent=False):
     """
     Decorator to make a function into a rule action.
     `params` parameter could be one of the following:
@@ -68,8 +70,22 @@ def rule_action(label=None, params=None):
         'action_parameter': ActionParam(field_type=fields.FIELD_NUMERIC, default_value=123)
     }
 
+    3. With `batch=True` the function becomes a classmethod receiving a `calls`
+    list of business_rules.models.ActionCall, the actions instance, params
+    and rule of each time the action triggered. Within
+    business_rules.engine.batch_actions() it is called once with the calls of
+    every fact, otherwise once per call. Example:
+    @rule_action(params={'number_to_order': fields.FIELD_NUMERIC}, batch=True)
+    def order_more(cls, calls):
+        ...
+
     :param label: Label for Action
     :param params: Parameters expected by the Action function
+    :param batch: Whether the function handles a list of calls at once
+    :param idempotent: Whether running the action again with the same params
+                       has no effect. The action then runs once per params
+                       within a run_all, or within a batch for all the facts
+                       on the actions instance of the first of them.
     :return: Decorator function wrapper
     """
 
@@ -86,12 +102,18 @@ def rule_action(label=None, params=None):
                 for key, value in params.items()
             ]
 
-        _validate_action_parameters(func, params_)
+        _validate_action_parameters(func, params_, batch)
 
         func.is_rule_action = True
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.params = params_
+        func.batch = batch
+        func.idempotent = idempotent
+        # Only actions taking **kwargs receive the rule and the checked conditions
+        func.accepts_conditions = not batch and getfullargspec(func).varkw is not None
 
+        if batch:
+            return classmethod(func)
         return func
 
     return wrapper
@@ -0,0 +1,55 @@
+import heapq
+
+
+def rule_priority(rule):
+    """
+    Priority of a rule, from its optional "priority" key. Rules with a higher
+    priority run first, rules with the same priority run in list order.
+    :param rule: Rule dict
+    :return: Priority, 0 by default
+    """
+    return rule.get("priority", 0)
+
+
+class Agenda(object):
+    """
+    Candidate rules waiting to run, popped by decreasing priority and then by
+    increasing position in the rule list. Building an agenda is linear and
+    each pop is logarithmic, so when stopping at the first triggered rule the
+    rules with a lower priority are never looked at nor sorted.
+    """
+
+    __slots__ = ("_heap",)
+
+    def __init__(self, entries=()):
+        """
+        :param entries: Iterable of (priority, position, rule)
+        """
+        self._heap = [
+            (-priority, position, rule) for priority, position, rule in entries
+        ]
+        heapq.heapify(self._heap)
+
+    def __len__(self):
+        return len(self._heap)
+
+    def __bool__(self):
+        return bool(self._heap)
+
+    __nonzero__ = __bool__
+
+    @classmethod
+    def from_rule_list(cls, rule_list):
+        """Agenda of all the rules of `rule_list`, positioned by their index."""
+        return cls((rule_priority(rule), i, rule) for i, rule in enumerate(rule_list))
+
+    def push(self, priority, position, rule):
+        heapq.heappush(self._heap, (-priority, position, rule))
+
+    def pop(self):
+        """
+        Removes the next rule to run.
+        :return: Tuple (position, rule)
+        """
+        _, position, rule = heapq.heappop(self._heap)
+        return position, rule
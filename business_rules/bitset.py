@@ -0,0 +1,289 @@
+"""
+Evaluates the rules of a compiled rule set with bitmasks.
+
+Every distinct condition of the rule set (same variable, operator, cast value
+and params) gets a bit. The conditions of each rule are rewritten as a
+disjunction of conjunctions (DNF), each conjunction being the mask of the bits
+it needs. For a fact, the truth of a condition is computed the first time a
+rule needs it and kept in an integer, so a condition shared by many rules is
+evaluated once per fact and a rule is decided by a few mask tests. Truths are
+kept across the actions of the rules, so actions must not change the values of
+the variables.
+"""
+
+from time import perf_counter
+
+from . import engine
+from .compiler import ALL, ConditionGroup, _evaluate_compiled_condition
+from .models import ConditionResult
+
+# Rules whose DNF has more conjunctions than this are evaluated as a tree
+MAX_TERMS = 64
+
+
+class BitsetRule(object):
+    """
+    A compiled rule with its conditions rewritten over predicate bits.
+    `tree` is None for a rule without conditions, an int for a single
+    condition, otherwise a (kind, children) tuple. `terms` is the tuple of
+    conjunction masks, None when the DNF was too large.
+    """
+
+    __slots__ = ("compiled_rule", "tree", "terms")
+
+    def __init__(self, compiled_rule, tree, terms):
+        self.compiled_rule = compiled_rule
+        self.tree = tree
+        self.terms = terms
+
+
+class BitsetRuleSet(object):
+    """
+    Runs the rules of a CompiledRuleSet, evaluating each distinct condition at
+    most once per fact. Conditions on variables that receive the rule (through
+    **kwargs) are not shared between rules, their value may depend on the rule.
+    Actions must not change the values of the variables.
+
+    The rule set is read when building, build a new BitsetRuleSet after
+    editing it.
+    """
+
+    def __init__(self, rule_set, max_terms=MAX_TERMS):
+        """
+        :param rule_set: business_rules.compiler.CompiledRuleSet
+        :param max_terms: Maximum number of conjunctions in the DNF of a rule
+        """
+        self.rule_set = rule_set
+        # bit -> CompiledCondition
+        self.predicates = []
+        self._bits = {}
+        self.rules = [
+            self._build_rule(compiled_rule, max_terms) for compiled_rule in rule_set
+        ]
+        del self._bits
+
+    def __len__(self):
+        return len(self.rules)
+
+    @property
+    def condition_count(self):
+        """Number of conditions in the rules, counting repeated ones."""
+        return sum(_count_leaves(rule.tree) for rule in self.rules)
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all.
+        """
+        evaluation = _Evaluation(self.predicates, defined_variables)
+        results = [False] * len(self.rules)
+        if by_priority:
+            ordered_rules = (
+                (i, self.rules[i]) for i, _ in self.rule_set._get_priority_order()
+            )
+        else:
+            ordered_rules = enumerate(self.rules)
+        for i, rule in ordered_rules:
+            if self.run(rule, evaluation, defined_actions):
+                results[i] = True
+                if stop_on_first_trigger:
+                    break
+        return results
+
+    def run(self, bitset_rule, evaluation, defined_actions):
+        instrumentation = engine._instrumentation
+        if instrumentation is not None:
+            rule = bitset_rule.compiled_rule.rule
+            instrumentation.rule_started(rule)
+            start = perf_counter()
+            triggered = self._run(bitset_rule, evaluation, defined_actions)
+            instrumentation.rule_finished(rule, triggered, perf_counter() - start)
+            return triggered
+
+        return self._run(bitset_rule, evaluation, defined_actions)
+
+    def _run(self, bitset_rule, evaluation, defined_actions):
+        compiled_rule = bitset_rule.compiled_rule
+        rule = compiled_rule.rule
+        tree = bitset_rule.tree
+
+        if tree is not None:
+            if bitset_rule.terms is not None:
+                rule_triggered = any(
+                    evaluation.satisfies(mask, rule) for mask in bitset_rule.terms
+                )
+            else:
+                rule_triggered = _check_tree(tree, evaluation, rule)
+            if not rule_triggered:
+                return False
+
+        checked_conditions_results = []
+        if tree is not None and compiled_rule.conditions_needed:
+            _, checked_conditions_results = _condition_results(
+                tree, compiled_rule.conditions, evaluation, rule
+            )
+        engine.do_bound_actions(
+            compiled_rule.bound_actions,
+            defined_actions,
+            checked_conditions_results,
+            rule,
+        )
+        return True
+
+    def _build_rule(self, compiled_rule, max_terms):
+        if compiled_rule.conditions is None:
+            return BitsetRule(compiled_rule, None, None)
+
+        tree = self._build_tree(compiled_rule.conditions, compiled_rule.rule_id)
+        return BitsetRule(compiled_rule, tree, _dnf(tree, max_terms))
+
+    def _build_tree(self, node, rule_id):
+        if isinstance(node, ConditionGroup):
+            return (
+                node.kind,
+                tuple(self._build_tree(child, rule_id) for child in node.children),
+            )
+
+        key = node.key
+        if getattr(self.rule_set.variables_class, node.name).accepts_rule:
+            key = (rule_id,) + key
+        bit = self._bits.get(key)
+        if bit is None:
+            bit = self._bits[key] = len(self.predicates)
+            self.predicates.append(node)
+        return bit
+
+
+class _Evaluation(object):
+    """
+    Truth of the predicates for one fact: `known` has a bit set for every
+    predicate evaluated so far, `truth` for every one that was true.
+    """
+
+    __slots__ = ("predicates", "defined_variables", "known", "truth")
+
+    def __init__(self, predicates, defined_variables):
+        self.predicates = predicates
+        self.defined_variables = defined_variables
+        self.known = 0
+        self.truth = 0
+
+    def value(self, bit, rule):
+        mask = 1 << bit
+        if not self.known & mask:
+            self._evaluate(bit, mask, rule)
+        return bool(self.truth & mask)
+
+    def satisfies(self, mask, rule):
+        """Tells if every predicate of `mask` is true, evaluating the unknown ones."""
+        if mask & self.known & ~self.truth:
+            return False
+        missing = mask & ~self.known
+        while missing:
+            low = missing & -missing
+            if not self._evaluate(low.bit_length() - 1, low, rule):
+                return False
+            missing ^= low
+        return True
+
+    def _evaluate(self, bit, mask, rule):
+        result = _evaluate_compiled_condition(
+            self.predicates[bit], self.defined_variables, rule
+        )
+        self.known |= mask
+        if result:
+            self.truth |= mask
+        return result
+
+
+def _dnf(tree, max_terms):
+    """
+    Conjunction masks of the DNF of `tree`, without duplicates, or None if
+    there are more than `max_terms`.
+    """
+    if isinstance(tree, int):
+        return (1 << tree,)
+
+    kind, children = tree
+    if kind == ALL:
+        terms = (0,)
+        for child in children:
+            child_terms = _dnf(child, max_terms)
+            if child_terms is None or len(terms) * len(child_terms) > max_terms:
+                return None
+            terms = _unique(
+                term | child_term for term in terms for child_term in child_terms
+            )
+        return terms
+
+    terms = ()
+    for child in children:
+        child_terms = _dnf(child, max_terms)
+        if child_terms is None:
+            return None
+        terms = _unique(terms + child_terms)
+        if len(terms) > max_terms:
+            return None
+    return terms
+
+
+def _unique(terms):
+    return tuple(dict.fromkeys(terms))
+
+
+def _check_tree(tree, evaluation, rule):
+    if isinstance(tree, int):
+        return evaluation.value(tree, rule)
+
+    kind, children = tree
+    if kind == ALL:
+        return all(_check_tree(child, evaluation, rule) for child in children)
+    return any(_check_tree(child, evaluation, rule) for child in children)
+
+
+def _condition_results(tree, node, evaluation, rule):
+    """
+    Same as business_rules.compiler.check_compiled_conditions, reading the
+    predicates from `evaluation`. `node` is the compiled conditions `tree` was
+    built from, results report the values and params of the rule itself.
+    """
+    if isinstance(tree, int):
+        result = evaluation.value(tree, rule)
+        return result, [
+            ConditionResult(result, node.name, node.operator, node.value, node.params)
+        ]
+
+    kind, children = tree
+    if kind == ALL:
+        matches = []
+        for child, child_node in zip(children, node.children):
+            check_condition_result, matches_results = _condition_results(
+                child, child_node, evaluation, rule
+            )
+            if not check_condition_result:
+                return False, []
+            matches.extend(matches_results)
+        return True, matches
+
+    for child, child_node in zip(children, node.children):
+        check_condition_result, matches_results = _condition_results(
+            child, child_node, evaluation, rule
+        )
+        if check_condition_result:
+            return True, matches_results
+    return False, []
+
+
+def _count_leaves(tree):
+    if tree is None:
+        return 0
+    if isinstance(tree, int):
+        return 1
+    return sum(_count_leaves(child) for child in tree[1])
@@ -0,0 +1,155 @@
+"""
+Caches for the values of rule variables, declared with the `cache` argument
+of the rule_variable decorators:
+
+- "fact": computed once per variables instance, that is once per fact
+- "batch": computed once per batch_scope(), once per fact outside of one
+- "process": computed once per process, until clear() is called
+- a number of seconds: computed again once the cached value is that old
+
+Cached values are shared by every rule and condition reading the variable
+with the same params. Values cached for a batch or the process are shared by
+every instance of the variables class, so those variables must not depend on
+the fact. The process keeps the PROCESS_CACHE_SIZE most recently used values
+(cached for the process or with a ttl), evicting the least recently used
+ones. Two threads missing the same value at the same time may both compute
+it, the last one is kept.
+"""
+
+import numbers
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+FACT = "fact"
+BATCH = "batch"
+PROCESS = "process"
+
+SCOPES = (FACT, BATCH, PROCESS)
+
+# Number of values cached for the process
+PROCESS_CACHE_SIZE = 10000
+
+_batch_cache = ContextVar("business_rules_batch_cache", default=None)
+
+
+class ValueCache(object):
+    """
+    Thread safe mapping of variable keys to values, values stored with a ttl
+    being evicted when read after they expired. With a `max_size`, the least
+    recently used values are evicted past that size.
+    """
+
+    __slots__ = ("_values", "_lock", "max_size")
+
+    def __init__(self, max_size=None):
+        self._values = OrderedDict()
+        self._lock = threading.Lock()
+        self.max_size = max_size
+
+    def __len__(self):
+        return len(self._values)
+
+    def get(self, key):
+        """
+        :return: Tuple (True, value) for a cached value, (False, None) otherwise
+        """
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return False, None
+            value, expires_at = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._values[key]
+                return False, None
+            if self.max_size is not None:
+                self._values.move_to_end(key)
+            return True, value
+
+    def set(self, key, value, ttl=None):
+        expires_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._values[key] = (value, expires_at)
+            if self.max_size is not None:
+                self._values.move_to_end(key)
+                while len(self._values) > self.max_size:
+                    self._values.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+_process_cache = ValueCache(max_size=PROCESS_CACHE_SIZE)
+
+
+def validate_cache(cache):
+    """
+    Raises an AssertionError if `cache` is not a cache scope nor a ttl.
+    """
+    if cache is None or cache in SCOPES:
+        return
+    if isinstance(cache, numbers.Real) and not isinstance(cache, bool) and cache > 0:
+        return
+    raise AssertionError(
+        "cache must be one of {0} or a number of seconds, not {1!r}".format(
+            ", ".join(SCOPES), cache
+        )
+    )
+
+
+def get_cache(cache, defined_variables):
+    """
+    Cache holding the values of a variable with the given cache scope.
+    :param cache: Cache scope or ttl of the variable
+    :param defined_variables: Variables instance the variable is read from
+    :return: ValueCache, None when the values can't be cached
+    """
+    if cache == FACT or (cache == BATCH and _batch_cache.get() is None):
+        try:
+            instance_dict = defined_variables.__dict__
+        except AttributeError:
+            return None
+        fact_cache = instance_dict.get("_rule_variable_cache")
+        if fact_cache is None:
+            fact_cache = instance_dict["_rule_variable_cache"] = ValueCache()
+        return fact_cache
+    if cache == BATCH:
+        return _batch_cache.get()
+    return _process_cache
+
+
+def cache_key(defined_variables, name, params):
+    return (type(defined_variables), name, repr(sorted(params.items())))
+
+
+def cache_ttl(cache):
+    """Seconds the values of a variable with the given cache are kept, None for ever."""
+    if cache in SCOPES:
+        return None
+    return cache
+
+
+@contextmanager
+def batch_scope():
+    """
+    Variables cached per batch are computed once within this context, which
+    applies to the current thread or asyncio task. Nested scopes share the
+    cache of the outermost one.
+    """
+    if _batch_cache.get() is not None:
+        yield
+        return
+
+    token = _batch_cache.set(ValueCache())
+    try:
+        yield
+    finally:
+        _batch_cache.reset(token)
+
+
+def clear():
+    """Forgets the values cached for the process or with a ttl."""
+    _process_cache.clear()
@@ -0,0 +1,380 @@
+"""
+Compiles a rule set to Python source.
+
+Each rule becomes an `if` testing its conditions as one boolean expression,
+calling the variables and the operator functions directly. Variable values are
+kept in local variables, so a variable is computed at most once per fact until
+the actions of a rule run: they may change the fact, so the next rules compute
+the variables again like the interpreter does. Variables receiving the rule are
+computed for each condition. Condition values are the ones cast when compiling
+the rule set.
+
+The generated source is available as `CodegenRuleSet.source`, and with a
+`cache_dir` it is written there along with its bytecode so the next process
+compiling the same rules skips `compile()`.
+"""
+
+import copy
+import hashlib
+import inspect
+import keyword
+import linecache
+import marshal
+import os
+import sys
+
+from . import engine
+from .compiler import ALL, ConditionGroup, check_compiled_conditions
+
+# Changes whenever the generated code changes, to ignore outdated cached code
+CODEGEN_VERSION = 2
+
+_MISSING = object()
+# Stands for the line resetting the local variables, known once a function is
+# generated
+_RESET_LOCALS = object()
+
+
+class CodegenRuleSet(object):
+    """
+    Runs the rules of a CompiledRuleSet with generated code. Decisions that
+    depend on the actions (whether they receive the checked conditions) are
+    taken from the actions class of the rule set.
+
+    The rule set is read when building, build a new CodegenRuleSet after
+    editing it.
+    """
+
+    def __init__(self, rule_set, cache_dir=None, differential=False):
+        """
+        :param rule_set: business_rules.compiler.CompiledRuleSet
+        :param cache_dir: Directory where generated source and bytecode are cached
+        :param differential: Check every run against the interpreter, raising an
+                             AssertionError when results or action calls differ.
+                             The interpreter runs first, on deep copies of the
+                             variables and actions, which must support
+                             copy.deepcopy.
+        """
+        self.rule_set = rule_set
+        self.differential = differential
+        self.source, namespace = generate_source(rule_set)
+        self.cache_key = _cache_key(self.source)
+        self.filename = "<business_rules.codegen {0}>".format(self.cache_key[:12])
+        self.cached = False
+
+        code = None
+        if cache_dir is not None:
+            self.filename = os.path.join(cache_dir, self.cache_key + ".py")
+            code = self._load_code(cache_dir)
+            self.cached = code is not None
+        if code is None:
+            code = compile(self.source, self.filename, "exec")
+            if cache_dir is not None:
+                self._save_code(cache_dir, code)
+        # Lets tracebacks and inspect show the generated lines
+        linecache.cache[self.filename] = (
+            len(self.source),
+            None,
+            self.source.splitlines(True),
+            self.filename,
+        )
+
+        exec(code, namespace)
+        self._run_all = namespace["run_all"]
+        self._run_all_by_priority = namespace["run_all_by_priority"]
+
+    def __len__(self):
+        return len(self.rule_set)
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all. Instrumented runs go through the
+        compiled rule set, the generated code sends no events.
+        """
+        if engine._instrumentation is not None:
+            return self.rule_set.run_all(
+                defined_variables,
+                defined_actions,
+                stop_on_first_trigger=stop_on_first_trigger,
+                by_priority=by_priority,
+            )
+        if self.differential:
+            return self._run_differential(
+                defined_variables, defined_actions, stop_on_first_trigger, by_priority
+            )
+
+        run_all = self._run_all_by_priority if by_priority else self._run_all
+        return run_all(defined_variables, defined_actions, stop_on_first_trigger)
+
+    def _run_differential(
+        self, defined_variables, defined_actions, stop_on_first_trigger, by_priority
+    ):
+        # Actions run on a copy of the fact, as the next rules may depend on them
+        variables_copy, actions_copy = copy.deepcopy(
+            (defined_variables, defined_actions)
+        )
+        expected_actions = _RecordingActions(actions_copy)
+        expected = engine.run_all(
+            self.rule_set.rule_list,
+            variables_copy,
+            expected_actions,
+            stop_on_first_trigger=stop_on_first_trigger,
+            by_priority=by_priority,
+        )
+        recording_actions = _RecordingActions(defined_actions)
+        run_all = self._run_all_by_priority if by_priority else self._run_all
+        results = run_all(defined_variables, recording_actions, stop_on_first_trigger)
+
+        if results != expected or recording_actions.calls != expected_actions.calls:
+            raise AssertionError(
+                "Generated code differs from the interpreter: results {0} and "
+                "actions {1} instead of {2} and {3}".format(
+                    results, recording_actions.calls, expected, expected_actions.calls
+                )
+            )
+        return results
+
+    def _load_code(self, cache_dir):
+        try:
+            with open(self._bytecode_path(cache_dir), "rb") as f:
+                return marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+
+    def _save_code(self, cache_dir, code):
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir)
+        for path, mode, data in (
+            (self.filename, "w", self.source),
+            (self._bytecode_path(cache_dir), "wb", marshal.dumps(code)),
+        ):
+            tmp_path = "{0}.{1}.tmp".format(path, os.getpid())
+            with open(tmp_path, mode) as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+
+    def _bytecode_path(self, cache_dir):
+        return os.path.join(
+            cache_dir,
+            "{0}.{1}.code".format(self.cache_key, sys.implementation.cache_tag),
+        )
+
+
+def generate_source(rule_set):
+    """
+    Generates the source of a module with two functions,
+    run_all(defined_variables, defined_actions, stop_on_first_trigger) running
+    the rules in list order and run_all_by_priority running them by priority.
+    :param rule_set: business_rules.compiler.CompiledRuleSet
+    :return: Tuple (source, namespace holding the values the source refers to)
+    """
+    generator = _Generator(rule_set)
+    indexed_rules = list(enumerate(rule_set))
+    lines = [
+        "# Generated by business_rules.codegen for rules {0}".format(
+            rule_set.content_hash
+        ),
+        "",
+    ]
+    lines.extend(generator.function("run_all", indexed_rules))
+    priority_order = rule_set._get_priority_order()
+    if priority_order == indexed_rules:
+        lines.append("run_all_by_priority = run_all")
+    else:
+        lines.extend(generator.function("run_all_by_priority", priority_order))
+    lines.append("")
+    return "\n".join(lines), generator.namespace
+
+
+class _Generator(object):
+    def __init__(self, rule_set):
+        self.variables_class = rule_set.variables_class
+        self.actions_class = rule_set.actions_class
+        self.namespace = {
+            "_MISSING": _MISSING,
+            "_do_actions": engine.do_bound_actions,
+            "_check": check_compiled_conditions,
+            "_variable": engine._get_variable_value,
+            "_trusted": engine._variable_type,
+            "_engine": engine,
+        }
+        # id of a value -> name it has in the namespace
+        self._names = {}
+        # (variable name, frozen params) -> name of the local variable caching it
+        self._locals = {}
+
+    def function(self, name, indexed_rules):
+        # Locals are numbered per function, rules are generated first
+        self._locals = {}
+        body = []
+        for i, compiled_rule in indexed_rules:
+            body.extend(self.rule(i, compiled_rule))
+
+        lines = [
+            "def {0}(defined_variables, defined_actions, "
+            "stop_on_first_trigger=False):".format(name),
+            "    results = [False] * {0}".format(len(indexed_rules)),
+        ]
+        reset = "{0} = _MISSING".format(" = ".join(sorted(self._locals.values())))
+        if self._locals:
+            lines.append("    " + reset)
+        for line in body:
+            if line is not _RESET_LOCALS:
+                lines.append(line)
+            elif self._locals:
+                lines.append("        " + reset)
+        lines.extend(["    return results", "", ""])
+        return lines
+
+    def rule(self, i, compiled_rule):
+        rule = self.value(compiled_rule.rule, "r")
+        actions = self.value(compiled_rule.bound_actions, "a")
+        lines = ["    # rule {0!r}".format(compiled_rule.rule_id)]
+        conditions = compiled_rule.conditions
+        trigger = [
+            # The actions may have changed the values of the variables
+            _RESET_LOCALS,
+            "        results[{0}] = True".format(i),
+            "        if stop_on_first_trigger:",
+            "            return results",
+        ]
+
+        if conditions is None:
+            lines.append("    if True:")
+            lines.append(
+                "        _do_actions({0}, defined_actions, [], {1})".format(
+                    actions, rule
+                )
+            )
+        elif compiled_rule.conditions_needed:
+            lines.append(
+                "    rule_triggered, checked_conditions_results = "
+                "_check({0}, defined_variables, {1})".format(
+                    self.value(conditions, "n"), rule
+                )
+            )
+            lines.append("    if rule_triggered:")
+            lines.append(
+                "        _do_actions({0}, defined_actions, "
+                "checked_conditions_results, {1})".format(actions, rule)
+            )
+        else:
+            lines.append(
+                "    if {0}:".format(self.expression(conditions, compiled_rule))
+            )
+            lines.append(
+                "        _do_actions({0}, defined_actions, [], {1})".format(
+                    actions, rule
+                )
+            )
+        return lines + trigger
+
+    def expression(self, node, compiled_rule):
+        if isinstance(node, ConditionGroup):
+            if not node.children:
+                # Simplified conditions that are always or never true
+                return "True" if node.kind == ALL else "False"
+            separator = " and " if node.kind == ALL else " or "
+            return "({0})".format(
+                separator.join(
+                    self.expression(child, compiled_rule) for child in node.children
+                )
+            )
+
+        method = getattr(self.variables_class, node.name)
+        field_type = self.value(node.field_type, "t")
+        function = self.value(node.compare, "o")
+
+        if getattr(method, "cache", None) is not None:
+            # Cached variables are read through the engine, which keeps their cache
+            value = "_variable(defined_variables, {0!r}, {1}, None)".format(
+                node.name, self.value(node.params, "p")
+            )
+        else:
+            call = self.call(node, method, compiled_rule)
+            trusted = "_trusted({0}, {1!r}, {2})".format(
+                self.value(method, "m"), node.name, call
+            )
+            if getattr(method, "trusted", False) is True:
+                value = trusted
+            else:
+                # All variables may be trusted by the time the code runs
+                value = "({0} if _engine._trust_variables else {1}({2}))".format(
+                    trusted, field_type, call
+                )
+        if not getattr(method, "accepts_rule", False):
+            local = self._local(node)
+            value = "({0} if {0} is not _MISSING else ({0} := {1}))".format(
+                local, value
+            )
+
+        if node.no_input:
+            return "{0}({1})".format(function, value)
+        return "{0}({1}, {2})".format(
+            function, value, self.value(node.typed_value, "k")
+        )
+
+    def call(self, node, method, compiled_rule):
+        if getattr(method, "accepts_rule", False):
+            params = dict({"rule": compiled_rule.rule}, **node.params)
+        else:
+            params = node.params
+        if node.name.isidentifier() and not keyword.iskeyword(node.name):
+            function = "defined_variables.{0}".format(node.name)
+        else:
+            function = "getattr(defined_variables, {0!r})".format(node.name)
+        if not params:
+            return "{0}()".format(function)
+        return "{0}(**{1})".format(function, self.value(params, "p"))
+
+    def value(self, value, prefix):
+        """Adds `value` to the namespace and returns its name."""
+        name = self._names.get(id(value))
+        if name is None:
+            name = "_{0}{1}".format(prefix, len(self._names))
+            self._names[id(value)] = name
+            self.namespace[name] = value
+        return name
+
+    def _local(self, node):
+        key = (node.name, repr(sorted(node.params.items())))
+        local = self._locals.get(key)
+        if local is None:
+            local = self._locals[key] = "x{0}".format(len(self._locals))
+        return local
+
+
+class _RecordingActions(object):
+    """
+    Proxy recording the actions called with their parameters before executing
+    them on the proxied actions.
+    """
+
+    def __init__(self, actions):
+        self._actions = actions
+        self.calls = []
+
+    def __getattr__(self, name):
+        method = getattr(self._actions, name)
+
+        def record(**kwargs):
+            self.calls.append((name, kwargs))
+            return method(**kwargs)
+
+        # Keep what the engine reads from actions: params, flags and signature
+        record.__dict__.update(getattr(method, "__dict__", {}))
+        record.__signature__ = inspect.signature(method)
+        return record
+
+
+def _cache_key(source):
+    data = "{0}\n{1}".format(CODEGEN_VERSION, source)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
@@ -0,0 +1,781 @@
+import hashlib
+import json
+from time import perf_counter
+
+from . import engine, redundancy, utils
+from .agenda import Agenda, rule_priority
+from .fields import FIELD_NO_INPUT
+from .models import ConditionResult, Plan
+from .operators import OPERATORS
+from .simplify import is_never_true, simplify_conditions
+from .util.compat import getfullargspec
+
+ALL = "all"
+ANY = "any"
+
+
+class CompiledCondition(object):
+    """
+    A single condition of a rule with its operator resolved and its value
+    already cast to the type of the variable. `compare` is the operator
+    function, called without casting its argument again.
+    """
+
+    __slots__ = (
+        "condition",
+        "name",
+        "operator",
+        "value",
+        "params",
+        "field_type",
+        "typed_value",
+        "compare",
+        "no_input",
+        "key",
+    )
+
+    def __init__(self, condition, field_type):
+        self.condition = condition
+        self.name = condition["name"]
+        self.operator = operator = condition["operator"]
+        self.value = value = condition.get("value")
+        self.params = params = condition.get("params", {})
+        self.field_type = field_type
+
+        method = getattr(field_type, operator)
+        self.no_input = method.input_type == FIELD_NO_INPUT
+        if self.no_input or not method.assert_type_for_arguments:
+            self.typed_value = value
+        else:
+            self.typed_value = field_type.cast(value)
+        self.compare = _operator_function(field_type, operator)
+
+        # Conditions with the same key always have the same result for a fact
+        self.key = (
+            self.name,
+            operator,
+            None if self.no_input else _freeze(self.typed_value),
+            _freeze(params),
+        )
+
+    def __getstate__(self):
+        # Operator functions are wrapped by type_operator and can't be pickled
+        return {
+            slot: getattr(self, slot) for slot in self.__slots__ if slot != "compare"
+        }
+
+    def __setstate__(self, state):
+        for slot, value in state.items():
+            setattr(self, slot, value)
+        self.compare = _operator_function(self.field_type, self.operator)
+
+
+class ConditionGroup(object):
+    """
+    An `all` or `any` group of conditions.
+    """
+
+    __slots__ = ("kind", "children")
+
+    def __init__(self, kind, children):
+        self.kind = kind
+        self.children = children
+
+
+class CompiledRule(object):
+    """
+    A validated rule. `conditions` is None when the rule has no conditions,
+    `bound_actions` are its actions bound to the actions class of the rule set,
+    `conditions_needed` tells if any of them receives the checked conditions
+    and `simplifications` describe how its conditions were simplified.
+    """
+
+    __slots__ = (
+        "rule_id",
+        "rule",
+        "conditions",
+        "actions",
+        "bound_actions",
+        "conditions_needed",
+        "simplifications",
+        "variables",
+    )
+
+    def __init__(
+        self,
+        rule_id,
+        rule,
+        conditions,
+        bound_actions,
+        conditions_needed=True,
+        simplifications=(),
+    ):
+        self.rule_id = rule_id
+        self.rule = rule
+        self.conditions = conditions
+        self.actions = rule["actions"]
+        self.bound_actions = bound_actions
+        self.conditions_needed = conditions_needed
+        self.simplifications = simplifications
+        self.variables = frozenset(
+            condition.name for condition in iter_conditions(conditions)
+        )
+
+
+class CompiledRuleSet(object):
+    """
+    A list of rules validated against a Variables and an Actions class, with
+    condition values cast ahead of time. Use compile_rules to build one.
+
+    Every rule has an id that does not change when other rules are added,
+    removed or replaced: the rule's "id" key when it has one, otherwise a
+    number assigned when it is added. Edits are not thread safe, publish a new
+    rule set through a RuleSetHandle when rules are shared between threads.
+
+    With `simplify`, the conditions of the rules are simplified when they are
+    compiled, see business_rules.simplify, and run_all skips the rules whose
+    outcome follows from a rule running before them, see
+    business_rules.redundancy.
+    """
+
+    def __init__(self, variables_class, actions_class, simplify=False):
+        self.variables_class = variables_class
+        self.actions_class = actions_class
+        self.simplify = simplify
+        self.schema_fingerprint = schema_fingerprint(variables_class, actions_class)
+        self._rules = {}
+        self._next_id = 0
+        self._content_hash = None
+        self._rule_schema = None
+        # [(position, CompiledRule)] by decreasing priority and {rule id: position},
+        # computed when needed
+        self._priority_order = None
+        self._positions = None
+        # {by_priority: RedundancyAnalysis}, computed when needed
+        self._redundancy = {}
+        # variable name -> ids of the rules with a condition on that variable
+        self.variable_index = {}
+        # condition key -> {id of a rule with that condition: number of occurrences}
+        self.condition_index = {}
+
+    def __len__(self):
+        return len(self._rules)
+
+    def __iter__(self):
+        return iter(self._rules.values())
+
+    def __contains__(self, rule_id):
+        return rule_id in self._rules
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        # Classes are bound again when loading, they may not be importable
+        del state["variables_class"]
+        del state["actions_class"]
+        state["_rule_schema"] = None
+        state["_priority_order"] = None
+        state["_positions"] = None
+        state["_redundancy"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._priority_order = None
+        self._positions = None
+        self._redundancy = {}
+
+    @property
+    def rules(self):
+        return list(self._rules.values())
+
+    @property
+    def rule_ids(self):
+        """Ids of the rules, in the same order as the results of run_all."""
+        return list(self._rules)
+
+    @property
+    def rule_list(self):
+        return [rule.rule for rule in self._rules.values()]
+
+    @property
+    def content_hash(self):
+        if self._content_hash is None:
+            self._content_hash = content_hash(self.rule_list)
+        return self._content_hash
+
+    def simplification_report(self):
+        """
+        What simplify changed in the conditions of the rules.
+        :return:
+        {
+            'rules': 1000,
+            'simplified_rules': 25,
+            'unsatisfiable_rules': [12, 40],     # ids of the rules that never trigger
+            'changes': {12: ['`all` group can never be true: ...', ...]},   # by rule id
+        }
+        """
+        return {
+            "rules": len(self._rules),
+            "simplified_rules": sum(
+                1 for rule in self._rules.values() if rule.simplifications
+            ),
+            "unsatisfiable_rules": [
+                rule_id
+                for rule_id, rule in self._rules.items()
+                if is_never_true(rule.conditions)
+            ],
+            "changes": {
+                rule_id: list(rule.simplifications)
+                for rule_id, rule in self._rules.items()
+                if rule.simplifications
+            },
+        }
+
+    def redundancy_report(self, by_priority=False):
+        """
+        Rules whose outcome follows from a rule running before them, skipped
+        by run_all when the rule set is simplified.
+        :param by_priority: Report for the rules run by decreasing priority
+        :return:
+        {
+            'rules': 1000,
+            # Rules that never trigger with stop_on_first_trigger, by rule id
+            'unreachable_rules': {40: 'Rule 12 runs before it and triggers ...'},
+            # Rules evaluated once with an earlier rule with the same conditions
+            'duplicate_rules': [52],
+        }
+        """
+        analysis = self._get_redundancy(by_priority)
+        return {
+            "rules": len(self._rules),
+            "unreachable_rules": {
+                rule_id: redundancy.explain(self, analysis, rule_id)
+                for rule_id in self._rules
+                if rule_id in analysis.unreachable
+            },
+            "duplicate_rules": [
+                rule_id for rule_id in self._rules if rule_id in analysis.duplicates
+            ],
+        }
+
+    def get_rule(self, rule_id):
+        """Returns the CompiledRule with id `rule_id`."""
+        try:
+            return self._rules[rule_id]
+        except KeyError:
+            raise AssertionError("Unknown rule id {0}".format(rule_id))
+
+    def rules_for_variable(self, name):
+        """Returns the ids of the rules with a condition on variable `name`."""
+        return list(self.variable_index.get(name, ()))
+
+    def rules_for_condition(self, condition):
+        """Returns the ids of the rules containing a condition equal to `condition`."""
+        return list(self.condition_index.get(condition.key, ()))
+
+    def add_rule(self, rule, rule_id=None):
+        """
+        Validates and compiles `rule`, and adds it after the existing rules.
+        :param rule: Rule to add
+        :param rule_id: Id of the rule, defaults to its "id" key or a new number
+        :return: Id of the rule
+        :raises AssertionError: If the rule is not valid or the id is taken
+        """
+        if rule_id is None:
+            rule_id = rule.get("id")
+        if rule_id is None:
+            while self._next_id in self._rules:
+                self._next_id += 1
+            rule_id = self._next_id
+            # Ids of removed rules are not given to new rules
+            self._next_id += 1
+        elif rule_id in self._rules:
+            raise AssertionError("Duplicate rule id {0}".format(rule_id))
+
+        compiled_rule = self._compile_rule(rule_id, rule)
+        self._rules[rule_id] = compiled_rule
+        self._index(compiled_rule)
+        self._changed()
+        return rule_id
+
+    def remove_rule(self, rule_id):
+        """
+        Removes the rule with id `rule_id`.
+        :return: The removed CompiledRule
+        """
+        compiled_rule = self.get_rule(rule_id)
+        del self._rules[rule_id]
+        self._unindex(compiled_rule)
+        self._changed()
+        return compiled_rule
+
+    def replace_rule(self, rule_id, rule):
+        """
+        Replaces the rule with id `rule_id` by `rule`, keeping its position.
+        Nothing changes if `rule` is not valid.
+        :return: The replaced CompiledRule
+        :raises AssertionError: If the rule is not valid or the id is unknown
+        """
+        old_rule = self.get_rule(rule_id)
+        compiled_rule = self._compile_rule(rule_id, rule)
+        self._unindex(old_rule)
+        self._rules[rule_id] = compiled_rule
+        self._index(compiled_rule)
+        self._changed()
+        return old_rule
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all for the compiled rules. The
+        priority order is computed once and kept until the rules change.
+        """
+        if self.simplify:
+            return self._run_all_without_redundant_rules(
+                defined_variables, defined_actions, stop_on_first_trigger, by_priority
+            )
+        results = [False] * len(self._rules)
+        if by_priority:
+            ordered_rules = self._get_priority_order()
+        else:
+            ordered_rules = enumerate(self._rules.values())
+        for i, rule in ordered_rules:
+            if self.run(rule, defined_variables, defined_actions):
+                results[i] = True
+                if stop_on_first_trigger:
+                    break
+        return results
+
+    def _run_all_without_redundant_rules(
+        self, defined_variables, defined_actions, stop_on_first_trigger, by_priority
+    ):
+        analysis = self._get_redundancy(by_priority)
+        results = [False] * len(self._rules)
+        if by_priority:
+            ordered_rules = self._get_priority_order()
+        else:
+            ordered_rules = enumerate(self._rules.values())
+        # Whether the rules run so far triggered, by rule id
+        triggered = {}
+        for i, rule in ordered_rules:
+            rule_id = rule.rule_id
+            if rule_id in analysis.unreachable:
+                if stop_on_first_trigger:
+                    continue
+                earlier_id = analysis.implied.get(
+                    rule_id, analysis.duplicates.get(rule_id)
+                )
+                if earlier_id is None or triggered[earlier_id] is False:
+                    triggered[rule_id] = False
+                    continue
+                if rule_id in analysis.duplicates and not rule.conditions_needed:
+                    engine.do_bound_actions(
+                        rule.bound_actions, defined_actions, [], rule.rule
+                    )
+                    triggered[rule_id] = results[i] = True
+                    continue
+            triggered[rule_id] = self.run(rule, defined_variables, defined_actions)
+            if triggered[rule_id]:
+                results[i] = True
+                if stop_on_first_trigger:
+                    break
+        return results
+
+    @engine.idempotence_scope
+    def run_candidates(
+        self, rule_ids, defined_variables, defined_actions, stop_on_first_trigger=False
+    ):
+        # type: (...) -> List[bool]
+        """
+        Runs only the rules with the given ids, by decreasing priority. Meant
+        for candidates found through an index: they are pulled from an Agenda,
+        so with `stop_on_first_trigger` the candidates with a lower priority
+        than the triggered rule are neither run nor sorted.
+        :return: Same as run_all, False for the rules that are not candidates
+        """
+        positions = self._get_positions()
+        agenda = Agenda(
+            (
+                rule_priority(self._rules[rule_id].rule),
+                positions[rule_id],
+                self._rules[rule_id],
+            )
+            for rule_id in rule_ids
+        )
+        results = [False] * len(self._rules)
+        while agenda:
+            i, rule = agenda.pop()
+            if self.run(rule, defined_variables, defined_actions):
+                results[i] = True
+                if stop_on_first_trigger:
+                    break
+        return results
+
+    def run(self, compiled_rule, defined_variables, defined_actions):
+        instrumentation = engine._instrumentation
+        if instrumentation is not None:
+            rule = compiled_rule.rule
+            instrumentation.rule_started(rule)
+            start = perf_counter()
+            triggered = self._run(compiled_rule, defined_variables, defined_actions)
+            instrumentation.rule_finished(rule, triggered, perf_counter() - start)
+            return triggered
+
+        return self._run(compiled_rule, defined_variables, defined_actions)
+
+    def _run(self, compiled_rule, defined_variables, defined_actions):
+        rule_triggered, checked_conditions_results = _check_compiled_rule(
+            compiled_rule, defined_variables, defined_actions
+        )
+
+        if rule_triggered:
+            engine.do_bound_actions(
+                compiled_rule.bound_actions,
+                defined_actions,
+                checked_conditions_results,
+                compiled_rule.rule,
+            )
+            return True
+
+        return False
+
+    def evaluate(
+        self, defined_variables, stop_on_first_trigger=False, by_priority=False
+    ):
+        # type: (...) -> Plan
+        """
+        Same as business_rules.engine.evaluate for the compiled rules, the
+        actions being checked against the actions class of the rule set.
+        """
+        results = [False] * len(self._rules)
+        planned_actions = []
+        if by_priority:
+            ordered_rules = self._get_priority_order()
+        else:
+            ordered_rules = enumerate(self._rules.values())
+        for i, compiled_rule in ordered_rules:
+            rule = compiled_rule.rule
+            instrumentation = engine._instrumentation
+            if instrumentation is not None:
+                instrumentation.rule_started(rule)
+                start = perf_counter()
+            rule_triggered, checked_conditions_results = _check_compiled_rule(
+                compiled_rule, defined_variables, self.actions_class
+            )
+            if instrumentation is not None:
+                instrumentation.rule_finished(
+                    rule, rule_triggered, perf_counter() - start
+                )
+
+            if rule_triggered:
+                results[i] = True
+                planned_actions.extend(
+                    engine.plan_actions(
+                        compiled_rule.actions,
+                        self.actions_class,
+                        checked_conditions_results,
+                        rule,
+                    )
+                )
+                if stop_on_first_trigger:
+                    break
+        return Plan(tuple(results), tuple(planned_actions))
+
+    def _changed(self):
+        self._content_hash = None
+        self._priority_order = None
+        self._positions = None
+        self._redundancy = {}
+
+    def _get_redundancy(self, by_priority):
+        if by_priority not in self._redundancy:
+            self._redundancy[by_priority] = redundancy.analyze_redundancy(
+                self, by_priority=by_priority
+            )
+        return self._redundancy[by_priority]
+
+    def _get_priority_order(self):
+        if self._priority_order is None:
+            self._priority_order = sorted(
+                enumerate(self._rules.values()),
+                key=lambda item: (-rule_priority(item[1].rule), item[0]),
+            )
+        return self._priority_order
+
+    def _get_positions(self):
+        if self._positions is None:
+            self._positions = {rule_id: i for i, rule_id in enumerate(self._rules)}
+        return self._positions
+
+    def _compile_rule(self, rule_id, rule):
+        if self._rule_schema is None:
+            self._rule_schema = utils.export_rule_data(
+                self.variables_class, self.actions_class, options_limit=0
+            )
+        utils.validate_rule_data(
+            self.variables_class,
+            self.actions_class,
+            rule,
+            rule_schema=self._rule_schema,
+        )
+        conditions = rule.get("conditions")
+        conditions_needed = engine._conditions_needed(
+            rule["actions"], self.actions_class
+        )
+        simplifications = ()
+        if conditions is not None:
+            conditions = _compile_conditions(conditions, self.variables_class)
+            if self.simplify:
+                conditions, simplifications = simplify_conditions(
+                    conditions, keep_results=conditions_needed
+                )
+        bound_actions = tuple(
+            engine.bind_action(self.actions_class, action) for action in rule["actions"]
+        )
+        return CompiledRule(
+            rule_id, rule, conditions, bound_actions, conditions_needed, simplifications
+        )
+
+    def _index(self, compiled_rule):
+        rule_id = compiled_rule.rule_id
+        for name in compiled_rule.variables:
+            self.variable_index.setdefault(name, {})[rule_id] = None
+        for condition in iter_conditions(compiled_rule.conditions):
+            rule_ids = self.condition_index.setdefault(condition.key, {})
+            rule_ids[rule_id] = rule_ids.get(rule_id, 0) + 1
+
+    def _unindex(self, compiled_rule):
+        rule_id = compiled_rule.rule_id
+        for name in compiled_rule.variables:
+            rule_ids = self.variable_index[name]
+            del rule_ids[rule_id]
+            if not rule_ids:
+                del self.variable_index[name]
+        for condition in iter_conditions(compiled_rule.conditions):
+            rule_ids = self.condition_index[condition.key]
+            rule_ids[rule_id] -= 1
+            if not rule_ids[rule_id]:
+                del rule_ids[rule_id]
+                if not rule_ids:
+                    del self.condition_index[condition.key]
+
+
+def compile_rules(
+    rule_list, variables_class, actions_class, rule_ids=None, simplify=False
+):
+    """
+    Validates every rule against the given Variables and Actions classes and
+    compiles them, casting condition values so type errors are raised now
+    instead of when a fact reaches the condition.
+
+    :param rule_list: List of rules, as accepted by run_all
+    :param variables_class: BaseVariables subclass the rules are run with
+    :param actions_class: BaseActions subclass the rules are run with
+    :param rule_ids: Ids of the rules, defaults to their "id" key or their position
+    :param simplify: Simplify the conditions of the rules, see business_rules.simplify
+    :return: CompiledRuleSet
+    :raises AssertionError: If a rule is not valid
+    """
+    rule_set = CompiledRuleSet(variables_class, actions_class, simplify=simplify)
+
+    if rule_ids is None:
+        rule_ids = [None] * len(rule_list)
+    for rule, rule_id in zip(rule_list, rule_ids):
+        rule_set.add_rule(rule, rule_id=rule_id)
+
+    return rule_set
+
+
+def _compile_conditions(conditions, variables_class):
+    keys = list(conditions.keys())
+    if keys == [ALL] or keys == [ANY]:
+        kind = keys[0]
+        assert len(conditions[kind]) >= 1
+        return ConditionGroup(
+            kind,
+            tuple(
+                _compile_conditions(condition, variables_class)
+                for condition in conditions[kind]
+            ),
+        )
+
+    return CompiledCondition(
+        conditions, getattr(variables_class, conditions["name"]).field_type
+    )
+
+
+def _operator_function(field_type, operator):
+    method = getattr(field_type, operator)
+    entry = OPERATORS.get((field_type, operator))
+    if entry is not None and entry.method is method:
+        return entry.function
+    return getattr(method, "__wrapped__", method)
+
+
+def iter_conditions(node):
+    """
+    Yields every CompiledCondition in a compiled conditions tree.
+    """
+    if node is None:
+        return
+    if isinstance(node, ConditionGroup):
+        for child in node.children:
+            for condition in iter_conditions(child):
+                yield condition
+    else:
+        yield node
+
+
+def _check_compiled_rule(compiled_rule, defined_variables, defined_actions):
+    """
+    :return: Tuple (whether the rule triggers, condition results if its actions
+             need them)
+    """
+    conditions = compiled_rule.conditions
+    if conditions is None:
+        return True, []
+    if compiled_rule.conditions_needed:
+        return check_compiled_conditions(
+            conditions, defined_variables, compiled_rule.rule
+        )
+    return _check_compiled_conditions(
+        conditions, defined_variables, compiled_rule.rule
+    ), []
+
+
+def check_compiled_conditions(node, defined_variables, rule):
+    """
+    Same as business_rules.engine.check_conditions_recursively for compiled conditions.
+    """
+    if isinstance(node, ConditionGroup):
+        if node.kind == ALL:
+            matches = []
+            for child in node.children:
+                check_condition_result, matches_results = check_compiled_conditions(
+                    child, defined_variables, rule
+                )
+                if not check_condition_result:
+                    return False, []
+                matches.extend(matches_results)
+            return True, matches
+
+        for child in node.children:
+            check_condition_result, matches_results = check_compiled_conditions(
+                child, defined_variables, rule
+            )
+            if check_condition_result:
+                return True, matches_results
+        return False, []
+
+    result = check_compiled_condition(node, defined_variables, rule)
+    return result[0], [result]
+
+
+def _check_compiled_conditions(node, defined_variables, rule):
+    """
+    Same as check_compiled_conditions without collecting the results of the
+    single conditions.
+    :return: Result of the condition check
+    """
+    if isinstance(node, ConditionGroup):
+        if node.kind == ALL:
+            for child in node.children:
+                if not _check_compiled_conditions(child, defined_variables, rule):
+                    return False
+            return True
+
+        for child in node.children:
+            if _check_compiled_conditions(child, defined_variables, rule):
+                return True
+        return False
+
+    return _evaluate_compiled_condition(node, defined_variables, rule)
+
+
+def check_compiled_condition(condition, defined_variables, rule):
+    """
+    Same as business_rules.engine.check_condition for a compiled condition.
+    :return: business_rules.models.ConditionResult
+    """
+    return ConditionResult(
+        _evaluate_compiled_condition(condition, defined_variables, rule),
+        condition.name,
+        condition.operator,
+        condition.value,
+        condition.params,
+    )
+
+
+def _evaluate_compiled_condition(condition, defined_variables, rule):
+    instrumentation = engine._instrumentation
+    if instrumentation is not None:
+        start = perf_counter()
+
+    operator_type = engine._get_variable_value(
+        defined_variables, condition.name, condition.params, rule
+    )
+    if type(operator_type) is condition.field_type:
+        if condition.no_input:
+            result = condition.compare(operator_type)
+        else:
+            result = condition.compare(operator_type, condition.typed_value)
+    else:
+        # Variables overridden with another type in a subclass of the variables class
+        result = engine._do_operator_comparison(
+            operator_type, condition.operator, condition.typed_value
+        )
+
+    if instrumentation is not None:
+        instrumentation.condition_evaluated(
+            rule, condition.condition, result, perf_counter() - start
+        )
+    return result
+
+
+def content_hash(rule_list):
+    """
+    Hash of the content of a list of rules, independent of dict key order.
+    """
+    data = json.dumps(rule_list, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def schema_fingerprint(variables_class, actions_class):
+    """
+    Hash of the variables, actions and operators available to the rules, and
+    of how the actions are bound to them. It changes whenever compiled rules
+    may no longer be valid.
+    """
+    schema = utils.export_rule_data(variables_class, actions_class, options_limit=0)
+    schema["action_bindings"] = {
+        action["name"]: _action_binding(getattr(actions_class, action["name"]))
+        for action in actions_class.get_all_actions()
+    }
+    data = json.dumps(schema, sort_keys=True, default=str)
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _action_binding(method):
+    # What engine.bind_action stores in the compiled rules, and whether the
+    # action receives the conditions that simplify keeps for it
+    return [
+        getfullargspec(method).varkw is not None,
+        getattr(method, "batch", False) is True,
+        getattr(method, "idempotent", False) is True,
+        getattr(method, "accepts_conditions", True) is True,
+    ]
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return tuple(sorted((k, _freeze(v)) for k, v in value.items()))
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
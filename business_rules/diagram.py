@@ -0,0 +1,533 @@
+"""
+Compiles a rule set to a decision diagram over its distinct conditions.
+
+The conditions of every rule become a reduced ordered binary decision diagram
+over the predicates of a BitsetRuleSet, and the diagrams of all the rules are
+merged into one multi-terminal diagram whose leaves are the rules triggered
+by the facts reaching them. Running the rules for a fact walks a single path
+from the root, testing each predicate at most once, then runs the actions of
+the rules of the leaf.
+
+Diagrams can grow exponentially with the number of predicates. Past
+`max_nodes`, no diagram is built and the rules run with a fallback engine.
+"""
+
+from . import engine
+from .bitset import BitsetRuleSet, _condition_results, _Evaluation
+from .compiler import ALL, _freeze
+from .intervals import condition_region, covers_everything, ends_before, is_subset
+
+# Maximum number of nodes of the diagram, and of the diagrams of the rules
+MAX_NODES = 10000
+
+_FALSE = 0
+_TRUE = 1
+
+
+class DiagramNode(object):
+    """
+    Internal node of the decision diagram: the predicate `bit` is tested, the
+    walk continues with `high` if it is true and with `low` otherwise. Leaves
+    are tuples of the positions of the triggered rules.
+    """
+
+    __slots__ = ("bit", "low", "high")
+
+    def __init__(self, bit, low, high):
+        self.bit = bit
+        self.low = low
+        self.high = high
+
+
+class DiagramTooLarge(Exception):
+    pass
+
+
+class DecisionDiagramRuleSet(object):
+    """
+    Runs the rules of a CompiledRuleSet by walking a decision diagram.
+
+    Every predicate on the path of a fact is evaluated before any action
+    runs, so actions must not change the values of the variables. Instrumented
+    runs, and rule sets whose diagram would exceed `max_nodes`, use the
+    fallback engine. The rule set is read when building, build a new
+    DecisionDiagramRuleSet after editing it.
+    """
+
+    def __init__(self, rule_set, max_nodes=MAX_NODES, fallback=None):
+        """
+        :param rule_set: business_rules.compiler.CompiledRuleSet
+        :param max_nodes: Maximum number of nodes of the diagram
+        :param fallback: Engine with a run_all method, a BitsetRuleSet by default
+        """
+        self.rule_set = rule_set
+        self.bitset_rules = BitsetRuleSet(rule_set)
+        self.fallback = fallback if fallback is not None else self.bitset_rules
+        rules = self.bitset_rules.rules
+        # Position of each rule when running by priority
+        self._ranks = [0] * len(rules)
+        for rank, (i, _) in enumerate(rule_set._get_priority_order()):
+            self._ranks[i] = rank
+        # Rule passed to the variables of each predicate: its first rule
+        self._predicate_rules = [None] * len(self.bitset_rules.predicates)
+        for rule in reversed(rules):
+            for bit in _bits(rule.tree):
+                self._predicate_rules[bit] = rule.compiled_rule.rule
+
+        try:
+            self.root, self.node_count = _Builder(self.bitset_rules, max_nodes).build()
+        except DiagramTooLarge:
+            self.root, self.node_count = None, None
+
+    def __len__(self):
+        return len(self.bitset_rules)
+
+    @property
+    def uses_fallback(self):
+        return self.root is None
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all.
+        """
+        if self.root is None or engine._instrumentation is not None:
+            return self.fallback.run_all(
+                defined_variables,
+                defined_actions,
+                stop_on_first_trigger=stop_on_first_trigger,
+                by_priority=by_priority,
+            )
+
+        evaluation = _Evaluation(self.bitset_rules.predicates, defined_variables)
+        triggered = self._walk(evaluation)[0]
+        if by_priority:
+            triggered = sorted(triggered, key=self._ranks.__getitem__)
+        if stop_on_first_trigger:
+            triggered = triggered[:1]
+
+        results = [False] * len(self.bitset_rules.rules)
+        for i in triggered:
+            bitset_rule = self.bitset_rules.rules[i]
+            compiled_rule = bitset_rule.compiled_rule
+            checked_conditions_results = []
+            if bitset_rule.tree is not None and compiled_rule.conditions_needed:
+                _, checked_conditions_results = _condition_results(
+                    bitset_rule.tree,
+                    compiled_rule.conditions,
+                    evaluation,
+                    compiled_rule.rule,
+                )
+            engine.do_bound_actions(
+                compiled_rule.bound_actions,
+                defined_actions,
+                checked_conditions_results,
+                compiled_rule.rule,
+            )
+            results[i] = True
+        return results
+
+    def report(self, samples=None):
+        """
+        Compares the number of predicates tested per fact by the diagram with
+        the number of conditions tested by run_all. Without samples, every
+        predicate is assumed to be true for half of the facts, independently.
+        :param samples: Optional list of Variables instances to measure instead
+        :return:
+        {
+            'rules': 100, 'conditions': 250, 'predicates': 40, 'nodes': 300,
+            'uses_fallback': False,
+            'expected_tests': 6.5,     # per fact, walking the diagram
+            'naive_expected_tests': 180.2,    # per fact, with run_all
+        }
+        """
+        rules = self.bitset_rules.rules
+        report = {
+            "rules": len(rules),
+            "conditions": self.bitset_rules.condition_count,
+            "predicates": len(self.bitset_rules.predicates),
+            "nodes": self.node_count,
+            "uses_fallback": self.uses_fallback,
+        }
+
+        if not samples:
+            report["naive_expected_tests"] = sum(
+                _expected_tests(rule.tree)[0] for rule in rules
+            )
+            report["expected_tests"] = (
+                None if self.root is None else _expected_path_length(self.root, {})
+            )
+            return report
+
+        naive_tests = tests = 0
+        for defined_variables in samples:
+            evaluation = _Evaluation(self.bitset_rules.predicates, defined_variables)
+            if self.root is not None:
+                tests += self._walk(evaluation)[1]
+            for rule in rules:
+                naive_tests += _count_tests(
+                    rule.tree, evaluation, self._predicate_rules
+                )[0]
+        report["naive_expected_tests"] = naive_tests / float(len(samples))
+        report["expected_tests"] = (
+            None if self.root is None else tests / float(len(samples))
+        )
+        return report
+
+    def _walk(self, evaluation):
+        """
+        :return: Tuple (positions of the triggered rules, number of predicates tested)
+        """
+        node = self.root
+        predicate_rules = self._predicate_rules
+        tests = 0
+        while type(node) is DiagramNode:
+            bit = node.bit
+            tests += 1
+            if evaluation.value(bit, predicate_rules[bit]):
+                node = node.high
+            else:
+                node = node.low
+        return node, tests
+
+
+class _Builder(object):
+    """
+    Builds the diagram: a reduced ordered BDD for every rule, with nodes
+    shared between rules, then merged into one multi-terminal diagram.
+    """
+
+    def __init__(self, bitset_rules, max_nodes):
+        self.bitset_rules = bitset_rules
+        self.max_nodes = max_nodes
+        # bit -> values of the variable for which the predicate is true, if known
+        self.regions = {}
+        # bit -> bits of predicates with a region on the same variable
+        self.groups = {}
+        self._group_predicates(bitset_rules)
+        self.levels = _levels(bitset_rules.predicates, self.groups, self.regions)
+        self.implied_cache = {}
+        self.restrict_cache = {}
+        # BDD node id -> (bit, low id, high id), ids 0 and 1 are False and True
+        self.nodes = [None, None]
+        self.unique = {}
+        self.apply_cache = {}
+        self.merge_cache = {}
+        self.diagram_nodes = {}
+        self.leaves = {}
+
+    def build(self):
+        pending = []
+        triggered = []
+        try:
+            for i, rule in enumerate(self.bitset_rules.rules):
+                node = _TRUE if rule.tree is None else self.rule_node(rule.tree)
+                if node == _TRUE:
+                    triggered.append(i)
+                elif node != _FALSE:
+                    pending.append((i, node))
+            root = self.merge(tuple(pending), tuple(triggered))
+        except RecursionError:
+            raise DiagramTooLarge()
+        return root, len(self.diagram_nodes)
+
+    def rule_node(self, tree):
+        if isinstance(tree, int):
+            return self.make(tree, _FALSE, _TRUE)
+
+        kind, children = tree
+        conjunction = kind == ALL
+        node = _TRUE if conjunction else _FALSE
+        for child in children:
+            node = self.apply(conjunction, node, self.rule_node(child))
+        return node
+
+    def make(self, bit, low, high):
+        if low == high:
+            return low
+        key = (bit, low, high)
+        node = self.unique.get(key)
+        if node is None:
+            if len(self.nodes) >= self.max_nodes:
+                raise DiagramTooLarge()
+            node = self.unique[key] = len(self.nodes)
+            self.nodes.append(key)
+        return node
+
+    def apply(self, conjunction, u, v):
+        """AND (if `conjunction`) or OR of BDD nodes u and v."""
+        absorbing, neutral = (_FALSE, _TRUE) if conjunction else (_TRUE, _FALSE)
+        if u == absorbing or v == absorbing:
+            return absorbing
+        if u == neutral or u == v:
+            return v
+        if v == neutral:
+            return u
+
+        key = (conjunction, u, v) if u < v else (conjunction, v, u)
+        node = self.apply_cache.get(key)
+        if node is None:
+            bit = self._top_bit(u, v)
+            u_low, u_high = self._cofactors(u, bit)
+            v_low, v_high = self._cofactors(v, bit)
+            node = self.apply_cache[key] = self.make(
+                bit,
+                self.apply(conjunction, u_low, v_low),
+                self.apply(conjunction, u_high, v_high),
+            )
+        return node
+
+    def merge(self, pending, triggered):
+        """
+        Diagram of the rules in `pending`, a tuple of (rule position, BDD node),
+        when the rules in `triggered` already triggered.
+        """
+        if not pending:
+            return self.leaves.setdefault(triggered, triggered)
+
+        key = (pending, triggered)
+        diagram_node = self.merge_cache.get(key)
+        if diagram_node is not None:
+            return diagram_node
+
+        bit = self._top_bit(*(node for _, node in pending))
+        branches = []
+        for branch in (False, True):
+            branch_pending = []
+            branch_triggered = list(triggered)
+            for i, node in pending:
+                node = self.restrict(node, bit, branch)
+                if node == _TRUE:
+                    branch_triggered.append(i)
+                elif node != _FALSE:
+                    branch_pending.append((i, node))
+            branches.append(
+                self.merge(tuple(branch_pending), tuple(sorted(branch_triggered)))
+            )
+
+        low, high = branches
+        if low is high:
+            diagram_node = low
+        else:
+            unique_key = (bit, id(low), id(high))
+            diagram_node = self.diagram_nodes.get(unique_key)
+            if diagram_node is None:
+                if len(self.diagram_nodes) >= self.max_nodes:
+                    raise DiagramTooLarge()
+                diagram_node = self.diagram_nodes[unique_key] = DiagramNode(
+                    bit, low, high
+                )
+        self.merge_cache[key] = diagram_node
+        return diagram_node
+
+    def restrict(self, node, bit, branch):
+        """
+        BDD node `node` knowing that predicate `bit` is `branch`, and the
+        predicates on the same variable this implies.
+        """
+        if node <= _TRUE:
+            return node
+        key = (node, bit, branch)
+        result = self.restrict_cache.get(key)
+        if result is None:
+            values = self.implied(bit, branch)
+            node_bit, low, high = self.nodes[node]
+            value = values.get(node_bit)
+            if value is not None:
+                result = self.restrict(high if value else low, bit, branch)
+            else:
+                result = self.make(
+                    node_bit,
+                    self.restrict(low, bit, branch),
+                    self.restrict(high, bit, branch),
+                )
+            self.restrict_cache[key] = result
+        return result
+
+    def implied(self, bit, branch):
+        """
+        Values of the predicates known when predicate `bit` is `branch`.
+        :return: Dict {bit: bool}, including `bit`
+        """
+        key = (bit, branch)
+        values = self.implied_cache.get(key)
+        if values is None:
+            values = self.implied_cache[key] = {bit: branch}
+            region = self.regions.get(bit)
+            for other in self.groups.get(bit, ()):
+                if other == bit:
+                    continue
+                value = _implied_value(region, branch, self.regions[other])
+                if value is not None:
+                    values[other] = value
+        return values
+
+    def _group_predicates(self, bitset_rules):
+        variables_class = bitset_rules.rule_set.variables_class
+        groups = {}
+        for bit, condition in enumerate(bitset_rules.predicates):
+            region = condition_region(condition)
+            # The value of variables receiving the rule may differ between rules
+            if region is None or getattr(variables_class, condition.name).accepts_rule:
+                continue
+            self.regions[bit] = region
+            group = groups.setdefault((condition.name, _freeze(condition.params)), [])
+            group.append(bit)
+            self.groups[bit] = group
+
+    def _top_bit(self, *nodes):
+        levels = self.levels
+        return min((self.nodes[node][0] for node in nodes), key=levels.__getitem__)
+
+    def _cofactors(self, node, bit):
+        if node <= _TRUE:
+            return node, node
+        node_bit, low, high = self.nodes[node]
+        if node_bit != bit:
+            return node, node
+        return low, high
+
+
+def _levels(predicates, groups, regions):
+    """
+    Order of the predicates in the diagram: predicates on the same variable
+    are next to each other, in order of first appearance. Predicates with a
+    region are ordered so that testing them halves the remaining values, like
+    a binary search.
+    """
+    variable_ranks = {}
+    for condition in predicates:
+        variable_ranks.setdefault(condition.name, len(variable_ranks))
+    order = sorted(
+        range(len(predicates)),
+        key=lambda bit: (variable_ranks[predicates[bit].name], bit in regions, bit),
+    )
+
+    levels = [0] * len(predicates)
+    placed = set()
+    level = 0
+    for bit in order:
+        if bit in placed:
+            continue
+        group = [bit]
+        if bit in groups:
+            group = _bisection_order(
+                sorted(groups[bit], key=lambda b: _bounds_key(regions[b]))
+            )
+        for grouped_bit in group:
+            levels[grouped_bit] = level
+            level += 1
+            placed.add(grouped_bit)
+    return levels
+
+
+def _bisection_order(items):
+    """Middle item first, then the middles of each half, and so on."""
+    order = []
+    ranges = [(0, len(items))]
+    while ranges:
+        next_ranges = []
+        for start, end in ranges:
+            if start < end:
+                middle = (start + end) // 2
+                order.append(items[middle])
+                next_ranges.append((start, middle))
+                next_ranges.append((middle + 1, end))
+        ranges = next_ranges
+    return order
+
+
+def _bounds_key(region):
+    low, _, high, _ = region
+    return (low is not None, low, high is None, high)
+
+
+def _implied_value(region, value, other_region):
+    """
+    Value of the predicate with `other_region` when the predicate with
+    `region` is `value`, None if it can be either.
+    """
+    if value:
+        if is_subset(region, other_region):
+            return True
+        if ends_before(region, other_region) or ends_before(other_region, region):
+            return False
+        return None
+    if is_subset(other_region, region):
+        return False
+    if covers_everything(region, other_region):
+        return True
+    return None
+
+
+def _bits(tree):
+    if tree is None:
+        return
+    if isinstance(tree, int):
+        yield tree
+        return
+    for child in tree[1]:
+        for bit in _bits(child):
+            yield bit
+
+
+def _expected_tests(tree):
+    """
+    Expected number of conditions run_all tests for `tree` when every
+    condition is true with probability 1/2.
+    :return: Tuple (expected tests, probability that `tree` is true)
+    """
+    if tree is None:
+        return 0.0, 1.0
+    if isinstance(tree, int):
+        return 1.0, 0.5
+
+    kind, children = tree
+    conjunction = kind == ALL
+    tests = 0.0
+    # Probability that the walk reaches the next child
+    reach = 1.0
+    for child in children:
+        child_tests, child_true = _expected_tests(child)
+        tests += reach * child_tests
+        reach *= child_true if conjunction else 1 - child_true
+    return tests, reach if conjunction else 1 - reach
+
+
+def _expected_path_length(node, cache):
+    if type(node) is not DiagramNode:
+        return 0.0
+    length = cache.get(id(node))
+    if length is None:
+        length = cache[id(node)] = 1 + 0.5 * (
+            _expected_path_length(node.low, cache)
+            + _expected_path_length(node.high, cache)
+        )
+    return length
+
+
+def _count_tests(tree, evaluation, predicate_rules):
+    """
+    :return: Tuple (number of conditions run_all tests for `tree`, result of `tree`)
+    """
+    if tree is None:
+        return 0, True
+    if isinstance(tree, int):
+        return 1, evaluation.value(tree, predicate_rules[tree])
+
+    kind, children = tree
+    conjunction = kind == ALL
+    tests = 0
+    for child in children:
+        child_tests, result = _count_tests(child, evaluation, predicate_rules)
+        tests += child_tests
+        if result != conjunction:
+            return tests, result
+    return tests, conjunction
@@ -1,19 +1,159 @@
 import inspect
 import logging
-
-from . import utils
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import partial, wraps
+from itertools import count
+from time import perf_counter
+
+from . import caching, utils
+from .agenda import Agenda
 from .fields import FIELD_NO_INPUT
-from .models import ConditionResult
+from .models import ActionCall, BoundAction, ConditionResult, Plan, PlannedAction
+from .operators import OPERATORS
 from .util import method_type
 from .util.compat import getfullargspec
 
 logger = logging.getLogger(__name__)
 
+# business_rules.instrumentation.Instrumentation receiving engine events, if any
+_instrumentation = None
+
+# business_rules.executors.ActionExecutor running the actions, if any
+_executor = None
+
+# Whether every variable is trusted to return values of its type, and one every
+# how many values of trusted variables are validated anyway (None for none)
+_trust_variables = False
+_validate_every = None
+_trusted_values = count()
+
+# _ActionBatch collecting the calls of batch actions, within batch_actions()
+_action_batch = ContextVar("business_rules_action_batch", default=None)
+
+# Idempotent actions already run by the current run_all, as (name, params) keys
+_idempotent_calls = ContextVar("business_rules_idempotent_calls", default=None)
+
+
+def idempotence_scope(func):
+    """
+    Decorator for the functions running rules for one fact, such as run_all:
+    an idempotent action (declared with rule_action(idempotent=True)) runs at
+    most once with the same params within a call of the function.
+    """
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _idempotent_calls.set(set())
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _idempotent_calls.reset(token)
+
+    return wrapper
+
+
+def set_instrumentation(instrumentation):
+    """
+    Sends engine events to `instrumentation` (None to stop sending them).
+    :param instrumentation: business_rules.instrumentation.Instrumentation
+    :return: Instrumentation previously installed
+    """
+    global _instrumentation
+    previous = _instrumentation
+    _instrumentation = instrumentation
+    return previous
+
+
+@contextmanager
+def instrumented(instrumentation):
+    """
+    Context manager sending engine events to `instrumentation` while it is active.
+    """
+    previous = set_instrumentation(instrumentation)
+    try:
+        yield instrumentation
+    finally:
+        set_instrumentation(previous)
+
+
+def set_executor(executor):
+    """
+    Runs actions with `executor` instead of right away (None to run them right away).
+    :param executor: business_rules.executors.ActionExecutor
+    :return: Executor previously installed
+    """
+    global _executor
+    previous = _executor
+    _executor = executor
+    return previous
+
 
-def run_all(rule_list, defined_variables, defined_actions, stop_on_first_trigger=False):
+@contextmanager
+def executing(executor):
+    """
+    Context manager running actions with `executor` while it is active. The
+    submitted actions are flushed when it exits without an exception.
+    """
+    previous = set_executor(executor)
+    try:
+        yield executor
+    finally:
+        set_executor(previous)
+    executor.flush()
+
+
+def set_trusted_variables(trusted, validate_every=None):
+    """
+    Trusts every variable to return values of its type, as the variables
+    declared with rule_variable(trusted=True): their values are used without
+    being validated nor cast.
+    :param trusted: Trust every variable, not only the ones declared trusted
+    :param validate_every: Validate one value of trusted variables every
+                           `validate_every` anyway, raising AssertionError if
+                           it is not a value of the type. None to never validate.
+    :return: Tuple (trusted, validate_every) previously set
+    """
+    global _trust_variables, _validate_every
+    if validate_every is not None and validate_every < 1:
+        raise AssertionError(
+            "validate_every must be at least 1, not {0}".format(validate_every)
+        )
+    previous = _trust_variables, _validate_every
+    _trust_variables = trusted
+    _validate_every = validate_every
+    return previous
+
+
+@contextmanager
+def trusted_variables(trusted=True, validate_every=None):
+    """
+    Context manager trusting variables as set_trusted_variables while it is active.
+    """
+    previous = set_trusted_variables(trusted, validate_every)
+    try:
+        yield
+    finally:
+        set_trusted_variables(*previous)
+
+
+@idempotence_scope
+def run_all(
+    rule_list,
+    defined_variables,
+    defined_actions,
+    stop_on_first_trigger=False,
+    by_priority=False,
+):
     # type: (...) -> List[bool]
+    """
+    Runs every rule of `rule_list`.
+    :param stop_on_first_trigger: Stop after the first rule that triggers
+    :param by_priority: Run the rules by decreasing "priority" instead of in list order
+    :return: List telling for each rule of `rule_list` if it triggered
+    """
     results = [False] * len(rule_list)
-    for i, rule in enumerate(rule_list):
+    for i, rule in _ordered_rules(rule_list, by_priority):
         result = run(rule, defined_variables, defined_actions)
         if result:
             results[i] = True
@@ -22,25 +162,236 @@ def run_all(rule_list, defined_variables, defined_actions, stop_on_first_trigger
     return results
 
 
-def run(rule, defined_variables, defined_actions):
-    conditions, actions = rule.get("conditions"), rule["actions"]
+def _ordered_rules(rule_list, by_priority):
+    """
+    Yields (position, rule) in the order the rules run. By priority, rules
+    are popped from an Agenda so the ones never reached are not sorted.
+    """
+    if not by_priority:
+        for item in enumerate(rule_list):
+            yield item
+        return
+
+    agenda = Agenda.from_rule_list(rule_list)
+    while agenda:
+        yield agenda.pop()
+
+
+def evaluate(
+    rule_list,
+    defined_variables,
+    actions_class,
+    stop_on_first_trigger=False,
+    by_priority=False,
+):
+    # type: (...) -> Plan
+    """
+    Evaluates the conditions of the rules like run_all, without running any
+    action. Every condition is evaluated before any action runs, so actions
+    can't change what later rules see. The plan can be run later, possibly
+    elsewhere, with commit.
+    :param actions_class: Class of the actions the plan will be committed with,
+                          to check the params of the actions and apply defaults
+    :return: business_rules.models.Plan
+    """
+    results = [False] * len(rule_list)
+    planned_actions = []
+    for i, rule in _ordered_rules(rule_list, by_priority):
+        instrumentation = _instrumentation
+        if instrumentation is not None:
+            instrumentation.rule_started(rule)
+            start = perf_counter()
+        rule_triggered, checked_conditions_results = _check_rule(
+            rule, defined_variables, actions_class
+        )
+        if instrumentation is not None:
+            instrumentation.rule_finished(rule, rule_triggered, perf_counter() - start)
 
-    if conditions is not None:
-        rule_triggered, checked_conditions_results = check_conditions_recursively(
-            conditions, defined_variables, rule
+        if rule_triggered:
+            results[i] = True
+            planned_actions.extend(
+                plan_actions(
+                    rule["actions"], actions_class, checked_conditions_results, rule
+                )
+            )
+            if stop_on_first_trigger:
+                break
+    return Plan(tuple(results), tuple(planned_actions))
+
+
+def plan_actions(actions, actions_class, checked_conditions_results, rule):
+    """
+    Resolves the actions of a triggered rule without running them.
+    :return: List of business_rules.models.PlannedAction
+    """
+    successful_conditions = tuple(x for x in checked_conditions_results if x[0])
+    planned_actions = []
+    for action in actions:
+        _, action_params = _resolve_action(actions_class, action)
+        planned_actions.append(
+            PlannedAction(
+                action["name"],
+                tuple(action_params.items()),
+                rule,
+                successful_conditions,
+            )
         )
-    else:
-        # If there are no conditions then trigger actions
-        rule_triggered = True
-        checked_conditions_results = []
+    return planned_actions
+
+
+@idempotence_scope
+def commit(plan, defined_actions):
+    """
+    Runs the actions of a plan returned by evaluate, through the current
+    batch or executor if any.
+    :param plan: business_rules.models.Plan
+    :return: Results of the plan, telling for each rule if it triggered
+    """
+    for planned_action in plan.actions:
+        method = getattr(defined_actions, planned_action.name)
+        _dispatch_action(
+            defined_actions,
+            planned_action.name,
+            method,
+            dict(planned_action.params),
+            planned_action.rule,
+            list(planned_action.conditions),
+        )
+    return list(plan.results)
+
+
+def run_all_batch(rule_list, facts, stop_on_first_trigger=False, by_priority=False):
+    # type: (...) -> List[List[bool]]
+    """
+    Runs every rule of `rule_list` for each fact within batch_actions(), so
+    batch actions are called once per action with the calls of every fact.
+    :param facts: Iterable of (defined_variables, defined_actions) tuples
+    :return: List of run_all results, one per fact
+    """
+    with batch_actions():
+        return [
+            run_all(
+                rule_list,
+                defined_variables,
+                defined_actions,
+                stop_on_first_trigger=stop_on_first_trigger,
+                by_priority=by_priority,
+            )
+            for defined_variables, defined_actions in facts
+        ]
+
+
+@contextmanager
+def batch_actions():
+    """
+    Context manager deferring the calls of batch actions (declared with
+    rule_action(batch=True)) until it exits, then calling each of them once
+    with the calls of all the facts run meanwhile, grouped by actions class
+    and action. Other actions still run right away. Deferred calls are dropped
+    if the context exits with an exception. Variables cached per batch are
+    shared within it. Nested contexts share the batch of the outermost one.
+    """
+    if _action_batch.get() is not None:
+        yield
+        return
+
+    action_batch = _ActionBatch()
+    token = _action_batch.set(action_batch)
+    try:
+        with caching.batch_scope():
+            yield
+    finally:
+        _action_batch.reset(token)
+    action_batch.flush()
+
+
+class _ActionBatch(object):
+    def __init__(self):
+        # (actions class, action name) -> (bound batch action, [ActionCall])
+        self._groups = {}
+        # (actions class, action name, params) of the idempotent actions run
+        self.idempotent_calls = set()
+
+    def add(self, method_name, method, call):
+        key = (type(call.actions), method_name)
+        group = self._groups.get(key)
+        if group is None:
+            group = self._groups[key] = (method, [])
+        group[1].append(call)
+
+    def flush(self):
+        groups, self._groups = self._groups, {}
+        for (_, method_name), (method, calls) in groups.items():
+            instrumentation = _instrumentation
+            if instrumentation is not None:
+                start = perf_counter()
+                method(calls=calls)
+                instrumentation.action_executed(
+                    method_name, [call.params for call in calls], perf_counter() - start
+                )
+            else:
+                method(calls=calls)
+
+
+def run(rule, defined_variables, defined_actions):
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        instrumentation.rule_started(rule)
+        start = perf_counter()
+        triggered = _run(rule, defined_variables, defined_actions)
+        instrumentation.rule_finished(rule, triggered, perf_counter() - start)
+        return triggered
+
+    return _run(rule, defined_variables, defined_actions)
+
+
+def _run(rule, defined_variables, defined_actions):
+    rule_triggered, checked_conditions_results = _check_rule(
+        rule, defined_variables, defined_actions
+    )
 
     if rule_triggered:
-        do_actions(actions, defined_actions, checked_conditions_results, rule)
+        do_actions(rule["actions"], defined_actions, checked_conditions_results, rule)
         return True
 
     return False
 
 
+def _check_rule(rule, defined_variables, defined_actions):
+    """
+    :return: Tuple (whether the rule triggers, condition results if its actions
+             need them)
+    """
+    conditions, actions = rule.get("conditions"), rule["actions"]
+
+    if conditions is not None:
+        if _conditions_needed(actions, defined_actions):
+            return check_conditions_recursively(conditions, defined_variables, rule)
+        return _check_conditions(conditions, defined_variables, rule), []
+
+    # If there are no conditions then trigger actions
+    return True, []
+
+
+def _conditions_needed(actions, defined_actions):
+    """
+    Tells if any of the actions receives the checked conditions. Actions that
+    are unknown or not decorated with rule_action are assumed to receive them.
+    """
+    try:
+        return any(
+            getattr(
+                getattr(defined_actions, action["name"], None),
+                "accepts_conditions",
+                True,
+            )
+            for action in actions
+        )
+    except (KeyError, TypeError):
+        # Invalid actions are reported by do_actions if the rule triggers
+        return True
+
+
 def check_conditions_recursively(conditions, defined_variables, rule):
     """
     Check if the conditions are true given a set of variables.
@@ -86,6 +437,32 @@ def check_conditions_recursively(conditions, defined_variables, rule):
         return result[0], [result]
 
 
+def _check_conditions(conditions, defined_variables, rule):
+    """
+    Same as check_conditions_recursively without collecting the results of
+    the single conditions.
+    :return: Result of the condition check
+    """
+    keys = list(conditions.keys())
+    if keys == ["all"]:
+        assert len(conditions["all"]) >= 1
+        for condition in conditions["all"]:
+            if not _check_conditions(condition, defined_variables, rule):
+                return False
+        return True
+
+    elif keys == ["any"]:
+        assert len(conditions["any"]) >= 1
+        for condition in conditions["any"]:
+            if _check_conditions(condition, defined_variables, rule):
+                return True
+        return False
+
+    else:
+        assert not ("any" in keys or "all" in keys)
+        return _evaluate_condition(conditions, defined_variables, rule)
+
+
 def check_condition(condition, defined_variables, rule):
     """
     Checks a single rule condition - the condition will be made up of
@@ -106,18 +483,38 @@ def check_condition(condition, defined_variables, rule):
             condition params: {}
         )
     """
-    name, op, value = condition["name"], condition["operator"], condition["value"]
-    params = condition.get("params", {})
-    operator_type = _get_variable_value(defined_variables, name, params, rule)
     return ConditionResult(
-        result=_do_operator_comparison(operator_type, op, value),
-        name=name,
-        operator=op,
-        value=value,
-        parameters=params,
+        _evaluate_condition(condition, defined_variables, rule),
+        condition["name"],
+        condition["operator"],
+        condition["value"],
+        condition.get("params", {}),
     )
 
 
+def _evaluate_condition(condition, defined_variables, rule):
+    """
+    Checks a single rule condition.
+    :return: Result of the condition
+    """
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        start = perf_counter()
+
+    operator_type = _get_variable_value(
+        defined_variables, condition["name"], condition.get("params", {}), rule
+    )
+    result = _do_operator_comparison(
+        operator_type, condition["operator"], condition["value"]
+    )
+
+    if instrumentation is not None:
+        instrumentation.condition_evaluated(
+            rule, condition, result, perf_counter() - start
+        )
+    return result
+
+
 def _get_variable_value(defined_variables, name, params, rule):
     """
     Call the function provided on the defined_variables object with the
@@ -145,8 +542,81 @@ def _get_variable_value(defined_variables, name, params, rule):
     )
 
     method_params = _build_variable_parameters(method, params, rule)
-    variable_value = method(**method_params)
-    return method.field_type(variable_value)
+
+    cache = getattr(method, "cache", None)
+    if cache is not None:
+        return _get_cached_variable_value(
+            defined_variables, method, name, params, method_params, cache
+        )
+
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        start = perf_counter()
+        variable_value = method(**method_params)
+        instrumentation.variable_computed(name, params, perf_counter() - start, False)
+    else:
+        variable_value = method(**method_params)
+
+    return _variable_type(method, name, variable_value)
+
+
+def _get_cached_variable_value(
+    defined_variables, method, name, params, method_params, cache
+):
+    """
+    Same as _get_variable_value for a variable declared with a cache scope,
+    reading the value from the cache of that scope first.
+    """
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        start = perf_counter()
+
+    value_cache = caching.get_cache(cache, defined_variables)
+    key = caching.cache_key(defined_variables, name, params)
+    if value_cache is not None:
+        cache_hit, operator_type = value_cache.get(key)
+    else:
+        cache_hit = False
+
+    if not cache_hit:
+        operator_type = _variable_type(method, name, method(**method_params))
+        if value_cache is not None:
+            value_cache.set(key, operator_type, caching.cache_ttl(cache))
+
+    if instrumentation is not None:
+        instrumentation.variable_computed(
+            name, params, perf_counter() - start, cache_hit
+        )
+    return operator_type
+
+
+def _variable_type(method, name, value):
+    """
+    Wraps the value of a variable in its operators.BaseType, validating and
+    casting it unless the variable is trusted.
+    """
+    field_type = method.field_type
+    if not _trust_variables and getattr(method, "trusted", False) is not True:
+        return field_type(value)
+
+    validate_every = _validate_every
+    if validate_every is not None and next(_trusted_values) % validate_every == 0:
+        _validate_trusted_value(field_type, name, value)
+    return field_type.trusted(value)
+
+
+def _validate_trusted_value(field_type, name, value):
+    try:
+        cast_value = field_type.cast(value)
+        valid = type(cast_value) is type(value) and cast_value == value
+    except AssertionError:
+        valid = False
+    if not valid:
+        raise AssertionError(
+            "Trusted variable {0} returned {1!r}, which is not a {2} value".format(
+                name, value, field_type.__name__
+            )
+        )
 
 
 def _do_operator_comparison(operator_type, operator_name, comparison_value):
@@ -162,15 +632,31 @@ def _do_operator_comparison(operator_type, operator_name, comparison_value):
     :param comparison_value:
     :return:
     """
-
-    def fallback(*args, **kwargs):
+    operator = OPERATORS.get((operator_type.__class__, operator_name))
+    if (
+        operator is None
+        or getattr(operator_type.__class__, operator_name, None) is not operator.method
+        or operator_name in operator_type.__dict__
+    ):
+        # Operators added to or replaced on a type after it was defined, or set
+        # on a single value
+        return _call_operator_method(operator_type, operator_name, comparison_value)
+
+    if operator.no_input:
+        return operator.function(operator_type)
+    if operator.cast:
+        comparison_value = operator_type._assert_valid_value_and_cast(comparison_value)
+    return operator.function(operator_type, comparison_value)
+
+
+def _call_operator_method(operator_type, operator_name, comparison_value):
+    method = getattr(operator_type, operator_name, None)
+    if method is None:
         raise AssertionError(
             "Operator {0} does not exist for type {1}".format(
                 operator_name, operator_type.__class__.__name__
             )
         )
-
-    method = getattr(operator_type, operator_name, fallback)
     if getattr(method, "input_type", "") == FIELD_NO_INPUT:
         return method()
     return method(comparison_value)
@@ -201,31 +687,181 @@ def do_actions(actions, defined_actions, checked_conditions_results, rule):
     successful_conditions = [x for x in checked_conditions_results if x[0]]
 
     for action in actions:
-        method_name = action["name"]
-        action_params = action.get("params", {})
+        method, action_params = _resolve_action(defined_actions, action)
+        _dispatch_action(
+            defined_actions,
+            action["name"],
+            method,
+            action_params,
+            rule,
+            successful_conditions,
+        )
 
-        method = getattr(defined_actions, method_name, None)
 
-        if not method:
-            raise AssertionError(
-                "Action {0} is not defined in class {1}".format(
-                    method_name, defined_actions.__class__.__name__
-                )
+def bind_action(actions_class, action):
+    """
+    Resolves an action of a rule against an actions class once, so that
+    do_bound_actions runs it without checking its params again.
+    :param actions_class: BaseActions subclass the rule is run with
+    :param action: Action of a rule
+    :return: business_rules.models.BoundAction
+    """
+    method, action_params = _resolve_action(actions_class, action)
+    return BoundAction(
+        action["name"],
+        action_params,
+        getfullargspec(method).varkw is not None,
+        getattr(method, "batch", False) is True,
+        getattr(method, "idempotent", False) is True,
+    )
+
+
+def do_bound_actions(bound_actions, defined_actions, checked_conditions_results, rule):
+    """
+    Same as do_actions for actions returned by bind_action.
+    :param bound_actions: List of business_rules.models.BoundAction
+    """
+    successful_conditions = [x for x in checked_conditions_results if x[0]]
+
+    for bound_action in bound_actions:
+        method = getattr(defined_actions, bound_action.name)
+        if bound_action.batch or bound_action.idempotent or _executor is not None:
+            _dispatch_action(
+                defined_actions,
+                bound_action.name,
+                method,
+                dict(bound_action.params),
+                rule,
+                successful_conditions,
+                bound_action.accepts_kwargs,
+            )
+        elif bound_action.accepts_kwargs:
+            method_params = {"rule": rule, "conditions": successful_conditions}
+            method_params.update(bound_action.params)
+            _execute_action(
+                bound_action.name, method, method_params, bound_action.params
+            )
+        else:
+            _execute_action(
+                bound_action.name, method, bound_action.params, bound_action.params
             )
 
-        missing_params_with_default_value = utils.check_params_valid_for_method(
-            method, action_params, method_type.METHOD_TYPE_ACTION
-        )
 
-        if missing_params_with_default_value:
-            action_params = _set_default_values_for_missing_action_params(
-                method, missing_params_with_default_value, action_params
+def _resolve_action(defined_actions, action):
+    """
+    Finds the method of an action and checks its params.
+    :param defined_actions: Actions instance or class
+    :param action: Action of a rule
+    :return: Tuple (method, params with the default values of the missing ones)
+    """
+    method_name = action["name"]
+    action_params = action.get("params", {})
+
+    method = getattr(defined_actions, method_name, None)
+
+    if not method:
+        actions_class = (
+            defined_actions
+            if isinstance(defined_actions, type)
+            else defined_actions.__class__
+        )
+        raise AssertionError(
+            "Action {0} is not defined in class {1}".format(
+                method_name, actions_class.__name__
             )
+        )
+
+    missing_params_with_default_value = utils.check_params_valid_for_method(
+        method, action_params, method_type.METHOD_TYPE_ACTION
+    )
 
+    if missing_params_with_default_value:
+        action_params = _set_default_values_for_missing_action_params(
+            method, missing_params_with_default_value, action_params
+        )
+    return method, action_params
+
+
+def _dispatch_action(
+    defined_actions,
+    method_name,
+    method,
+    action_params,
+    rule,
+    successful_conditions,
+    accepts_kwargs=None,
+):
+    """
+    Calls an action, or hands it to the current batch or executor.
+    :param accepts_kwargs: Whether the method receives the rule and conditions,
+                           None to inspect the method
+    """
+    if getattr(method, "idempotent", False) is True and not _first_call(
+        defined_actions, method_name, action_params
+    ):
+        return
+
+    if getattr(method, "batch", False) is True:
+        call = ActionCall(defined_actions, action_params, rule)
+        action_batch = _action_batch.get()
+        if action_batch is not None:
+            action_batch.add(method_name, method, call)
+            return
+        method_params = {"calls": [call]}
+    elif accepts_kwargs is None:
         method_params = _build_action_parameters(
             method, action_params, rule, successful_conditions
         )
-        method(**method_params)
+    elif accepts_kwargs:
+        method_params = {"rule": rule, "conditions": successful_conditions}
+        method_params.update(action_params)
+    else:
+        method_params = action_params
+
+    executor = _executor
+    if executor is not None:
+        executor.submit(
+            defined_actions,
+            partial(_execute_action, method_name, method, method_params, action_params),
+        )
+    else:
+        _execute_action(method_name, method, method_params, action_params)
+
+
+def _first_call(defined_actions, method_name, action_params):
+    """
+    Tells if an idempotent action did not run yet with the same params in the
+    current run_all, or in the current batch for any fact of the same actions
+    class, and records it.
+    """
+    params_key = repr(sorted(action_params.items()))
+    action_batch = _action_batch.get()
+    if action_batch is not None:
+        calls = action_batch.idempotent_calls
+        key = (type(defined_actions), method_name, params_key)
+    else:
+        calls = _idempotent_calls.get()
+        if calls is None:
+            return True
+        key = (method_name, params_key)
+
+    if key in calls:
+        return False
+    calls.add(key)
+    return True
+
+
+def _execute_action(method_name, method, method_params, action_params):
+    instrumentation = _instrumentation
+    if instrumentation is not None:
+        start = perf_counter()
+        result = method(**method_params)
+        instrumentation.action_executed(
+            method_name, action_params, perf_counter() - start
+        )
+    else:
+        result = method(**method_params)
+    return result
 
 
 def _set_default_values_for_missing_action_params(
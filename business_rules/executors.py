@@ -0,0 +1,252 @@
+"""
+Executors running the actions of triggered rules, so that slow actions do not
+hold back the evaluation of the next facts. Install one with
+business_rules.engine.executing.
+
+Actions of the same fact (the same actions instance) run one after the other
+in the order they triggered, actions of different facts may run concurrently.
+Executors hold a bounded number of pending actions: when it is reached,
+submitting blocks until an action finishes. flush() waits for the submitted
+actions and raises the first exception one of them raised.
+"""
+
+import asyncio
+import inspect
+import logging
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Pending actions per worker by default
+MAX_PENDING = 1000
+
+
+class ActionExecutor(object):
+    """
+    Runs the actions in the thread evaluating the rules, as when no executor
+    is installed. Base class of the other executors.
+    """
+
+    def __init__(self):
+        self._errors = []
+        self._errors_lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def submit(self, key, task):
+        """
+        Runs `task` after the tasks submitted before with the same key.
+        :param key: Actions instance the task belongs to
+        :param task: Function without arguments running the action
+        """
+        task()
+
+    def flush(self):
+        """
+        Waits until every submitted task ran.
+        Raises the first exception raised by a task since the last flush.
+        """
+        with self._errors_lock:
+            errors, self._errors = self._errors, []
+        if errors:
+            raise errors[0]
+
+    def close(self):
+        """Flushes and stops the workers, the executor can't be used anymore."""
+        self.flush()
+
+    def _failed(self, error):
+        logger.exception("Action failed", exc_info=error)
+        with self._errors_lock:
+            self._errors.append(error)
+
+
+class InlineActionExecutor(ActionExecutor):
+    """Runs every action right away, in the thread evaluating the rules."""
+
+
+class ThreadPoolActionExecutor(ActionExecutor):
+    """
+    Runs the actions in `workers` threads. The tasks of a key always go to the
+    same worker, which runs them in order.
+    """
+
+    def __init__(self, workers=4, max_pending=MAX_PENDING):
+        """
+        :param workers: Number of threads running actions
+        :param max_pending: Number of pending actions per worker before submit blocks
+        """
+        super(ThreadPoolActionExecutor, self).__init__()
+        self._queues = [queue.Queue(maxsize=max_pending) for _ in range(workers)]
+        self._threads = [
+            threading.Thread(
+                target=self._work,
+                args=(task_queue,),
+                name="business_rules-action-{0}".format(i),
+                daemon=True,
+            )
+            for i, task_queue in enumerate(self._queues)
+        ]
+        for thread in self._threads:
+            thread.start()
+        self._closed = False
+
+    def submit(self, key, task):
+        if self._closed:
+            raise AssertionError("Executor is closed")
+        self._queues[hash(id(key)) % len(self._queues)].put(task)
+
+    def flush(self):
+        for task_queue in self._queues:
+            task_queue.join()
+        super(ThreadPoolActionExecutor, self).flush()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            for task_queue in self._queues:
+                task_queue.put(None)
+            for thread in self._threads:
+                thread.join()
+
+    def _work(self, task_queue):
+        while True:
+            task = task_queue.get()
+            try:
+                if task is None:
+                    return
+                self._run(task)
+            except Exception as e:
+                self._failed(e)
+            finally:
+                task_queue.task_done()
+
+    def _run(self, task):
+        task()
+
+
+class ProcessPoolActionExecutor(ThreadPoolActionExecutor):
+    """
+    Runs the actions in `workers` processes. Tasks are sent to the processes
+    by as many threads, so the actions of a fact still run in order. Tasks,
+    the actions instances included, must be picklable, and actions only change
+    the copy of the instance sent to the process: use it for actions with
+    external effects only.
+    """
+
+    def __init__(self, workers=4, max_pending=MAX_PENDING, mp_context=None):
+        """
+        :param workers: Number of processes running actions
+        :param max_pending: Number of pending actions per worker before submit blocks
+        :param mp_context: multiprocessing context of the processes, "spawn" by
+                           default as forking a process with threads is unsafe
+        """
+        self._pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=mp_context or multiprocessing.get_context("spawn"),
+        )
+        super(ProcessPoolActionExecutor, self).__init__(workers, max_pending)
+
+    def close(self):
+        try:
+            super(ProcessPoolActionExecutor, self).close()
+        finally:
+            self._pool.shutdown()
+
+    def _run(self, task):
+        self._pool.submit(task).result()
+
+
+class AsyncioActionExecutor(ActionExecutor):
+    """
+    Runs the actions on an asyncio event loop, awaiting the actions that are
+    coroutine functions. Without a `loop`, the executor runs its own loop in a
+    thread. Rules must not be run from the thread of the loop, submit blocks
+    while `max_pending` actions are pending.
+    """
+
+    def __init__(self, loop=None, max_pending=MAX_PENDING):
+        """
+        :param loop: Running event loop, a new one by default
+        :param max_pending: Number of pending actions before submit blocks
+        """
+        super(AsyncioActionExecutor, self).__init__()
+        self._own_loop = loop is None
+        if self._own_loop:
+            loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(
+                target=loop.run_forever, name="business_rules-actions", daemon=True
+            )
+            self._thread.start()
+        self._loop = loop
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        # key id -> last future submitted for the key
+        self._last = {}
+        self._pending = set()
+        self._closed = False
+
+    def submit(self, key, task):
+        if self._closed:
+            raise AssertionError("Executor is closed")
+        self._slots.acquire()
+        with self._lock:
+            previous = self._last.get(id(key))
+            future = asyncio.run_coroutine_threadsafe(
+                self._run(task, previous), self._loop
+            )
+            self._last[id(key)] = future
+            self._pending.add(future)
+        future.add_done_callback(lambda done: self._done(key, done))
+
+    def flush(self):
+        while True:
+            with self._lock:
+                pending = list(self._pending)
+            if not pending:
+                break
+            for future in pending:
+                future.exception()
+        super(AsyncioActionExecutor, self).flush()
+
+    def close(self):
+        if self._closed:
+            return
+        try:
+            self.flush()
+        finally:
+            self._closed = True
+            if self._own_loop:
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join()
+                self._loop.close()
+
+    async def _run(self, task, previous):
+        if previous is not None:
+            # Errors of the previous action are reported by its own future
+            await asyncio.wait([asyncio.wrap_future(previous)])
+        result = task()
+        if inspect.isawaitable(result):
+            await result
+
+    def _done(self, key, future):
+        # Errors are recorded before the future stops being pending for flush
+        error = future.exception()
+        if error is not None:
+            self._failed(error)
+        with self._lock:
+            self._pending.discard(future)
+            if self._last.get(id(key)) is future:
+                del self._last[id(key)]
+        self._slots.release()
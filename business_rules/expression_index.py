@@ -0,0 +1,395 @@
+"""
+Boolean expression index for large rule sets made of conjunctions.
+
+Rules whose conditions are an `all` group (or a single condition) are indexed
+by their conditions that can be looked up from the value of a variable:
+string equality, select `contains`, boolean tests and numeric comparisons.
+Each indexed condition has a posting list of the rules containing it. For a
+fact, the index computes each indexed variable once, walks the posting lists
+matching its value and counts, for every rule, the indexed conditions that
+are true. A rule is a candidate when the count reaches its number of indexed
+conditions (its conjunction size), so the work depends on the conditions
+matched by the fact rather than on the number of rules. The remaining
+conditions of a candidate are then checked like the compiled rule set does.
+
+Rules that are not conjunctions, and conditions on variables receiving the
+rule, are not indexed: those rules are always candidates. The candidates are
+found before any action runs, so actions must not change the values of the
+variables.
+"""
+
+from bisect import bisect_left, bisect_right
+
+from . import engine
+from .agenda import Agenda, rule_priority
+from .compiler import (
+    ALL,
+    CompiledCondition,
+    ConditionGroup,
+    _check_compiled_conditions,
+    _freeze,
+    check_compiled_conditions,
+)
+from .intervals import condition_region
+from .models import ConditionResult
+from .operators import BooleanType, NumericType, SelectType, StringType
+
+_EQUAL = "equal"
+_CONTAINS = "contains"
+_RANGE = "range"
+
+
+class IndexedRule(object):
+    """
+    A compiled rule with its conditions split into the indexed ones and the
+    residual ones checked after retrieval. `conjuncts` are the children of the
+    rule's `all` group, flattened, None when the rule is not a conjunction.
+    """
+
+    __slots__ = ("compiled_rule", "conjuncts", "indexed", "size")
+
+    def __init__(self, compiled_rule, conjuncts, indexed):
+        self.compiled_rule = compiled_rule
+        self.conjuncts = conjuncts
+        # Conditions known to be true when the rule is a candidate
+        self.indexed = indexed
+        # Number of distinct indexed conditions
+        self.size = 0
+
+
+class ExpressionIndex(object):
+    """
+    Runs the rules of a CompiledRuleSet, only checking the rules whose
+    indexed conditions are all true for the fact. Actions must not change the
+    values of the variables. Instrumented runs go through the compiled rule
+    set. The rule set is read when building, build
+    a new ExpressionIndex after editing it.
+    """
+
+    def __init__(self, rule_set):
+        """
+        :param rule_set: business_rules.compiler.CompiledRuleSet
+        """
+        self.rule_set = rule_set
+        self.rules = []
+        # Positions of the rules without indexed conditions
+        self.unindexed = []
+        # (variable name, frozen params) -> (params, postings by kind)
+        self._variables = {}
+
+        variables_class = rule_set.variables_class
+        for position, compiled_rule in enumerate(rule_set):
+            conjuncts = _conjuncts(compiled_rule.conditions)
+            indexed = set()
+            rule = IndexedRule(compiled_rule, conjuncts, indexed)
+            entries = set()
+            for condition in conjuncts or ():
+                entry = _entry(condition, variables_class)
+                if entry is not None:
+                    indexed.add(id(condition))
+                    entries.add(entry)
+            for variable_key, kind, value in entries:
+                self._postings(variable_key, kind).add(value, position)
+            rule.size = len(entries)
+            if not entries:
+                self.unindexed.append(position)
+            self.rules.append(rule)
+
+        for _, postings in self._variables.values():
+            for kind_postings in postings.values():
+                kind_postings.freeze()
+
+    def __len__(self):
+        return len(self.rules)
+
+    def report(self):
+        """
+        :return:
+        {
+            'rules': 1000,
+            'unindexed_rules': 10,     # always checked
+            # rules by number of indexed conditions
+            'rules_by_size': {1: 200, 2: 790},
+            'variables': 12,      # variables computed for every fact
+        }
+        """
+        rules_by_size = {}
+        for rule in self.rules:
+            if rule.size:
+                rules_by_size[rule.size] = rules_by_size.get(rule.size, 0) + 1
+        return {
+            "rules": len(self.rules),
+            "unindexed_rules": len(self.unindexed),
+            "rules_by_size": rules_by_size,
+            "variables": len(self._variables),
+        }
+
+    def candidates(self, defined_variables):
+        """
+        Positions of the rules whose indexed conditions are all true for the
+        fact, including the rules without indexed conditions.
+        :return: Sorted list of positions
+        """
+        counts = {}
+        for (name, _), (params, postings) in self._variables.items():
+            value = engine._get_variable_value(
+                defined_variables, name, params, None
+            ).value
+            for kind_postings in postings.values():
+                for position in kind_postings.matches(value):
+                    counts[position] = counts.get(position, 0) + 1
+
+        rules = self.rules
+        candidates = [
+            position
+            for position, count in counts.items()
+            if count == rules[position].size
+        ]
+        candidates.extend(self.unindexed)
+        candidates.sort()
+        return candidates
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all.
+        """
+        if engine._instrumentation is not None:
+            return self.rule_set.run_all(
+                defined_variables,
+                defined_actions,
+                stop_on_first_trigger=stop_on_first_trigger,
+                by_priority=by_priority,
+            )
+
+        candidates = self.candidates(defined_variables)
+        if by_priority:
+            agenda = Agenda(
+                (rule_priority(self.rules[i].compiled_rule.rule), i, self.rules[i])
+                for i in candidates
+            )
+            ordered_rules = (agenda.pop() for _ in range(len(agenda)))
+        else:
+            ordered_rules = ((i, self.rules[i]) for i in candidates)
+
+        results = [False] * len(self.rules)
+        for i, rule in ordered_rules:
+            if self._run(rule, defined_variables, defined_actions):
+                results[i] = True
+                if stop_on_first_trigger:
+                    break
+        return results
+
+    def _run(self, indexed_rule, defined_variables, defined_actions):
+        compiled_rule = indexed_rule.compiled_rule
+        if indexed_rule.conjuncts is None:
+            return self.rule_set._run(compiled_rule, defined_variables, defined_actions)
+
+        rule = compiled_rule.rule
+        indexed = indexed_rule.indexed
+        checked_conditions_results = []
+        if compiled_rule.conditions_needed:
+            for condition in indexed_rule.conjuncts:
+                if id(condition) in indexed:
+                    checked_conditions_results.append(
+                        ConditionResult(
+                            True,
+                            condition.name,
+                            condition.operator,
+                            condition.value,
+                            condition.params,
+                        )
+                    )
+                    continue
+                check_condition_result, matches_results = check_compiled_conditions(
+                    condition, defined_variables, rule
+                )
+                if not check_condition_result:
+                    return False
+                checked_conditions_results.extend(matches_results)
+        else:
+            for condition in indexed_rule.conjuncts:
+                if id(condition) not in indexed and not _check_compiled_conditions(
+                    condition, defined_variables, rule
+                ):
+                    return False
+
+        engine.do_bound_actions(
+            compiled_rule.bound_actions,
+            defined_actions,
+            checked_conditions_results,
+            rule,
+        )
+        return True
+
+    def _postings(self, variable_key, kind):
+        _, postings = self._variables.setdefault(
+            variable_key, (dict(variable_key[1]), {})
+        )
+        kind_postings = postings.get(kind)
+        if kind_postings is None:
+            kind_postings = postings[kind] = _POSTINGS[kind]()
+        return kind_postings
+
+
+class _EqualPostings(object):
+    """Rules by value the variable must be equal to."""
+
+    def __init__(self):
+        self.postings = {}
+
+    def add(self, value, position):
+        self.postings.setdefault(value, []).append(position)
+
+    def freeze(self):
+        pass
+
+    def matches(self, value):
+        try:
+            return self.postings.get(value, ())
+        except TypeError:
+            return ()
+
+
+class _ContainsPostings(_EqualPostings):
+    """Rules by value the variable (a list) must contain, strings lower cased."""
+
+    def matches(self, values):
+        seen = set()
+        for value in values:
+            try:
+                value = _normalize(value)
+                if value in seen:
+                    continue
+                seen.add(value)
+                positions = self.postings.get(value, ())
+            except TypeError:
+                continue
+            for position in positions:
+                yield position
+
+
+class _RangePostings(object):
+    """
+    Rules by interval the variable must be in. Half-open intervals are sorted
+    by bound, so the intervals containing a value are found by bisection.
+    Bounded intervals are sorted by lower bound and checked individually
+    among those whose lower bound is close enough to the value.
+    """
+
+    def __init__(self):
+        # (low included, high included) -> [(bound, position)]
+        self.low_bounds = {True: [], False: []}
+        self.high_bounds = {True: [], False: []}
+        self.bounded = []
+        self.max_width = 0
+
+    def add(self, region, position):
+        low, low_included, high, high_included = region
+        if high is None:
+            self.low_bounds[low_included].append((low, position))
+        elif low is None:
+            self.high_bounds[high_included].append((high, position))
+        else:
+            self.bounded.append((low, low_included, high, high_included, position))
+            self.max_width = max(self.max_width, high - low)
+
+    def freeze(self):
+        for bounds in (self.low_bounds, self.high_bounds):
+            for included, entries in bounds.items():
+                entries.sort(key=lambda entry: entry[0])
+                bounds[included] = (
+                    [bound for bound, _ in entries],
+                    [position for _, position in entries],
+                )
+        self.bounded.sort(key=lambda entry: entry[0])
+        self.bounded_lows = [entry[0] for entry in self.bounded]
+
+    def matches(self, value):
+        # low <= value, low < value
+        for included, find in ((True, bisect_right), (False, bisect_left)):
+            bounds, positions = self.low_bounds[included]
+            for position in positions[: find(bounds, value)]:
+                yield position
+        # high >= value, high > value
+        for included, find in ((True, bisect_left), (False, bisect_right)):
+            bounds, positions = self.high_bounds[included]
+            for position in positions[find(bounds, value) :]:
+                yield position
+
+        start = bisect_left(self.bounded_lows, value - self.max_width)
+        end = bisect_right(self.bounded_lows, value)
+        for low, low_included, high, high_included, position in self.bounded[start:end]:
+            if (low < value or (low_included and low == value)) and (
+                value < high or (high_included and value == high)
+            ):
+                yield position
+
+
+_POSTINGS = {
+    _EQUAL: _EqualPostings,
+    _CONTAINS: _ContainsPostings,
+    _RANGE: _RangePostings,
+}
+
+
+def _conjuncts(node):
+    """Conditions and groups of an `all` group, flattened, None if `node` is not one."""
+    if node is None:
+        return None
+    if isinstance(node, CompiledCondition):
+        return (node,)
+    if node.kind != ALL:
+        return None
+
+    conjuncts = []
+    for child in node.children:
+        if isinstance(child, ConditionGroup) and child.kind == ALL:
+            conjuncts.extend(_conjuncts(child))
+        else:
+            conjuncts.append(child)
+    return tuple(conjuncts)
+
+
+def _entry(condition, variables_class):
+    """
+    :return: Tuple (variable key, kind of posting, value) for a condition that
+             can be indexed, None otherwise
+    """
+    if not isinstance(condition, CompiledCondition):
+        return None
+    if getattr(variables_class, condition.name).accepts_rule:
+        return None
+
+    variable_key = (condition.name, _freeze(condition.params))
+    field_type, operator = condition.field_type, condition.operator
+    if field_type is StringType and operator == "equal_to":
+        return variable_key, _EQUAL, condition.typed_value
+    if field_type is BooleanType and operator in ("is_true", "is_false"):
+        return variable_key, _EQUAL, operator == "is_true"
+    if field_type is SelectType and operator == "contains":
+        try:
+            value = _normalize(condition.typed_value)
+            hash(value)
+        except TypeError:
+            return None
+        return variable_key, _CONTAINS, value
+    if field_type is NumericType:
+        region = condition_region(condition)
+        if region is not None:
+            return variable_key, _RANGE, region
+    return None
+
+
+def _normalize(value):
+    # SelectType.contains compares strings case insensitively
+    if isinstance(value, str):
+        return value.lower()
+    return value
@@ -0,0 +1,164 @@
+import json
+import threading
+
+
+class Instrumentation(object):
+    """
+    Receives events from the engine while rules are run. Install one with
+    business_rules.engine.set_instrumentation or business_rules.engine.instrumented.
+    Every callback does nothing by default, subclasses override the events they need.
+    Times are in seconds.
+    """
+
+    def rule_started(self, rule):
+        pass
+
+    def rule_finished(self, rule, triggered, elapsed):
+        pass
+
+    def condition_evaluated(self, rule, condition, result, elapsed):
+        pass
+
+    def variable_computed(self, name, params, elapsed, cache_hit):
+        pass
+
+    def action_executed(self, name, params, elapsed):
+        pass
+
+
+class _Stats(object):
+    __slots__ = ("calls", "hits", "total_time", "max_time")
+
+    def __init__(self):
+        self.calls = 0
+        self.hits = 0
+        self.total_time = 0.0
+        self.max_time = 0.0
+
+    def add(self, elapsed, hit=False):
+        self.calls += 1
+        if hit:
+            self.hits += 1
+        self.total_time += elapsed
+        self.max_time = max(self.max_time, elapsed)
+
+    def as_dict(self, hits_name=None):
+        data = {
+            "calls": self.calls,
+            "total_time": self.total_time,
+            "mean_time": self.total_time / self.calls if self.calls else 0.0,
+            "max_time": self.max_time,
+        }
+        if hits_name is not None:
+            data[hits_name] = self.hits
+        return data
+
+
+class ProfilingCollector(Instrumentation):
+    """
+    Instrumentation aggregating the time spent in each rule, condition,
+    variable and action. report() returns the most expensive ones.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._rules = {}
+            self._conditions = {}
+            self._variables = {}
+            self._actions = {}
+
+    def rule_finished(self, rule, triggered, elapsed):
+        with self._lock:
+            entry = self._rules.get(id(rule))
+            if entry is None:
+                # Keep the rule so its id is not reused while it is in the report
+                entry = self._rules[id(rule)] = (rule, _Stats())
+            entry[1].add(elapsed, triggered)
+
+    def condition_evaluated(self, rule, condition, result, elapsed):
+        key = (
+            condition["name"],
+            condition["operator"],
+            _dumps(condition.get("value")),
+            _dumps(condition.get("params", {})),
+        )
+        with self._lock:
+            entry = self._conditions.get(key)
+            if entry is None:
+                entry = self._conditions[key] = (condition, _Stats())
+            entry[1].add(elapsed, bool(result))
+
+    def variable_computed(self, name, params, elapsed, cache_hit):
+        key = (name, _dumps(params))
+        with self._lock:
+            entry = self._variables.get(key)
+            if entry is None:
+                entry = self._variables[key] = (params, _Stats())
+            entry[1].add(elapsed, cache_hit)
+
+    def action_executed(self, name, params, elapsed):
+        with self._lock:
+            stats = self._actions.get(name)
+            if stats is None:
+                stats = self._actions[name] = _Stats()
+            stats.add(elapsed)
+
+    def report(self, top_n=10):
+        """
+        Returns the `top_n` rules, conditions, variables and actions that took
+        the most time in total, most expensive first.
+        :param top_n: Number of entries of each kind, None for all of them
+        :return:
+        {
+            'rules': [{'rule': {...}, 'calls': 10, 'triggered': 2,
+                       'total_time': 0.1, ...}],
+            'conditions': [{'name': ..., 'operator': ..., 'value': ..., 'params': ...,
+                            'calls': 10, 'true': 4, 'total_time': 0.05, ...}],
+            'variables': [{'name': ..., 'params': ..., 'calls': 10,
+                           'cache_hits': 0, ...}],
+            'actions': [{'name': ..., 'calls': 2, 'total_time': 0.01, ...}],
+        }
+        """
+        with self._lock:
+            rules = [
+                dict(stats.as_dict("triggered"), rule=rule)
+                for rule, stats in self._rules.values()
+            ]
+            conditions = [
+                dict(
+                    stats.as_dict("true"),
+                    name=condition["name"],
+                    operator=condition["operator"],
+                    value=condition.get("value"),
+                    params=condition.get("params", {}),
+                )
+                for condition, stats in self._conditions.values()
+            ]
+            variables = [
+                dict(stats.as_dict("cache_hits"), name=key[0], params=params)
+                for key, (params, stats) in self._variables.items()
+            ]
+            actions = [
+                dict(stats.as_dict(), name=name)
+                for name, stats in self._actions.items()
+            ]
+
+        return {
+            "rules": _top(rules, top_n),
+            "conditions": _top(conditions, top_n),
+            "variables": _top(variables, top_n),
+            "actions": _top(actions, top_n),
+        }
+
+
+def _top(entries, top_n):
+    entries.sort(key=lambda entry: entry["total_time"], reverse=True)
+    return entries if top_n is None else entries[:top_n]
+
+
+def _dumps(value):
+    return json.dumps(value, sort_keys=True, default=str)
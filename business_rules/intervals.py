@@ -0,0 +1,117 @@
+"""
+Conditions as intervals of the values of their variable, to reason about
+conditions on the same variable without evaluating them.
+
+A region is a tuple (low, low included, high, high included) with None for
+unbounded ends. String equalities are the interval of a single value.
+"""
+
+from .operators import DateTimeType, NumericType, StringType
+
+
+def condition_region(condition):
+    """
+    Values of the variable for which `condition` is true, as an interval
+    (low, low included, high, high included) with None for unbounded ends.
+    None when the condition is not a numeric or datetime comparison or a
+    string equality.
+    """
+    value = condition.typed_value
+    if condition.field_type is DateTimeType:
+        # Condition values take the time zone of the variable when compared,
+        # so they compare with each other by their local time
+        value = value.replace(tzinfo=None)
+        return {
+            "equal_to": (value, True, value, True),
+            "after_than": (value, False, None, False),
+            "after_than_or_equal_to": (value, True, None, False),
+            "before_than": (None, False, value, False),
+            "before_than_or_equal_to": (None, False, value, True),
+        }.get(condition.operator)
+    if condition.field_type is NumericType:
+        epsilon = NumericType.EPSILON
+        return {
+            "equal_to": (value - epsilon, True, value + epsilon, True),
+            "greater_than": (value + epsilon, False, None, False),
+            "greater_than_or_equal_to": (value - epsilon, True, None, False),
+            "less_than": (None, False, value - epsilon, False),
+            "less_than_or_equal_to": (None, False, value + epsilon, True),
+        }.get(condition.operator)
+    if condition.field_type is StringType and condition.operator == "equal_to":
+        return (value, True, value, True)
+    return None
+
+
+def is_subset(region, other_region):
+    low, low_included, high, high_included = region
+    other_low, other_low_included, other_high, other_high_included = other_region
+    if other_low is not None:
+        if low is None or low < other_low:
+            return False
+        if low == other_low and low_included and not other_low_included:
+            return False
+    if other_high is not None:
+        if high is None or high > other_high:
+            return False
+        if high == other_high and high_included and not other_high_included:
+            return False
+    return True
+
+
+def ends_before(region, other_region):
+    """Tells if every value of `region` is lower than every value of `other_region`."""
+    high, high_included = region[2], region[3]
+    other_low, other_low_included = other_region[0], other_region[1]
+    if high is None or other_low is None:
+        return False
+    return high < other_low or (
+        high == other_low and not (high_included and other_low_included)
+    )
+
+
+def covers_everything(region, other_region):
+    """Tells if every value is in `region` or in `other_region`."""
+    if (region[0] is None and region[2] is None) or (
+        other_region[0] is None and other_region[2] is None
+    ):
+        return True
+    for left, right in ((region, other_region), (other_region, region)):
+        if left[0] is None and right[2] is None:
+            high, high_included, low, low_included = (
+                left[2],
+                left[3],
+                right[0],
+                right[1],
+            )
+            # No gap between the end of `left` and the start of `right`
+            if high > low or (high == low and (high_included or low_included)):
+                return True
+    return False
+
+
+def intersection(region, other_region):
+    """
+    Values in both regions, None when they have no value in common.
+    """
+    if ends_before(region, other_region) or ends_before(other_region, region):
+        return None
+    low, low_included = region[0], region[1]
+    other_low, other_low_included = other_region[0], other_region[1]
+    if low is None or (other_low is not None and other_low > low):
+        low, low_included = other_low, other_low_included
+    elif other_low == low:
+        low_included = low_included and other_low_included
+    high, high_included = region[2], region[3]
+    other_high, other_high_included = other_region[2], other_region[3]
+    if high is None or (other_high is not None and other_high < high):
+        high, high_included = other_high, other_high_included
+    elif other_high == high:
+        high_included = high_included and other_high_included
+    if (
+        low is not None
+        and high is not None
+        and low == high
+        and not (low_included and high_included)
+    ):
+        return None
+    return (low, low_included, high, high_included)
@@ -3,3 +3,21 @@ from collections import namedtuple
 ConditionResult = namedtuple(
     "ConditionResult", ["result", "name", "operator", "value", "parameters"]
 )
+
+# Call of a batch action for one fact, `params` having the default values applied
+ActionCall = namedtuple("ActionCall", ["actions", "params", "rule"])
+
+# Outcome of business_rules.engine.evaluate: `results` tells for each rule if it
+# triggered, `actions` are the PlannedAction to run, in order
+Plan = namedtuple("Plan", ["results", "actions"])
+
+# Action of a triggered rule, `params` being (name, value) tuples with the default
+# values applied and `conditions` the true conditions the action receives
+PlannedAction = namedtuple("PlannedAction", ["name", "params", "rule", "conditions"])
+
+# Action of a rule resolved against an actions class when the rules are compiled,
+# `params` having the default values applied and `accepts_kwargs` telling if the
+# method receives the rule and the true conditions
+BoundAction = namedtuple(
+    "BoundAction", ["name", "params", "accepts_kwargs", "batch", "idempotent"]
+)
@@ -1,5 +1,6 @@
 import inspect
 import re
+from collections import namedtuple
 from datetime import date, datetime, time
 from decimal import Decimal
 from functools import wraps
@@ -17,14 +18,45 @@ from .fields import (
 )
 from .utils import float_to_decimal, fn_name_to_pretty_label
 
+# Operator of a type: `method` is the operator as defined on the type, `function`
+# the same without the argument casting of type_operator and `cast` tells if
+# arguments must be cast before calling it
+Operator = namedtuple("Operator", ["method", "function", "no_input", "cast"])
+
+# (type class, operator name) -> Operator, filled when a type class is defined
+OPERATORS = {}
+
 
 class BaseType(object):
     def __init__(self, value):
         self.value = self._assert_valid_value_and_cast(value)
 
+    def __init_subclass__(cls, **kwargs):
+        super(BaseType, cls).__init_subclass__(**kwargs)
+        for name, method in inspect.getmembers(cls):
+            if getattr(method, "is_operator", False) is True:
+                OPERATORS[(cls, name)] = Operator(
+                    method,
+                    getattr(method, "__wrapped__", method),
+                    method.input_type == FIELD_NO_INPUT,
+                    method.assert_type_for_arguments,
+                )
+
     def _assert_valid_value_and_cast(self, value):
         raise NotImplementedError()
 
+    @classmethod
+    def cast(cls, value):
+        """Casts a value the same way the arguments of the operators are cast."""
+        return cls.__new__(cls)._assert_valid_value_and_cast(value)
+
+    @classmethod
+    def trusted(cls, value):
+        """Wraps a value already of the type, without validating nor casting it."""
+        operator_type = cls.__new__(cls)
+        operator_type.value = value
+        return operator_type
+
     @classmethod
     def get_all_operators(cls):
         methods = inspect.getmembers(cls)
@@ -53,6 +85,7 @@ def type_operator(input_type, label=None, assert_type_for_arguments=True):
         func.is_operator = True
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.input_type = input_type
+        func.assert_type_for_arguments = assert_type_for_arguments
 
         @wraps(func)
         def inner(self, *args, **kwargs):
@@ -0,0 +1,243 @@
+"""
+Detection of the rules of a rule set whose outcome follows from a rule running
+before them, used by the rule sets compiled with compile_rules(..., simplify=True).
+
+A rule implies an earlier rule when the earlier rule is true whenever it is,
+such as `price greater_than 10` and an earlier `price greater_than 5`. With
+stop_on_first_trigger such a rule can never trigger: either the earlier rule
+triggered and the run stopped, or it did not and neither can the rule. Without
+it, the rule is false whenever the earlier rule is. A rule with the same
+conditions as an earlier rule triggers whenever it does. Reusing the outcome
+of the earlier rule requires actions not to change the values of the variables.
+
+Conditions are compared as intervals of numeric and datetime values, string
+equalities and sets of select multiple values, the conditions on a variable
+receiving the rule are never compared. Each rule is compared with the earlier
+rules among the first MAX_CANDIDATES rules found in the variable index for its
+variables.
+"""
+
+from . import compiler
+from .intervals import condition_region, intersection, is_subset
+from .operators import SelectMultipleType, StringType
+from .simplify import _node_key, _variable_key, describe, is_never_true
+
+MAX_CANDIDATES = 200
+
+
+class RedundancyAnalysis(object):
+    """
+    Redundant rules of a rule set, in the order its rules run.
+    `never_true` are the ids of the rules that never trigger,
+    `duplicates` maps rule ids to the id of the first earlier rule with the
+    same conditions and `implied` to the id of an earlier rule they imply.
+    `unreachable` are the ids of all those rules, that can't trigger with
+    stop_on_first_trigger.
+    """
+
+    def __init__(self, never_true, duplicates, implied):
+        self.never_true = never_true
+        self.duplicates = duplicates
+        self.implied = implied
+        self.unreachable = (
+            frozenset(never_true) | frozenset(duplicates) | frozenset(implied)
+        )
+
+
+def analyze_redundancy(rule_set, by_priority=False, max_candidates=MAX_CANDIDATES):
+    """
+    :param rule_set: CompiledRuleSet to analyze
+    :param by_priority: Analyze the rules by decreasing priority rather than in order
+    :param max_candidates: Number of rules looked up in the variable index for each rule
+    :return: RedundancyAnalysis
+    """
+    if by_priority:
+        ordered_rules = [
+            compiled_rule for _, compiled_rule in rule_set._get_priority_order()
+        ]
+    else:
+        ordered_rules = list(rule_set)
+    variables_class = rule_set.variables_class
+    never_true = []
+    duplicates = {}
+    implied = {}
+    # Rules already analyzed that can be compared with the next ones
+    earlier = {}
+    first_by_key = {}
+    unconditional = None
+    for compiled_rule in ordered_rules:
+        rule_id = compiled_rule.rule_id
+        conditions = compiled_rule.conditions
+        if is_never_true(conditions):
+            never_true.append(rule_id)
+            continue
+        if any(
+            getattr(getattr(variables_class, name, None), "accepts_rule", True)
+            for name in compiled_rule.variables
+        ):
+            continue
+
+        key = None if conditions is None else _node_key(conditions)
+        if key in first_by_key:
+            duplicates[rule_id] = first_by_key[key]
+            continue
+        first_by_key[key] = rule_id
+        if unconditional is not None:
+            implied[rule_id] = unconditional
+            continue
+        if conditions is None:
+            unconditional = rule_id
+            continue
+
+        earlier_rule = _find_implied_rule(
+            compiled_rule, earlier, rule_set.variable_index, max_candidates
+        )
+        if earlier_rule is not None:
+            implied[rule_id] = earlier_rule
+        earlier[rule_id] = compiled_rule
+    return RedundancyAnalysis(never_true, duplicates, implied)
+
+
+def explain(rule_set, analysis, rule_id):
+    """Why the rule with id `rule_id` is redundant, for reports."""
+    if rule_id in analysis.duplicates:
+        return "Same conditions as rule {0}, which runs before it".format(
+            analysis.duplicates[rule_id]
+        )
+    if rule_id in analysis.implied:
+        earlier_id = analysis.implied[rule_id]
+        earlier_conditions = rule_set.get_rule(earlier_id).conditions
+        if earlier_conditions is None:
+            return "Rule {0} has no conditions and runs before it".format(earlier_id)
+        return (
+            "Rule {0} runs before it and triggers whenever it does: {1} implies {2}"
+        ).format(
+            earlier_id,
+            describe(rule_set.get_rule(rule_id).conditions),
+            describe(earlier_conditions),
+        )
+    return "Its conditions can never be true"
+
+
+def implies(node, other):
+    """
+    Tells if `other` is true whenever `node` is, for compiled conditions or
+    groups, None standing for no conditions. False when it can't be told.
+    """
+    if other is None:
+        return True
+    if node is None:
+        return False
+    other_is_group = isinstance(other, compiler.ConditionGroup)
+    if other_is_group and other.kind == compiler.ALL:
+        return all(implies(node, child) for child in other.children)
+    if isinstance(node, compiler.ConditionGroup):
+        if node.kind == compiler.ANY:
+            return all(implies(child, other) for child in node.children)
+        if any(implies(child, other) for child in node.children):
+            return True
+        if not other_is_group and _conjunction_implies(node.children, other):
+            return True
+    if other_is_group:
+        return any(implies(node, child) for child in other.children)
+    if isinstance(node, compiler.ConditionGroup):
+        return False
+    return _condition_implies(node, other)
+
+
+def _find_implied_rule(compiled_rule, earlier, variable_index, max_candidates):
+    variables = compiled_rule.variables
+    compared = set()
+    candidates = 0
+    for name in variables:
+        for rule_id in variable_index.get(name, ()):
+            candidates += 1
+            if candidates > max_candidates:
+                return None
+            if rule_id in compared or rule_id not in earlier:
+                continue
+            compared.add(rule_id)
+            conditions = earlier[rule_id].conditions
+            # Every condition of a conjunction must be implied by a condition
+            # on the same variable
+            if (
+                _is_conjunction(conditions)
+                and not earlier[rule_id].variables <= variables
+            ):
+                continue
+            if implies(compiled_rule.conditions, conditions):
+                return rule_id
+    return None
+
+
+def _is_conjunction(node):
+    if not isinstance(node, compiler.ConditionGroup):
+        return True
+    return node.kind == compiler.ALL and not any(
+        isinstance(child, compiler.ConditionGroup) for child in node.children
+    )
+
+
+def _conjunction_implies(children, other):
+    """Tells if the conditions of an `all` group together imply `other`."""
+    other_region = condition_region(other)
+    if other_region is None:
+        return False
+    variable = _variable_key(other)
+    region = None
+    for child in children:
+        if (
+            isinstance(child, compiler.ConditionGroup)
+            or _variable_key(child) != variable
+        ):
+            continue
+        child_region = condition_region(child)
+        if child_region is None:
+            continue
+        if region is None:
+            region = child_region
+            continue
+        region = intersection(region, child_region)
+        if region is None:
+            # The group is never true
+            return True
+    return region is not None and is_subset(region, other_region)
+
+
+def _condition_implies(condition, other):
+    if _variable_key(condition) != _variable_key(other):
+        return False
+    if condition.key == other.key:
+        return True
+    region, other_region = condition_region(condition), condition_region(other)
+    if region is not None and other_region is not None:
+        return is_subset(region, other_region)
+    if (
+        condition.field_type is StringType
+        and condition.operator == "equal_to"
+        and other.field_type is StringType
+    ):
+        # The variable is equal to the value of `condition`
+        args = () if other.no_input else (other.typed_value,)
+        return bool(other.compare(StringType.trusted(condition.typed_value), *args))
+    if (
+        condition.field_type is SelectMultipleType
+        and condition.operator == other.operator
+    ):
+        try:
+            values, other_values = _set(condition.typed_value), _set(other.typed_value)
+        except TypeError:
+            return False
+        if condition.operator == "contains_all":
+            return other_values <= values
+        if condition.operator in (
+            "is_contained_by",
+            "shares_at_least_one_element_with",
+        ):
+            return values <= other_values
+    return False
+
+
+def _set(values):
+    # Select multiple values are compared case insensitively
+    return {value.lower() if isinstance(value, str) else value for value in values}
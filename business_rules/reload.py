@@ -0,0 +1,208 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from .compiler import compile_rules
+
+logger = logging.getLogger(__name__)
+
+
+class RuleSetHandle(object):
+    """
+    Holds the current CompiledRuleSet and replaces it when rules change.
+
+    New rules are compiled and validated before being published, and publishing
+    is a single attribute assignment: readers never take a lock, and a run_all
+    that started before a reload finishes with the rules it started with. When
+    reloads overlap, the rules of the last one started are kept.
+    """
+
+    def __init__(self, variables_class, actions_class, rule_list=None, simplify=False):
+        """
+        :param simplify: Simplify the conditions of the rules, see compile_rules
+        """
+        self.variables_class = variables_class
+        self.actions_class = actions_class
+        self.simplify = simplify
+        self.version = 0
+        self.last_error = None
+        self._rule_set = compile_rules(
+            rule_list or [], variables_class, actions_class, simplify=simplify
+        )
+        self._reload_lock = threading.Lock()
+        # Number of reloads started, and the one whose rules are published
+        self._reloads = 0
+        self._published_reload = 0
+        self._executor = None
+        self._watcher = None
+        self._stop_watching = threading.Event()
+
+    @property
+    def current(self):
+        """The CompiledRuleSet currently published."""
+        return self._rule_set
+
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        return self._rule_set.run_all(
+            defined_variables,
+            defined_actions,
+            stop_on_first_trigger=stop_on_first_trigger,
+            by_priority=by_priority,
+        )
+
+    def reload(self, rule_list):
+        """
+        Compiles `rule_list` and publishes it. Nothing is published if the rules
+        are not valid.
+        :param rule_list: List of rules
+        :return: The CompiledRuleSet now published
+        :raises AssertionError: If a rule is not valid
+        """
+        return self._reload(rule_list, self._start_reload())
+
+    def reload_in_background(self, load_rules):
+        """
+        Calls `load_rules` and reloads the rules it returns from a background
+        thread. Errors are logged and kept in `last_error`, and the published
+        rules are left untouched.
+        :param load_rules: Callable returning a list of rules
+        :return: concurrent.futures.Future of the published CompiledRuleSet
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="business-rules-reload"
+            )
+        return self._executor.submit(self._reload_from, load_rules)
+
+    def watch(self, path, interval=1.0):
+        """
+        Reloads the rules whenever `path` changes. `path` is either a JSON file
+        with a list of rules, or a directory of JSON files each holding a rule
+        or a list of rules, read in file name order. Changes are detected by
+        polling every `interval` seconds.
+        :param path: File or directory to watch
+        :param interval: Seconds between checks
+        :return: None
+        """
+        if self._watcher is not None:
+            raise AssertionError("Already watching for rule changes")
+
+        self._stop_watching.clear()
+        # Taken before loading so that changes made while loading are not missed
+        state = _path_state(path)
+        self._reload_from(lambda: load_rules_from_path(path))
+        self._watcher = threading.Thread(
+            target=self._watch,
+            args=(path, interval, state),
+            name="business-rules-watch",
+            daemon=True,
+        )
+        self._watcher.start()
+
+    def close(self):
+        """Stops watching and waits for pending reloads."""
+        self._stop_watching.set()
+        if self._watcher is not None:
+            self._watcher.join()
+            self._watcher = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _start_reload(self):
+        with self._reload_lock:
+            self._reloads += 1
+            return self._reloads
+
+    def _reload(self, rule_list, reload_number):
+        rule_set = compile_rules(
+            rule_list, self.variables_class, self.actions_class, simplify=self.simplify
+        )
+        with self._reload_lock:
+            if reload_number < self._published_reload:
+                # A reload started later already published its rules
+                return self._rule_set
+            self._published_reload = reload_number
+            if rule_set.content_hash != self._rule_set.content_hash:
+                self._rule_set = rule_set
+                self.version += 1
+            self.last_error = None
+        return self._rule_set
+
+    def _reload_from(self, load_rules):
+        # Numbered before loading, the rules loaded later being the most recent
+        reload_number = self._start_reload()
+        try:
+            return self._reload(load_rules(), reload_number)
+        except Exception as e:
+            logger.exception("Could not reload rules, keeping version %s", self.version)
+            self.last_error = e
+            raise
+
+    def _watch(self, path, interval, last_state):
+        while not self._stop_watching.wait(interval):
+            state = _path_state(path)
+            if state == last_state:
+                continue
+            last_state = state
+            try:
+                self._reload_from(lambda: load_rules_from_path(path))
+            except Exception:
+                # Already logged, wait for the next change
+                pass
+
+
+def load_rules_from_path(path):
+    """
+    Reads a list of rules from a JSON file, or from every JSON file in a directory.
+    :param path: File or directory
+    :return: List of rules
+    """
+    if not os.path.isdir(path):
+        with open(path) as f:
+            return json.load(f)
+
+    rule_list = []
+    for file_path in _json_files(path):
+        with open(file_path) as f:
+            rules = json.load(f)
+        if isinstance(rules, dict):
+            rule_list.append(rules)
+        else:
+            rule_list.extend(rules)
+    return rule_list
+
+
+def _json_files(directory):
+    return [
+        os.path.join(directory, name)
+        for name in sorted(os.listdir(directory))
+        if name.endswith(".json")
+    ]
+
+
+def _path_state(path):
+    paths = _json_files(path) if os.path.isdir(path) else [path]
+    state = []
+    for file_path in paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            continue
+        state.append((file_path, stat.st_mtime_ns, stat.st_size))
+    return state
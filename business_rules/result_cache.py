@@ -0,0 +1,279 @@
+"""
+Reuses the evaluation of a rule set for facts that look the same to it.
+
+A fact is fingerprinted by the values of the variables the rules read. When
+a previous fact had the same fingerprint, the triggered rules and their
+condition results are taken from the cache and only the actions run.
+Otherwise the rules are evaluated with the values computed for the
+fingerprint.
+"""
+
+import threading
+from collections import OrderedDict
+
+from . import engine
+from .compiler import (
+    ALL,
+    ConditionGroup,
+    _check_compiled_rule,
+    _freeze,
+    iter_conditions,
+)
+from .models import ConditionResult
+
+# Number of fingerprints kept by default
+MAX_SIZE = 1024
+
+
+class CachedRuleSet(object):
+    """
+    Runs the rules of a CompiledRuleSet, caching the outcome of the
+    evaluation of the last `max_size` distinct facts. Actions must not change
+    the values of the variables, the cached outcome assumes the conditions of
+    a rule do not depend on the actions of the rules run before it.
+
+    Rule sets with a variable receiving the rule are not cached, nor facts
+    with a value that cannot be hashed. Instrumented runs go through the
+    compiled rule set. The rule set is read when building, build a new
+    CachedRuleSet after editing it.
+    """
+
+    def __init__(self, rule_set, max_size=MAX_SIZE):
+        """
+        :param rule_set: business_rules.compiler.CompiledRuleSet
+        :param max_size: Maximum number of cached outcomes
+        """
+        self.rule_set = rule_set
+        self.max_size = max_size
+        self._rules = list(rule_set)
+        self._lock = threading.Lock()
+        self._outcomes = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+        self._uncacheable = 0
+
+        variables_class = rule_set.variables_class
+        variables = {}
+        conditions = []
+        self.cacheable = True
+        for compiled_rule in self._rules:
+            for condition in iter_conditions(compiled_rule.conditions):
+                if getattr(variables_class, condition.name).accepts_rule:
+                    self.cacheable = False
+                variable_key = (condition.name, _freeze(condition.params))
+                variables[variable_key] = condition.params
+                conditions.append((condition, variable_key))
+        variable_keys = sorted(variables, key=repr)
+        # (name, params) of the variables making the fingerprint
+        self.variables = [
+            (name, variables[(name, frozen_params)])
+            for name, frozen_params in variable_keys
+        ]
+        # id of a condition -> position of its variable in the fingerprint
+        positions = {
+            variable_key: position
+            for position, variable_key in enumerate(variable_keys)
+        }
+        self._positions = {
+            id(condition): positions[variable_key]
+            for condition, variable_key in conditions
+        }
+
+    def __len__(self):
+        return len(self._rules)
+
+    def stats(self):
+        """
+        :return:
+        {
+            'hits': 90,
+            'misses': 10,
+            'uncacheable': 0,     # runs that could not use the cache
+            'size': 10,
+            'max_size': 1024,
+        }
+        """
+        with self._lock:
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "uncacheable": self._uncacheable,
+                "size": len(self._outcomes),
+                "max_size": self.max_size,
+            }
+
+    def clear(self):
+        """Empties the cache and resets the statistics."""
+        with self._lock:
+            self._outcomes.clear()
+            self._hits = self._misses = self._uncacheable = 0
+
+    @engine.idempotence_scope
+    def run_all(
+        self,
+        defined_variables,
+        defined_actions,
+        stop_on_first_trigger=False,
+        by_priority=False,
+    ):
+        # type: (...) -> List[bool]
+        """
+        Same as business_rules.engine.run_all.
+        """
+        if engine._instrumentation is not None:
+            return self.rule_set.run_all(
+                defined_variables,
+                defined_actions,
+                stop_on_first_trigger=stop_on_first_trigger,
+                by_priority=by_priority,
+            )
+
+        if self.cacheable:
+            values = [
+                engine._get_variable_value(defined_variables, name, params, None)
+                for name, params in self.variables
+            ]
+            key = _fingerprint(values)
+        else:
+            values = key = None
+        if key is not None:
+            # Whether condition results are built depends on the actions class
+            key = (stop_on_first_trigger, by_priority, type(defined_actions), key)
+            with self._lock:
+                outcome = self._outcomes.get(key)
+                if outcome is not None:
+                    self._outcomes.move_to_end(key)
+                    self._hits += 1
+                else:
+                    self._misses += 1
+        else:
+            outcome = None
+            with self._lock:
+                self._uncacheable += 1
+
+        if outcome is None:
+            outcome = self._evaluate(
+                defined_variables,
+                values,
+                defined_actions,
+                stop_on_first_trigger,
+                by_priority,
+            )
+            if key is not None:
+                with self._lock:
+                    self._outcomes[key] = outcome
+                    self._outcomes.move_to_end(key)
+                    while len(self._outcomes) > self.max_size:
+                        self._outcomes.popitem(last=False)
+
+        results, triggered = outcome
+        for compiled_rule, checked_conditions_results in triggered:
+            engine.do_bound_actions(
+                compiled_rule.bound_actions,
+                defined_actions,
+                list(checked_conditions_results),
+                compiled_rule.rule,
+            )
+        return list(results)
+
+    def _evaluate(
+        self,
+        defined_variables,
+        values,
+        defined_actions,
+        stop_on_first_trigger,
+        by_priority,
+    ):
+        """
+        :param values: Values of `self.variables` for the fact, None to compute
+                       them while checking the rules
+        :return: Tuple (results, [(compiled rule, condition results)] of the
+                 triggered rules in the order they run)
+        """
+        if by_priority:
+            ordered_rules = self.rule_set._get_priority_order()
+        else:
+            ordered_rules = enumerate(self._rules)
+
+        results = [False] * len(self._rules)
+        triggered = []
+        for i, compiled_rule in ordered_rules:
+            if values is None:
+                rule_triggered, checked_conditions_results = _check_compiled_rule(
+                    compiled_rule, defined_variables, defined_actions
+                )
+            elif compiled_rule.conditions is None:
+                rule_triggered, checked_conditions_results = True, []
+            else:
+                rule_triggered, checked_conditions_results = self._check(
+                    compiled_rule.conditions,
+                    values,
+                    compiled_rule.conditions_needed,
+                )
+            if not rule_triggered:
+                continue
+            results[i] = True
+            triggered.append((compiled_rule, tuple(checked_conditions_results)))
+            if stop_on_first_trigger:
+                break
+        return tuple(results), tuple(triggered)
+
+    def _check(self, node, values, keep_results):
+        """
+        Same as compiler.check_compiled_conditions, reading the values of the
+        variables from `values`.
+        :param keep_results: Whether the results of the conditions are returned
+        :return: Tuple (result, condition results)
+        """
+        if isinstance(node, ConditionGroup):
+            if node.kind == ALL:
+                matches = []
+                for child in node.children:
+                    result, matches_results = self._check(child, values, keep_results)
+                    if not result:
+                        return False, []
+                    matches.extend(matches_results)
+                return True, matches
+
+            for child in node.children:
+                result, matches_results = self._check(child, values, keep_results)
+                if result:
+                    return True, matches_results
+            return False, []
+
+        operator_type = values[self._positions[id(node)]]
+        if type(operator_type) is node.field_type:
+            if node.no_input:
+                result = node.compare(operator_type)
+            else:
+                result = node.compare(operator_type, node.typed_value)
+        else:
+            # Variables overridden with another type in a subclass
+            result = engine._do_operator_comparison(
+                operator_type, node.operator, node.typed_value
+            )
+        if not keep_results:
+            return result, []
+        return result, [
+            ConditionResult(result, node.name, node.operator, node.value, node.params)
+        ]
+
+
+def _fingerprint(values):
+    """Key of the values of the variables read by the rules, None if unhashable."""
+    try:
+        fingerprint = tuple(_hashable(operator_type.value) for operator_type in values)
+        hash(fingerprint)
+    except TypeError:
+        return None
+    return fingerprint
+
+
+def _hashable(value):
+    if isinstance(value, (list, tuple)):
+        return tuple(_hashable(item) for item in value)
+    if isinstance(value, (set, frozenset)):
+        return frozenset(_hashable(item) for item in value)
+    if isinstance(value, dict):
+        return frozenset((key, _hashable(item)) for key, item in value.items())
+    return value
@@ -0,0 +1,258 @@
+"""
+Simplification of the conditions of compiled rules, applied to the rules of a
+rule set compiled with compile_rules(..., simplify=True).
+
+Groups nested in a group of the same kind are flattened, groups left with a
+single condition are replaced by it and duplicate conditions are removed.
+An `all` group whose conditions can't all be true, such as `greater_than 10`
+and `less_than 5` on the same variable or `is_true` and `is_false` on the same
+boolean, is folded to false, as is a rule it makes unsatisfiable.
+
+Rules whose actions receive the true conditions keep every condition they
+would send them. The other rules also lose the conditions implied by another
+condition of their group, and their `any` groups that are always true (such
+as `greater_than 5` or `less_than_or_equal_to 5`) are folded to true.
+
+Only conditions on the same variable with the same params are compared.
+"""
+
+from . import compiler
+from .intervals import condition_region, covers_everything, intersection, is_subset
+from .operators import BooleanType
+
+# An `all` group without conditions is always true, an `any` group without
+# conditions is never true
+
+
+def simplify_conditions(conditions, keep_results=True):
+    """
+    :param conditions: Compiled conditions of a rule
+    :param keep_results: Keep the conditions a triggered rule sends to its actions
+    :return: Tuple (conditions, changes). Conditions are None when they are
+             always true and an empty `any` group when they are never true,
+             changes describe each simplification.
+    """
+    changes = []
+    conditions = _simplify(conditions, keep_results, changes)
+    if is_never_true(conditions):
+        changes.append("The rule can never trigger")
+    elif isinstance(conditions, compiler.ConditionGroup) and not conditions.children:
+        changes.append("The rule always triggers")
+        conditions = None
+    return conditions, changes
+
+
+def is_never_true(conditions):
+    """Tells if simplified conditions are never true."""
+    return (
+        isinstance(conditions, compiler.ConditionGroup)
+        and conditions.kind == compiler.ANY
+        and not conditions.children
+    )
+
+
+def describe(node):
+    """Short text of a condition or group, for reports."""
+    if isinstance(node, compiler.ConditionGroup):
+        return "{0}({1})".format(
+            node.kind, ", ".join(describe(child) for child in node.children)
+        )
+    name = node.name
+    if node.params:
+        name = "{0}({1})".format(
+            name,
+            ", ".join(
+                "{0}={1!r}".format(key, value)
+                for key, value in sorted(node.params.items())
+            ),
+        )
+    if node.no_input:
+        return "{0} {1}".format(name, node.operator)
+    return "{0} {1} {2!r}".format(name, node.operator, node.value)
+
+
+def _simplify(node, keep_results, changes):
+    if not isinstance(node, compiler.ConditionGroup):
+        return node
+
+    kind = node.kind
+    children = []
+    for child in node.children:
+        child = _simplify(child, keep_results, changes)
+        if isinstance(child, compiler.ConditionGroup):
+            if not child.children:
+                if child.kind == kind:
+                    # True in an `all` group, false in an `any` group: no effect
+                    continue
+                # False in an `all` group, true in an `any` group: decides the group
+                return child
+            if child.kind == kind:
+                changes.append(
+                    "Flattened an `{0}` group nested in an `{0}` group".format(kind)
+                )
+                children.extend(child.children)
+                continue
+        children.append(child)
+
+    children = _remove_duplicates(children, kind, keep_results, changes)
+
+    if kind == compiler.ALL:
+        contradiction = _contradiction(children)
+        if contradiction is not None:
+            changes.append(
+                "`all` group can never be true: {0}".format(
+                    " and ".join(describe(condition) for condition in contradiction)
+                )
+            )
+            return compiler.ConditionGroup(compiler.ANY, ())
+    elif not keep_results:
+        tautology = _tautology(children)
+        if tautology is not None:
+            changes.append(
+                "`any` group is always true: {0}".format(
+                    " or ".join(describe(condition) for condition in tautology)
+                )
+            )
+            return compiler.ConditionGroup(compiler.ALL, ())
+
+    if not keep_results:
+        children = _remove_implied(children, kind, changes)
+
+    if len(children) == 1:
+        changes.append("Replaced an `{0}` group by its only condition".format(kind))
+        return children[0]
+    if list(node.children) == children:
+        return node
+    return compiler.ConditionGroup(kind, tuple(children))
+
+
+def _remove_duplicates(children, kind, keep_results, changes):
+    # The true conditions of an `all` group are all sent to the actions,
+    # duplicates included, while an `any` group sends the first true one
+    if keep_results and kind == compiler.ALL:
+        return children
+    unique = []
+    keys = set()
+    for child in children:
+        key = _node_key(child)
+        if key in keys:
+            changes.append("Removed duplicate condition {0}".format(describe(child)))
+            continue
+        keys.add(key)
+        unique.append(child)
+    return unique
+
+
+def _node_key(node):
+    if isinstance(node, compiler.ConditionGroup):
+        return (node.kind, tuple(_node_key(child) for child in node.children))
+    return node.key
+
+
+def _variable_key(condition):
+    # Name and frozen params
+    return condition.key[0], condition.key[3]
+
+
+def _boolean_value(condition):
+    if condition.field_type is BooleanType and condition.operator in (
+        "is_true",
+        "is_false",
+    ):
+        return condition.operator == "is_true"
+    return None
+
+
+def _contradiction(children):
+    """
+    Conditions of an `all` group that can't all be true, None if there are none.
+    """
+    regions = {}
+    booleans = {}
+    for child in children:
+        if isinstance(child, compiler.ConditionGroup):
+            continue
+        variable = _variable_key(child)
+        value = _boolean_value(child)
+        if value is not None:
+            other_value, other = booleans.setdefault(variable, (value, child))
+            if other_value != value:
+                return [other, child]
+            continue
+
+        region = condition_region(child)
+        if region is None:
+            continue
+        if variable not in regions:
+            regions[variable] = (region, [child])
+            continue
+        common, conditions = regions[variable]
+        common = intersection(common, region)
+        conditions = conditions + [child]
+        if common is None:
+            return conditions
+        regions[variable] = (common, conditions)
+    return None
+
+
+def _tautology(children):
+    """
+    Two conditions of an `any` group of which one is always true, None if
+    there are none.
+    """
+    seen = {}
+    for child in children:
+        if isinstance(child, compiler.ConditionGroup):
+            continue
+        variable = _variable_key(child)
+        value = _boolean_value(child)
+        region = condition_region(child) if value is None else None
+        for other, other_value, other_region in seen.get(variable, ()):
+            if value is not None and other_value is not None and value != other_value:
+                return [other, child]
+            if (
+                region is not None
+                and other_region is not None
+                and covers_everything(other_region, region)
+            ):
+                return [other, child]
+        seen.setdefault(variable, []).append((child, value, region))
+    return None
+
+
+def _remove_implied(children, kind, changes):
+    """
+    Removes the conditions of an `all` group implied by another condition of
+    the group, and the conditions of an `any` group implying another one.
+    """
+    regions = [
+        None if isinstance(child, compiler.ConditionGroup) else condition_region(child)
+        for child in children
+    ]
+    removed = set()
+    for i, child in enumerate(children):
+        if regions[i] is None:
+            continue
+        for j, other in enumerate(children):
+            if j == i or j in removed or regions[j] is None:
+                continue
+            if _variable_key(other) != _variable_key(child):
+                continue
+            # In an `all` group `child` is redundant when `other` implies it,
+            # in an `any` group when it implies `other`
+            if kind == compiler.ALL:
+                redundant = is_subset(regions[j], regions[i])
+                equivalent = redundant and is_subset(regions[i], regions[j])
+            else:
+                redundant = is_subset(regions[i], regions[j])
+                equivalent = redundant and is_subset(regions[j], regions[i])
+            # Of two equivalent conditions, the first one is kept
+            if redundant and (not equivalent or j < i):
+                if kind == compiler.ALL:
+                    change = "Removed {0}, implied by {1}"
+                else:
+                    change = "Removed {0}, {1} is true whenever it is"
+                changes.append(change.format(describe(child), describe(other)))
+                removed.add(i)
+                break
+    return [child for i, child in enumerate(children) if i not in removed]
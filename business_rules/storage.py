@@ -0,0 +1,152 @@
+"""
+Save compiled rule sets to disk and load them back without compiling again.
+
+File layout::
+
+    magic (4 bytes) | format version (2 bytes) | header size (4 bytes)
+    header: JSON with the content hash, schema fingerprint and section sizes
+    rules: JSON with the source rules and their ids, used to compile them again
+           when needed
+    payload: pickled CompiledRuleSet
+
+Files are unpickled when loaded: only load files you wrote yourself. The
+content hash of the loaded rules is checked against the header to detect
+truncated or corrupted files.
+"""
+
+import json
+import logging
+import mmap
+import os
+import pickle
+import struct
+
+from .compiler import compile_rules, content_hash, schema_fingerprint
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"BRRS"
+FORMAT_VERSION = 6
+
+_PREAMBLE = struct.Struct(">4sHI")
+# Raised while reading truncated or corrupted files
+_READ_ERRORS = (ValueError, KeyError, TypeError, EOFError, pickle.PickleError)
+
+
+def save_rule_set(rule_set, path):
+    """
+    Writes a CompiledRuleSet to `path`. The file is replaced atomically.
+    :param rule_set: CompiledRuleSet
+    :param path: Destination file
+    :return: None
+    """
+    rules = json.dumps(
+        {
+            "rules": rule_set.rule_list,
+            "rule_ids": rule_set.rule_ids,
+            "simplify": rule_set.simplify,
+        },
+        default=str,
+    ).encode("utf-8")
+    payload = pickle.dumps(rule_set, protocol=pickle.HIGHEST_PROTOCOL)
+    header = json.dumps(
+        {
+            "content_hash": rule_set.content_hash,
+            "schema_fingerprint": rule_set.schema_fingerprint,
+            "rule_count": len(rule_set),
+            "rules_size": len(rules),
+            "payload_size": len(payload),
+        }
+    ).encode("utf-8")
+
+    tmp_path = "{0}.tmp".format(path)
+    with open(tmp_path, "wb") as f:
+        f.write(_PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header)))
+        f.write(header)
+        f.write(rules)
+        f.write(payload)
+    os.replace(tmp_path, path)
+
+
+def load_rule_set(path, variables_class, actions_class):
+    """
+    Reads a CompiledRuleSet written by save_rule_set. The file is memory mapped
+    and the compiled rules are used as they are, unless the file was written by
+    another format version or the variables, actions or operators changed since;
+    then the rules stored in the file are compiled again.
+
+    :param path: File written by save_rule_set
+    :param variables_class: BaseVariables subclass the rules are run with
+    :param actions_class: BaseActions subclass the rules are run with
+    :return: CompiledRuleSet
+    :raises AssertionError: If the file is not a compiled rule set, or is
+                            truncated or corrupted
+    """
+    with open(path, "rb") as f:
+        # Empty files can't be memory mapped
+        if os.fstat(f.fileno()).st_size < _PREAMBLE.size:
+            raise AssertionError("{0} is not a compiled rule set file".format(path))
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            try:
+                header, rule_set, rules = _read(
+                    path, data, variables_class, actions_class
+                )
+            except _READ_ERRORS as e:
+                raise AssertionError(
+                    "{0} is not a compiled rule set file, or is truncated".format(path)
+                ) from e
+
+    if rule_set is None:
+        if isinstance(rules, list):
+            # Format version 1 only stored the rules
+            rule_set = compile_rules(rules, variables_class, actions_class)
+        else:
+            # Files of format version 2 do not tell whether to simplify
+            options = {"simplify": True} if rules.get("simplify") else {}
+            rule_set = compile_rules(
+                rules["rules"],
+                variables_class,
+                actions_class,
+                rule_ids=rules["rule_ids"],
+                **options,
+            )
+        loaded_hash = rule_set.content_hash
+    else:
+        loaded_hash = content_hash(rule_set.rule_list)
+    if loaded_hash != header["content_hash"]:
+        raise AssertionError(
+            "{0} is corrupted, its rules do not match its content hash".format(path)
+        )
+    return rule_set
+
+
+def _read(path, data, variables_class, actions_class):
+    """
+    :return: Tuple (header, the unpickled CompiledRuleSet or None, the stored
+             rules when the rule set must be compiled again)
+    """
+    magic, version, header_size = _PREAMBLE.unpack_from(data, 0)
+    if magic != MAGIC:
+        raise AssertionError("{0} is not a compiled rule set file".format(path))
+
+    start = _PREAMBLE.size
+    header = json.loads(data[start : start + header_size].decode("utf-8"))
+    rules_start = start + header_size
+    payload_start = rules_start + header["rules_size"]
+    payload_end = payload_start + header["payload_size"]
+    if len(data) < payload_end:
+        raise ValueError("Truncated file")
+
+    fingerprint = schema_fingerprint(variables_class, actions_class)
+    if version == FORMAT_VERSION and header["schema_fingerprint"] == fingerprint:
+        with memoryview(data) as view:
+            rule_set = pickle.loads(view[payload_start:payload_end])
+        rule_set.variables_class = variables_class
+        rule_set.actions_class = actions_class
+        return header, rule_set, None
+
+    logger.info(
+        "Compiling rules in %s again, the variables, actions or file format changed",
+        path,
+    )
+    return header, None, json.loads(data[rules_start:payload_start].decode("utf-8"))
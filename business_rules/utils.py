@@ -1,4 +1,5 @@
 import inspect
+import numbers
 from decimal import Context, Decimal, Inexact
 
 from .util import method_type
@@ -8,7 +9,7 @@ def fn_name_to_pretty_label(name):
     return " ".join([w.title() for w in name.split("_")])
 
 
-def export_rule_data(variables, actions):
+def export_rule_data(variables, actions, options_limit=None):
     """
     Export_rule_data is used to export all information about the
     variables, actions, and operators to the client. This will return a
@@ -18,12 +19,15 @@ def export_rule_data(variables, actions):
     - variable_type_operators: a dictionary of all field_types -> list of available operators
     :param variables:
     :param actions:
+    :param options_limit: Maximum number of options exported per variable. None
+    exports all of them, 0 omits them. Use export_variable_options to page
+    through the rest.
     :return:
     """
     from . import operators
 
     actions_data = actions.get_all_actions()
-    variables_data = variables.get_all_variables()
+    variables_data = variables.get_all_variables(options_limit=options_limit)
 
     variable_type_operators = {}
     for variable_class in inspect.getmembers(
@@ -39,6 +43,41 @@ def export_rule_data(variables, actions):
     }
 
 
+def export_variable_options(variables, name, offset=0, limit=None):
+    """
+    Export a page of the options of a single variable.
+    :param variables:
+    :param name: Name of the variable
+    :param offset: Index of the first option to return
+    :param limit: Maximum number of options to return, None for all remaining options
+    :return:
+    {
+        'name': 'variable_name',
+        'options': [...],
+        'offset': 0,
+        'total': 123
+    }
+    """
+    from .variables import resolve_options
+
+    method = getattr(variables, name, None)
+    if not getattr(method, "is_rule_variable", False):
+        raise AssertionError(
+            "Variable {0} is not defined in class {1}".format(
+                name, getattr(variables, "__name__", variables.__class__.__name__)
+            )
+        )
+
+    options = list(resolve_options(method.options))
+    end = None if limit is None else offset + limit
+    return {
+        "name": name,
+        "options": options[offset:end],
+        "offset": offset,
+        "total": len(options),
+    }
+
+
 def float_to_decimal(f):
     """
     Convert a floating point number to a Decimal with
@@ -167,12 +206,14 @@ def check_for_default_value_for_missing_params(missing_params, method_params):
     return missing_params_with_default_value
 
 
-def validate_rule_data(variables, actions, rule):
+def validate_rule_data(variables, actions, rule, rule_schema=None):
     """
     validate_rule_data is used to check a generated rule against a set of variables and actions
     :param variables:
     :param actions:
     :param rule:
+    :param rule_schema: Result of export_rule_data for variables and actions, to
+    avoid exporting it again when validating many rules
     :return: bool
     :raises AssertionError:
     """
@@ -185,6 +226,16 @@ def validate_rule_data(variables, actions, rule):
         if "actions" not in root_keys:
             raise AssertionError('Missing "{}" key'.format("actions"))
 
+    def validate_priority(rule):
+        """
+        Check the optional 'priority' is a number
+        """
+        priority = rule.get("priority", 0)
+        if isinstance(priority, bool) or not isinstance(
+            priority, (numbers.Real, Decimal)
+        ):
+            raise AssertionError('"priority" must be a number')
+
     def validate_condition_operator(condition, rule_schema):
         """
         Check provided condition contains a valid operator
@@ -259,8 +310,10 @@ def validate_rule_data(variables, actions, rule):
                 method, params, method_type.METHOD_TYPE_ACTION
             )
 
-    rule_schema = export_rule_data(variables, actions)
+    if rule_schema is None:
+        rule_schema = export_rule_data(variables, actions, options_limit=0)
     validate_root_keys(rule)
+    validate_priority(rule)
     conditions = rule.get("conditions", None)
     if conditions is not None and type(conditions) is not dict:
         raise AssertionError('"conditions" must be a dictionary')
@@ -1,8 +1,10 @@
 import inspect
+import threading
+import time
 
-from typing import Callable, List, Type  # noqa: F401
+from typing import Callable, List, Type, Union  # noqa: F401
 
-from . import utils
+from . import caching, utils
 from .operators import (
     BaseType,
     BooleanType,
@@ -13,6 +15,7 @@ from .operators import (
     StringType,
     TimeType,
 )
+from .util.compat import getfullargspec
 from .utils import fn_name_to_pretty_label
 
 
@@ -23,14 +26,19 @@ class BaseVariables(object):
     """
 
     @classmethod
-    def get_all_variables(cls):
+    def get_all_variables(cls, options_limit=None):
+        """
+        :param options_limit: Maximum number of options exported per variable.
+                              None exports all of them, 0 omits them without
+                              resolving lazy options.
+        """
         methods = inspect.getmembers(cls)
         return [
             {
                 "name": m[0],
                 "label": m[1].label,
                 "field_type": m[1].field_type.name,
-                "options": m[1].options,
+                "options": _export_options(m[1].options, options_limit),
                 "params": m[1].params,
                 "public": m[1].public,
             }
@@ -39,20 +47,90 @@ class BaseVariables(object):
         ]
 
 
-def rule_variable(field_type, label=None, options=None, params=None, public=True):
-    # type: (Type[BaseType], str, List[str], dict, bool) -> Callable
+class LazyOptions(object):
+    """
+    Options of a rule variable that are loaded by calling `loader` the first
+    time they are needed, then cached for `ttl` seconds (forever if `ttl` is None).
+    """
+
+    def __init__(self, loader, ttl=None):
+        self.loader = loader
+        self.ttl = ttl
+        self._options = None
+        self._expires_at = None
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            now = time.monotonic()
+            if self._options is None or (
+                self._expires_at is not None and now >= self._expires_at
+            ):
+                self._options = list(self.loader())
+                self._expires_at = None if self.ttl is None else now + self.ttl
+            return self._options
+
+    def invalidate(self):
+        with self._lock:
+            self._options = None
+            self._expires_at = None
+
+
+def resolve_options(options):
+    """
+    Returns the options of a rule variable, loading them if they are lazy.
+    """
+    if callable(options):
+        return options()
+    return options
+
+
+def _export_options(options, limit):
+    # Copied so that changing exported data leaves cached options untouched
+    if limit is None:
+        return list(resolve_options(options))
+    if limit == 0:
+        return []
+    return list(resolve_options(options))[:limit]
+
+
+def rule_variable(
+    field_type,  # type: Type[BaseType]
+    label=None,  # type: str
+    options=None,  # type: List[str]
+    params=None,  # type: dict
+    public=True,  # type: bool
+    options_ttl=None,  # type: float
+    cache=None,  # type: Union[str, float]
+    trusted=False,  # type: bool
+):
+    # type: (...) -> Callable
     """
     Decorator to make a function into a rule variable
     :param field_type:
     :param label:
-    :param options:
+    :param options: List of options or a callable returning them. A callable is
+                    only invoked when the options are exported.
     :param params:
     :param inject_rule:
     :param public: Flag to identify if a variable is public or not
+    :param options_ttl: Seconds to cache the options returned by a callable.
+                        By default they are loaded once.
+    :param cache: Scope the value of the variable is cached for, "fact",
+                  "batch" or "process", or a number of seconds. Not cached
+                  by default. See business_rules.caching.
+    :param trusted: The function always returns values of the field type as
+                    they would be cast (Decimal for numerics, datetime for
+                    datetimes...), so they are used without being validated.
+                    See business_rules.engine.set_trusted_variables.
     :return:
     """
     options = options or []
     params = params or []
+    caching.validate_cache(cache)
+
+    if callable(options) and not isinstance(options, LazyOptions):
+        options = LazyOptions(options, ttl=options_ttl)
 
     def wrapper(func):
         if not (type(field_type) == type and issubclass(field_type, BaseType)):
@@ -72,23 +150,53 @@ def rule_variable(field_type, label=None, options=None, params=None, public=True
         func.label = label or fn_name_to_pretty_label(func.__name__)
         func.options = options
         func.public = public
+        # Only variables taking **kwargs receive the rule, their value may depend on it
+        func.accepts_rule = getfullargspec(func).varkw is not None
+        if cache is not None and func.accepts_rule:
+            raise AssertionError(
+                "Variable {0} receives the rule, its value can't be cached".format(
+                    func.__name__
+                )
+            )
+        func.cache = cache
+        func.trusted = trusted
 
         return func
 
     return wrapper
 
 
-def _rule_variable_wrapper(field_type, label, params=None, options=None, public=True):
+def _rule_variable_wrapper(
+    field_type,
+    label,
+    params=None,
+    options=None,
+    public=True,
+    options_ttl=None,
+    cache=None,
+    trusted=False,
+):
     if callable(label):
         # Decorator is being called with no args, label is actually the decorated func
-        return rule_variable(field_type, params=params, public=public)(label)
+        return rule_variable(
+            field_type, params=params, public=public, cache=cache, trusted=trusted
+        )(label)
 
     return rule_variable(
-        field_type, label=label, params=params, options=options, public=public
+        field_type,
+        label=label,
+        params=params,
+        options=options,
+        public=public,
+        options_ttl=options_ttl,
+        cache=cache,
+        trusted=trusted,
     )
 
 
-def numeric_rule_variable(label=None, params=None, public=True):
+def numeric_rule_variable(
+    label=None, params=None, public=True, cache=None, trusted=False
+):
     """
     Decorator to make a function into a numeric rule variable.
 
@@ -97,12 +205,29 @@ def numeric_rule_variable(label=None, params=None, public=True):
     :param label: Label for Variable
     :param params: Parameters expected by the Variable function
     :param public: Flag to identify if a variable is public or not
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper
     """
-    return _rule_variable_wrapper(NumericType, label, params=params, public=public)
+    return _rule_variable_wrapper(
+        NumericType,
+        label,
+        params=params,
+        public=public,
+        cache=cache,
+        trusted=trusted,
+    )
 
 
-def string_rule_variable(label=None, params=None, options=None, public=True):
+def string_rule_variable(
+    label=None,
+    params=None,
+    options=None,
+    public=True,
+    options_ttl=None,
+    cache=None,
+    trusted=False,
+):
     """
     Decorator to make a function into a string rule variable.
 
@@ -113,14 +238,26 @@ def string_rule_variable(label=None, params=None, options=None, public=True):
     :param options: Options parameter to specify expected options for the variable.
                     The value used in the Condition IS NOT checked against this list.
     :param public: Flag to identify if a variable is public or not
+    :param options_ttl: Seconds to cache options loaded by a callable
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper
     """
     return _rule_variable_wrapper(
-        StringType, label, params=params, options=options, public=public
+        StringType,
+        label,
+        params=params,
+        options=options,
+        public=public,
+        options_ttl=options_ttl,
+        cache=cache,
+        trusted=trusted,
     )
 
 
-def boolean_rule_variable(label=None, params=None, public=True):
+def boolean_rule_variable(
+    label=None, params=None, public=True, cache=None, trusted=False
+):
     """
     Decorator to make a function into a boolean rule variable.
 
@@ -129,12 +266,29 @@ def boolean_rule_variable(label=None, params=None, public=True):
     :param label: Label for Variable
     :param params: Parameters expected by the Variable function
     :param public: Flag to identify if a variable is public or not
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper
     """
-    return _rule_variable_wrapper(BooleanType, label, params=params, public=public)
+    return _rule_variable_wrapper(
+        BooleanType,
+        label,
+        params=params,
+        public=public,
+        cache=cache,
+        trusted=trusted,
+    )
 
 
-def select_rule_variable(label=None, options=None, params=None, public=True):
+def select_rule_variable(
+    label=None,
+    options=None,
+    params=None,
+    public=True,
+    options_ttl=None,
+    cache=None,
+    trusted=False,
+):
     """
     Decorator to make a function into a select rule variable.
 
@@ -144,14 +298,32 @@ def select_rule_variable(label=None, options=None, params=None, public=True):
     :param options:
     :param params: Parameters expected by the Variable function
     :param public: Flag to identify if a variable is public or not
+    :param options_ttl: Seconds to cache options loaded by a callable
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper
     """
     return rule_variable(
-        SelectType, label=label, options=options, params=params, public=public
+        SelectType,
+        label=label,
+        options=options,
+        params=params,
+        public=public,
+        options_ttl=options_ttl,
+        cache=cache,
+        trusted=trusted,
     )
 
 
-def select_multiple_rule_variable(label=None, options=None, params=None, public=True):
+def select_multiple_rule_variable(
+    label=None,
+    options=None,
+    params=None,
+    public=True,
+    options_ttl=None,
+    cache=None,
+    trusted=False,
+):
     """
     Decorator to make a function into a select multiple rule variable.
 
@@ -161,14 +333,26 @@ def select_multiple_rule_variable(label=None, options=None, params=None, public=
     :param options:
     :param params: Parameters expected by the Variable function
     :param public: Flag to identify if a variable is public or not
+    :param options_ttl: Seconds to cache options loaded by a callable
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper
     """
     return rule_variable(
-        SelectMultipleType, label=label, options=options, params=params, public=public
+        SelectMultipleType,
+        label=label,
+        options=options,
+        params=params,
+        public=public,
+        options_ttl=options_ttl,
+        cache=cache,
+        trusted=trusted,
     )
 
 
-def datetime_rule_variable(label=None, params=None, public=True):
+def datetime_rule_variable(
+    label=None, params=None, public=True, cache=None, trusted=False
+):
     """
     Decorator to make a function into a datetime rule variable.
 
@@ -177,15 +361,22 @@ def datetime_rule_variable(label=None, params=None, public=True):
     :param label:
     :param params
     :param public: Flag to identify if a variable is public or not:
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper for DateTime values
     """
 
     return _rule_variable_wrapper(
-        field_type=DateTimeType, label=label, params=params, public=public
+        field_type=DateTimeType,
+        label=label,
+        params=params,
+        public=public,
+        cache=cache,
+        trusted=trusted,
     )
 
 
-def time_rule_variable(label=None, params=None, public=True):
+def time_rule_variable(label=None, params=None, public=True, cache=None, trusted=False):
     """
     Decorator to make a function into a Time rule variable.
 
@@ -193,11 +384,18 @@ def time_rule_variable(label=None, params=None, public=True):
 
     :param label:
     :param params:
+    :param cache: Scope or seconds the value is cached for, see rule_variable
+    :param trusted: Use the values without validating them, see rule_variable
     :return: Decorator function wrapper for Time values
     """
 
     return _rule_variable_wrapper(
-        field_type=TimeType, label=label, params=params, public=public
+        field_type=TimeType,
+        label=label,
+        params=params,
+        public=public,
+        cache=cache,
+        trusted=trusted,
     )
 
 
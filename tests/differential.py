@@ -0,0 +1,101 @@
+from benchmarks.generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+from business_rules import engine
+from business_rules.compiler import compile_rules
+
+from .test_compiler import (
+    PRODUCTS,
+    RULES,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+PRIORITIZED_RULES = [dict(rule, priority=i % 2) for i, rule in enumerate(RULES)]
+
+
+def assert_matches_interpreter(test_case, rule_set, rules, products=PRODUCTS, runs=1):
+    """
+    Checks that `rule_set` triggers the same rules and runs the same actions as
+    the interpreter running `rules`, for every product and run_all flags.
+    :param runs: Number of times every product is run
+    """
+    for _ in range(runs):
+        for product_kwargs in products:
+            for stop_on_first_trigger in (False, True):
+                for by_priority in (False, True):
+                    with test_case.subTest(
+                        product=product_kwargs,
+                        stop_on_first_trigger=stop_on_first_trigger,
+                        by_priority=by_priority,
+                    ):
+                        test_case.assertEqual(
+                            run_compiled(
+                                rule_set,
+                                product_kwargs,
+                                stop_on_first_trigger,
+                                by_priority,
+                            ),
+                            run_interpreted(
+                                rules,
+                                product_kwargs,
+                                stop_on_first_trigger,
+                                by_priority,
+                            ),
+                        )
+
+
+class MatchesInterpreterTests(object):
+    """
+    Tests of an engine built on compiled rule sets, comparing it with the
+    interpreter. Mixed in the TestCase of the engine, which defines `build`.
+    """
+
+    # Rules run on the products
+    rule_lists = (PRIORITIZED_RULES,)
+    products = PRODUCTS
+    runs = 1
+    # Arguments of generate_rules
+    generated_rules = {"rule_count": 200, "depth": 3, "seed": 7}
+    generated_facts = 20
+
+    def build(self, rule_set):
+        """
+        :param rule_set: CompiledRuleSet
+        :return: Engines built on `rule_set` to compare with the interpreter
+        """
+        raise NotImplementedError
+
+    def test_matches_interpreter(self):
+        for rules in self.rule_lists:
+            rule_set = compile_rules(rules, ProductVariables, ProductActions)
+            for engine_rules in self.build(rule_set):
+                assert_matches_interpreter(
+                    self, engine_rules, rules, self.products, self.runs
+                )
+
+    def test_matches_interpreter_on_generated_rules(self):
+        variables_per_type = self.generated_rules.get("variables_per_type", 2)
+        variables_class = make_variables_class(variables_per_type)
+        rules = generate_rules(**self.generated_rules)
+        facts = generate_facts(
+            self.generated_facts,
+            variables_per_type=variables_per_type,
+            seed=self.generated_rules.get("seed", 0),
+        )
+
+        for engine_rules in self.build(
+            compile_rules(rules, variables_class, SyntheticActions)
+        ):
+            for fact in facts:
+                self.assertEqual(
+                    engine_rules.run_all(variables_class(fact), SyntheticActions(fact)),
+                    engine.run_all(
+                        rules, variables_class(fact), SyntheticActions(fact)
+                    ),
+                )
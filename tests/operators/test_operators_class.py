@@ -1,4 +1,4 @@
-from business_rules.operators import BaseType, type_operator
+from business_rules.operators import OPERATORS, BaseType, type_operator
 from unittest import TestCase
 from mock import MagicMock
 
@@ -29,6 +29,25 @@ class OperatorsClassTests(TestCase):
         self.assertEqual(some_operator["label"], "Some Operator")
         self.assertEqual(some_operator["input_type"], "text")
 
+    def test_operators_are_registered(self):
+        class SomeType(BaseType):
+            @type_operator(input_type="text")
+            def some_operator(self, other):
+                return True
+
+            @type_operator(input_type="none", assert_type_for_arguments=False)
+            def other_operator(self):
+                return True
+
+        some_operator = OPERATORS[(SomeType, "some_operator")]
+        self.assertIs(some_operator.method, SomeType.some_operator)
+        self.assertIs(some_operator.function, SomeType.some_operator.__wrapped__)
+        self.assertFalse(some_operator.no_input)
+        self.assertTrue(some_operator.cast)
+        other_operator = OPERATORS[(SomeType, "other_operator")]
+        self.assertTrue(other_operator.no_input)
+        self.assertFalse(other_operator.cast)
+
     def test_operator_decorator_casts_argument(self):
         """Any operator that has the @type_operator decorator
         should call _assert_valid_value_and_cast on the parameter.
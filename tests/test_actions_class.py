@@ -67,3 +67,43 @@ class ActionsClassTests(TestCase):
             pass
 
         self.assertTrue(some_action.is_rule_action)
+
+    def test_rule_action_accepts_conditions(self):
+        @rule_action()
+        def some_action(self):
+            pass
+
+        @rule_action()
+        def other_action(self, **kwargs):
+            pass
+
+        self.assertFalse(some_action.accepts_conditions)
+        self.assertTrue(other_action.accepts_conditions)
+
+    def test_rule_action_batch(self):
+        class SomeActions(BaseActions):
+            @rule_action(params={"quantity": FIELD_NUMERIC}, batch=True)
+            def order_more(cls, calls):
+                return cls, calls
+
+        self.assertIsInstance(SomeActions.__dict__["order_more"], classmethod)
+        self.assertTrue(SomeActions.order_more.batch)
+        self.assertFalse(SomeActions.order_more.accepts_conditions)
+        self.assertEqual(SomeActions().order_more(calls=[]), (SomeActions, []))
+        self.assertEqual(
+            SomeActions.get_all_actions(),
+            [
+                {
+                    "name": "order_more",
+                    "label": "Order More",
+                    "params": [
+                        {
+                            "label": "Quantity",
+                            "name": "quantity",
+                            "fieldType": FIELD_NUMERIC,
+                            "defaultValue": None,
+                        }
+                    ],
+                }
+            ],
+        )
@@ -0,0 +1,29 @@
+from unittest import TestCase
+
+from business_rules.agenda import Agenda, rule_priority
+
+
+class AgendaTests(TestCase):
+    def test_pop_by_priority_then_position(self):
+        agenda = Agenda([(0, 0, "a"), (5, 1, "b"), (5, 2, "c"), (-1, 3, "d")])
+
+        self.assertEqual(len(agenda), 4)
+        self.assertEqual(
+            [agenda.pop() for _ in range(4)], [(1, "b"), (2, "c"), (0, "a"), (3, "d")]
+        )
+        self.assertFalse(agenda)
+
+    def test_push(self):
+        agenda = Agenda()
+        agenda.push(1, 3, "a")
+        agenda.push(1, 2, "b")
+
+        self.assertEqual(agenda.pop(), (2, "b"))
+
+    def test_from_rule_list(self):
+        rules = [{"actions": []}, {"actions": [], "priority": 1}]
+
+        agenda = Agenda.from_rule_list(rules)
+
+        self.assertEqual(agenda.pop(), (1, rules[1]))
+        self.assertEqual(rule_priority(rules[0]), 0)
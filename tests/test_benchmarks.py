@@ -0,0 +1,155 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import TestCase
+
+from mock import patch
+
+from benchmarks import runner, scaling
+from benchmarks.generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+from benchmarks.micro import BENCHMARKS
+from business_rules import engine, utils
+
+
+class GeneratorsTests(TestCase):
+    def test_generated_rules_are_valid(self):
+        variables_class = make_variables_class(variables_per_type=3)
+        rules = generate_rules(50, depth=3, variables_per_type=3, seed=1)
+
+        for rule in rules:
+            utils.validate_rule_data(variables_class, SyntheticActions, rule)
+
+        for fact in generate_facts(5, variables_per_type=3):
+            engine.run_all(rules, variables_class(fact), SyntheticActions(fact))
+
+    def test_generated_rules_are_deterministic(self):
+        self.assertEqual(generate_rules(10, seed=3), generate_rules(10, seed=3))
+        self.assertNotEqual(generate_rules(10, seed=3), generate_rules(10, seed=4))
+
+    def test_operator_mix(self):
+        rules = generate_rules(20, depth=0, operator_mix={"boolean": 1})
+
+        self.assertTrue(
+            all(r["conditions"]["name"].startswith("boolean") for r in rules)
+        )
+
+    def test_trigger_rate(self):
+        variables_class = make_variables_class()
+        rules = generate_rules(10, trigger_rate=0.25)
+
+        triggered = 0
+        for fact in generate_facts(200):
+            results = engine.run_all(
+                rules, variables_class(fact), SyntheticActions(fact)
+            )
+            triggered += sum(results)
+
+        self.assertAlmostEqual(triggered / 2000.0, 0.25, delta=0.1)
+
+
+class RunnerTests(TestCase):
+    def test_every_benchmark_runs(self):
+        for setup in BENCHMARKS.values():
+            setup()()
+
+    def test_run_benchmarks(self):
+        results = runner.run_benchmarks(
+            ["operators.numeric.equal_to"], repeat=2, min_time=0.001
+        )
+
+        result = results["results"]["operators.numeric.equal_to"]
+        self.assertGreater(result["number"], 0)
+        self.assertLessEqual(result["min"], result["mean"])
+        self.assertIn("python", results["meta"])
+
+    def test_compare(self):
+        baseline = {
+            "results": {"a": {"min": 1.0}, "b": {"min": 1.0}, "c": {"min": 1.0}}
+        }
+        results = {
+            "results": {"a": {"min": 1.05}, "b": {"min": 1.5}, "d": {"min": 9.0}}
+        }
+
+        self.assertEqual(
+            runner.compare(baseline, results, threshold=0.1), [("b", 1.0, 1.5, 0.5)]
+        )
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        baseline = os.path.join(directory, "baseline.json")
+        results = os.path.join(directory, "results.json")
+
+        args = ["run", "-k", "cast.boolean", "--repeat", "2", "--min-time", "0.001"]
+        self.assertEqual(runner.main(args + ["-o", baseline]), 0)
+        with open(baseline) as f:
+            data = json.load(f)
+        self.assertEqual(list(data["results"]), ["cast.boolean"])
+
+        data["results"]["cast.boolean"]["min"] *= 10
+        with open(results, "w") as f:
+            json.dump(data, f)
+        with patch("sys.stdout", new_callable=StringIO) as stdout:
+            self.assertEqual(runner.main(["compare", baseline, results]), 1)
+        self.assertRegex(
+            stdout.getvalue(), r"^cast\.boolean: .+s -> .+s \(\+900\.0%\)\n$"
+        )
+
+        with patch("sys.stdout", new_callable=StringIO) as stdout:
+            self.assertEqual(runner.main(["compare", results, baseline]), 0)
+        self.assertEqual(stdout.getvalue(), "")
+
+
+class ScalingTests(TestCase):
+    def test_percentile(self):
+        values = list(range(1, 101))
+
+        self.assertEqual(scaling.percentile(values, 0.5), 50)
+        self.assertEqual(scaling.percentile(values, 0.99), 99)
+        self.assertEqual(scaling.percentile([], 0.5), 0.0)
+
+    def test_sweep(self):
+        rows = scaling.sweep([5, 10], [4], [0.5])
+
+        self.assertEqual(
+            [(row["engine"], row["rules"]) for row in rows],
+            [(name, count) for count in (5, 10) for name in sorted(scaling.ENGINES)],
+        )
+        for row in rows:
+            self.assertEqual(set(row), set(scaling.FIELDS))
+            self.assertLessEqual(row["p50"], row["p99"])
+            self.assertGreater(row["throughput"], 0)
+            self.assertGreater(row["tracemalloc_peak"], 0)
+        # Every engine triggers the same rules
+        for count in (5, 10):
+            self.assertEqual(
+                len({row["triggered"] for row in rows if row["rules"] == count}), 1
+            )
+
+    def test_main(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        output = os.path.join(directory, "report.json")
+
+        args = [
+            "--rules",
+            "3",
+            "--facts",
+            "2",
+            "--trigger-rates",
+            "0.1",
+            "--engines",
+            "compiled",
+        ]
+        self.assertEqual(scaling.main(args + ["-o", output]), 0)
+        with open(output) as f:
+            rows = json.load(f)
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["engine"], "compiled")
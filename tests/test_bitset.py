@@ -0,0 +1,77 @@
+from unittest import TestCase
+
+from business_rules.bitset import BitsetRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.variables import numeric_rule_variable
+
+from .differential import MatchesInterpreterTests
+from .test_compiler import RULES, Product, ProductActions, ProductVariables
+
+
+class BitsetRuleSetTests(MatchesInterpreterTests, TestCase):
+    def build(self, rule_set):
+        # Rules with more than one term are run as trees with max_terms=1
+        return [BitsetRuleSet(rule_set), BitsetRuleSet(rule_set, max_terms=1)]
+
+    def test_shared_conditions_are_evaluated_once(self):
+        condition = {
+            "name": "current_inventory",
+            "operator": "greater_than",
+            "value": 5,
+        }
+        rules = [
+            {"conditions": {"all": [condition]}, "actions": []},
+            {"conditions": {"any": [dict(condition, value=5.0)]}, "actions": []},
+            {"conditions": dict(condition, value=6), "actions": []},
+        ]
+        bitset_rules = BitsetRuleSet(
+            compile_rules(rules, ProductVariables, ProductActions)
+        )
+        product = Product()
+        calls = []
+
+        class CountingVariables(ProductVariables):
+            @numeric_rule_variable()
+            def current_inventory(self):
+                calls.append(None)
+                return self.product.inventory
+
+        results = bitset_rules.run_all(
+            CountingVariables(product), ProductActions(product)
+        )
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(len(bitset_rules.predicates), 2)
+        self.assertEqual(bitset_rules.condition_count, 3)
+        self.assertEqual(len(calls), 2)
+
+    def test_conditions_receiving_the_rule_are_not_shared(self):
+        condition = {
+            "name": "inventory_plus",
+            "operator": "equal_to",
+            "value": 12,
+            "params": {"x": 2},
+        }
+        rules = [{"conditions": condition, "actions": []}] * 2
+
+        bitset_rules = BitsetRuleSet(
+            compile_rules(rules, ProductVariables, ProductActions)
+        )
+
+        self.assertEqual(len(bitset_rules.predicates), 2)
+
+    def test_dnf(self):
+        bitset_rules = BitsetRuleSet(
+            compile_rules(RULES, ProductVariables, ProductActions)
+        )
+
+        # price < 2.5 OR (tags contains Holiday AND NOT on_sale)
+        self.assertEqual(len(bitset_rules.rules[1].terms), 2)
+        self.assertIsNone(bitset_rules.rules[3].tree)
+        self.assertIsNone(
+            BitsetRuleSet(
+                compile_rules(RULES, ProductVariables, ProductActions), max_terms=1
+            )
+            .rules[1]
+            .terms
+        )
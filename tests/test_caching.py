@@ -0,0 +1,188 @@
+from unittest import TestCase
+
+from mock import MagicMock, patch
+
+from business_rules import caching, engine
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.instrumentation import Instrumentation
+from business_rules.operators import NumericType
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    rule_variable,
+    string_rule_variable,
+)
+
+from .test_compiler import ProductActions
+
+RULES = [
+    {
+        "conditions": {
+            "all": [
+                {"name": "month", "operator": "equal_to", "value": "May"},
+                {"name": "region", "operator": "equal_to", "value": "EU"},
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "may"}}],
+    },
+    {
+        "conditions": {
+            "any": [
+                {"name": "month", "operator": "equal_to", "value": "June"},
+                {"name": "region", "operator": "equal_to", "value": "EU"},
+                {"name": "tier", "operator": "greater_than", "value": 1},
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "june"}}],
+    },
+]
+
+
+class CachedVariables(BaseVariables):
+    calls = None
+
+    def __init__(self, tier=1):
+        self.tier_value = tier
+
+    @string_rule_variable(cache="process")
+    def month(self):
+        self.calls.append("month")
+        return "May"
+
+    @string_rule_variable(cache=60)
+    def region(self):
+        self.calls.append("region")
+        return "EU"
+
+    @numeric_rule_variable(cache="fact")
+    def tier(self):
+        self.calls.append("tier")
+        return self.tier_value
+
+
+class Product(object):
+    def __init__(self):
+        self.calls = []
+
+
+def run(rule_set=None, tier=1):
+    product = Product()
+    variables = CachedVariables(tier)
+    if rule_set is None:
+        engine.run_all(RULES, variables, ProductActions(product))
+    else:
+        rule_set.run_all(variables, ProductActions(product))
+    return product.calls
+
+
+class VariableCacheTests(TestCase):
+    def setUp(self):
+        CachedVariables.calls = []
+        caching.clear()
+        self.addCleanup(caching.clear)
+
+    def test_process_and_ttl_variables_are_computed_once(self):
+        self.assertEqual(run(), [("log", "may"), ("log", "june")])
+        self.assertEqual(run(tier=2), [("log", "may"), ("log", "june")])
+        self.assertEqual(CachedVariables.calls, ["month", "region"])
+
+    def test_ttl(self):
+        with patch("business_rules.caching.time.monotonic", return_value=100):
+            run()
+        with patch("business_rules.caching.time.monotonic", return_value=159):
+            run()
+        self.assertEqual(CachedVariables.calls, ["month", "region"])
+
+        with patch("business_rules.caching.time.monotonic", return_value=160):
+            run()
+        self.assertEqual(CachedVariables.calls, ["month", "region", "region"])
+
+    def test_least_recently_used_values_are_evicted(self):
+        value_cache = caching.ValueCache(max_size=2)
+        value_cache.set("a", 1)
+        value_cache.set("b", 2)
+        value_cache.get("a")
+        value_cache.set("c", 3, ttl=60)
+
+        self.assertEqual(len(value_cache), 2)
+        self.assertEqual(value_cache.get("a"), (True, 1))
+        self.assertEqual(value_cache.get("b"), (False, None))
+        self.assertEqual(value_cache.get("c"), (True, 3))
+
+    def test_process_cache_is_bounded(self):
+        with patch.object(caching._process_cache, "max_size", 1):
+            run()
+
+        self.assertEqual(len(caching._process_cache), 1)
+
+    def test_fact_variables_are_computed_once_per_fact(self):
+        rules = [
+            {
+                "conditions": {"name": "tier", "operator": "greater_than", "value": i},
+                "actions": [{"name": "log", "params": {"message": str(i)}}],
+            }
+            for i in range(3)
+        ]
+        for tier in (1, 2):
+            product = Product()
+            engine.run_all(rules, CachedVariables(tier), ProductActions(product))
+            self.assertEqual(len(product.calls), tier)
+        self.assertEqual(CachedVariables.calls, ["tier", "tier"])
+
+    def test_batch_scope(self):
+        @string_rule_variable(cache="batch")
+        def month(self):
+            self.calls.append("month")
+            return "May"
+
+        variables_class = type("BatchVariables", (CachedVariables,), {"month": month})
+        for _ in range(2):
+            with caching.batch_scope():
+                with caching.batch_scope():
+                    engine.check_condition(
+                        RULES[0]["conditions"]["all"][0], variables_class(), {}
+                    )
+                engine.check_condition(
+                    RULES[0]["conditions"]["all"][0], variables_class(), {}
+                )
+        self.assertEqual(CachedVariables.calls, ["month", "month"])
+
+        # Outside a batch, once per fact
+        variables = variables_class()
+        for _ in range(2):
+            engine.check_condition(RULES[0]["conditions"]["all"][0], variables, {})
+        self.assertEqual(CachedVariables.calls, ["month", "month", "month"])
+
+    def test_generated_code_uses_the_cache(self):
+        rule_set = CodegenRuleSet(compile_rules(RULES, CachedVariables, ProductActions))
+
+        self.assertEqual(run(rule_set), [("log", "may"), ("log", "june")])
+        self.assertEqual(run(rule_set), [("log", "may"), ("log", "june")])
+        self.assertEqual(CachedVariables.calls, ["month", "region"])
+
+    def test_cache_hits_are_instrumented(self):
+        instrumentation = MagicMock(spec=Instrumentation)
+
+        with engine.instrumented(instrumentation):
+            run()
+
+        hits = [
+            (c[0][0], c[0][3]) for c in instrumentation.variable_computed.call_args_list
+        ]
+        self.assertEqual(
+            hits,
+            [("month", False), ("region", False), ("month", True), ("region", True)],
+        )
+
+    def test_invalid_cache(self):
+        for cache in ("request", 0, -1, True):
+            with self.assertRaises(AssertionError):
+                rule_variable(NumericType, cache=cache)
+
+    def test_variable_receiving_the_rule_cannot_be_cached(self):
+        with self.assertRaises(AssertionError):
+
+            @numeric_rule_variable(cache="fact")
+            def tier(self, **kwargs):
+                return 1
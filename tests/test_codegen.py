@@ -0,0 +1,146 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from business_rules import engine
+from business_rules.actions import rule_action
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.fields import FIELD_NUMERIC
+from business_rules.instrumentation import ProfilingCollector
+from business_rules.variables import numeric_rule_variable
+
+from .differential import PRIORITIZED_RULES, MatchesInterpreterTests
+from .test_compiler import (
+    PRODUCTS,
+    Product,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+
+class CodegenRuleSetTests(MatchesInterpreterTests, TestCase):
+    generated_rules = {"rule_count": 200, "depth": 3, "seed": 11}
+
+    def setUp(self):
+        self.rules = PRIORITIZED_RULES
+        self.rule_set = compile_rules(self.rules, ProductVariables, ProductActions)
+
+    def build(self, rule_set):
+        return [
+            CodegenRuleSet(rule_set),
+            CodegenRuleSet(rule_set, differential=True),
+        ]
+
+    def test_differential_mode_reports_differences(self):
+        codegen_rules = CodegenRuleSet(self.rule_set, differential=True)
+        codegen_rules._run_all = lambda *args: [False] * 4
+        product = Product()
+
+        with self.assertRaisesRegex(AssertionError, "differs from the interpreter"):
+            codegen_rules.run_all(ProductVariables(product), ProductActions(product))
+
+    def test_variables_are_computed_once(self):
+        calls = []
+
+        class CountingVariables(ProductVariables):
+            @numeric_rule_variable()
+            def price(self):
+                calls.append(None)
+                return self.product.price
+
+        rules = [
+            {
+                "conditions": {
+                    "name": "price",
+                    "operator": "less_than",
+                    "value": value,
+                },
+                "actions": [{"name": "log", "params": {"message": "price"}}],
+            }
+            for value in range(5)
+        ]
+        codegen_rules = CodegenRuleSet(
+            compile_rules(rules, ProductVariables, ProductActions)
+        )
+        product = Product(price=3)
+
+        results = codegen_rules.run_all(
+            CountingVariables(product), ProductActions(product)
+        )
+
+        self.assertEqual(results, [False, False, False, False, True])
+        self.assertEqual(len(calls), 1)
+
+    def test_actions_changing_the_fact(self):
+        class RestockingActions(ProductActions):
+            @rule_action(params={"amount": FIELD_NUMERIC})
+            def order_more(self, amount):
+                self.product.inventory += amount
+
+        low_inventory = {
+            "name": "current_inventory",
+            "operator": "less_than",
+            "value": 5,
+        }
+        rules = [
+            {
+                "conditions": low_inventory,
+                "actions": [{"name": "order_more", "params": {"amount": 10}}],
+            },
+            {
+                "conditions": low_inventory,
+                "actions": [{"name": "log", "params": {"message": "alert"}}],
+            },
+        ]
+        rule_set = compile_rules(rules, ProductVariables, RestockingActions)
+
+        for codegen_rules in (
+            CodegenRuleSet(rule_set),
+            CodegenRuleSet(rule_set, differential=True),
+        ):
+            product = Product(inventory=3)
+            results = codegen_rules.run_all(
+                ProductVariables(product), RestockingActions(product)
+            )
+
+            # The second rule sees the inventory ordered by the first one
+            self.assertEqual(results, [True, False])
+            self.assertEqual(product.inventory, 13)
+            self.assertEqual(product.calls, [])
+
+    def test_source(self):
+        codegen_rules = CodegenRuleSet(self.rule_set)
+
+        self.assertIn("def run_all(", codegen_rules.source)
+        self.assertIn("defined_variables.price()", codegen_rules.source)
+
+    def test_cache_dir(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        cache_dir = os.path.join(directory, "codegen")
+
+        first = CodegenRuleSet(self.rule_set, cache_dir=cache_dir)
+        second = CodegenRuleSet(self.rule_set, cache_dir=cache_dir)
+
+        self.assertFalse(first.cached)
+        self.assertTrue(second.cached)
+        with open(first.filename) as f:
+            self.assertEqual(f.read(), first.source)
+        for product_kwargs in PRODUCTS:
+            self.assertEqual(
+                run_compiled(second, product_kwargs),
+                run_interpreted(self.rules, product_kwargs),
+            )
+
+    def test_instrumented_runs_use_the_rule_set(self):
+        codegen_rules = CodegenRuleSet(self.rule_set)
+        collector = ProfilingCollector()
+
+        with engine.instrumented(collector):
+            run_compiled(codegen_rules, PRODUCTS[0])
+
+        self.assertEqual(len(collector.report()["rules"]), 4)
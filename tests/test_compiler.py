@@ -0,0 +1,495 @@
+from datetime import datetime
+from decimal import Decimal
+from functools import partial
+from unittest import TestCase
+
+from mock import patch
+
+from business_rules import engine
+from business_rules.actions import ActionParam, BaseActions, rule_action
+from business_rules.compiler import compile_rules, content_hash
+from business_rules.fields import FIELD_NUMERIC, FIELD_TEXT
+from business_rules.operators import NumericType
+from business_rules.variables import (
+    BaseVariables,
+    boolean_rule_variable,
+    datetime_rule_variable,
+    numeric_rule_variable,
+    select_rule_variable,
+    string_rule_variable,
+)
+
+
+class Product(object):
+    def __init__(self, inventory=10, price=5.5, month="December", tags=None):
+        self.inventory = inventory
+        self.price = price
+        self.month = month
+        self.tags = tags or []
+        self.calls = []
+
+
+class ProductVariables(BaseVariables):
+    def __init__(self, product):
+        self.product = product
+
+    @numeric_rule_variable()
+    def current_inventory(self):
+        return self.product.inventory
+
+    @numeric_rule_variable()
+    def price(self):
+        return self.product.price
+
+    @string_rule_variable()
+    def current_month(self):
+        return self.product.month
+
+    @select_rule_variable()
+    def tags(self):
+        return self.product.tags
+
+    @boolean_rule_variable()
+    def on_sale(self):
+        return self.product.price < 5
+
+    @datetime_rule_variable()
+    def last_order(self):
+        return datetime(2024, 1, 15)
+
+    @numeric_rule_variable(params={"x": FIELD_NUMERIC})
+    def inventory_plus(self, x, **kwargs):
+        assert kwargs["rule"] is not None
+        return self.product.inventory + x
+
+
+class ProductActions(BaseActions):
+    def __init__(self, product):
+        self.product = product
+
+    @rule_action(params={"message": FIELD_TEXT})
+    def log(self, message):
+        self.product.calls.append(("log", message))
+
+    @rule_action(
+        params={
+            "percentage": FIELD_NUMERIC,
+            "reason": ActionParam(field_type=FIELD_TEXT, default_value="sale"),
+        }
+    )
+    def put_on_sale(self, percentage, reason, **kwargs):
+        self.product.calls.append(
+            ("put_on_sale", percentage, reason, kwargs["conditions"])
+        )
+
+
+RULES = [
+    {
+        "conditions": {
+            "all": [
+                {"name": "current_inventory", "operator": "greater_than", "value": 5},
+                {"name": "current_month", "operator": "equal_to", "value": "December"},
+            ]
+        },
+        "actions": [{"name": "put_on_sale", "params": {"percentage": 0.25}}],
+    },
+    {
+        "conditions": {
+            "any": [
+                {"name": "price", "operator": "less_than", "value": 2.5},
+                {
+                    "all": [
+                        {"name": "tags", "operator": "contains", "value": "Holiday"},
+                        {"name": "on_sale", "operator": "is_false", "value": ""},
+                    ]
+                },
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "holiday"}}],
+    },
+    {
+        "conditions": {
+            "all": [
+                {
+                    "name": "last_order",
+                    "operator": "after_than",
+                    "value": "2024-01-01",
+                },
+                {
+                    "name": "inventory_plus",
+                    "operator": "equal_to",
+                    "value": 12,
+                    "params": {"x": 2},
+                },
+            ]
+        },
+        "actions": [
+            {"name": "put_on_sale", "params": {"percentage": 0.5, "reason": "old"}}
+        ],
+    },
+    {"actions": [{"name": "log", "params": {"message": "always"}}]},
+]
+
+PRODUCTS = [
+    dict(),
+    dict(inventory=1, price=1),
+    dict(inventory=3, price=7, month="May", tags=["holiday"]),
+    dict(inventory=10, price=4, tags=["holiday"]),
+]
+
+
+def run_interpreted(
+    rules, product_kwargs, stop_on_first_trigger=False, by_priority=False
+):
+    product = Product(**product_kwargs)
+    results = engine.run_all(
+        rules,
+        ProductVariables(product),
+        ProductActions(product),
+        stop_on_first_trigger=stop_on_first_trigger,
+        by_priority=by_priority,
+    )
+    return results, product.calls
+
+
+def run_compiled(
+    rule_set, product_kwargs, stop_on_first_trigger=False, by_priority=False
+):
+    product = Product(**product_kwargs)
+    results = rule_set.run_all(
+        ProductVariables(product),
+        ProductActions(product),
+        stop_on_first_trigger=stop_on_first_trigger,
+        by_priority=by_priority,
+    )
+    return results, product.calls
+
+
+class CompileRulesTests(TestCase):
+    def test_compiled_rules_match_interpreter(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        for product_kwargs in PRODUCTS:
+            for stop_on_first_trigger in (False, True):
+                self.assertEqual(
+                    run_compiled(rule_set, product_kwargs, stop_on_first_trigger),
+                    run_interpreted(RULES, product_kwargs, stop_on_first_trigger),
+                )
+
+    def test_condition_values_are_cast(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        first, second = rule_set.rules[0].conditions.children
+        self.assertEqual(first.typed_value, Decimal(5))
+        self.assertEqual(second.typed_value, "December")
+        last_order = rule_set.rules[2].conditions.children[0]
+        self.assertEqual(last_order.typed_value, datetime(2024, 1, 1))
+
+    def test_condition_values_are_not_cast_again(self):
+        rule_set = compile_rules(RULES[:1], ProductVariables, ProductActions)
+
+        with patch.object(
+            NumericType,
+            "_assert_valid_value_and_cast",
+            wraps=NumericType._assert_valid_value_and_cast,
+        ) as cast:
+            run_compiled(rule_set, {})
+            # Only the value of the variable is cast
+            self.assertEqual(cast.call_count, 1)
+
+            run_interpreted(RULES[:1], {})
+            self.assertEqual(cast.call_count, 3)
+
+    def test_actions_are_bound(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        put_on_sale = rule_set.rules[0].bound_actions[0]
+        self.assertEqual(put_on_sale.params, {"percentage": 0.25, "reason": "sale"})
+        self.assertTrue(put_on_sale.accepts_kwargs)
+        log = rule_set.rules[1].bound_actions[0]
+        self.assertEqual(log.params, {"message": "holiday"})
+        self.assertFalse(log.accepts_kwargs)
+
+        # The rule's own params are left untouched
+        self.assertEqual(RULES[0]["actions"][0]["params"], {"percentage": 0.25})
+
+    def test_conditions_needed_when_compiling(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        self.assertEqual(
+            [compiled_rule.conditions_needed for compiled_rule in rule_set],
+            [True, False, True, False],
+        )
+        # Runs read the stored flags rather than inspecting the actions
+        expected = run_interpreted(RULES, PRODUCTS[0])
+        with patch.object(engine, "_conditions_needed") as conditions_needed:
+            self.assertEqual(run_compiled(rule_set, PRODUCTS[0]), expected)
+        conditions_needed.assert_not_called()
+
+    def test_invalid_action_params_fail_to_compile(self):
+        rules = [{"actions": [{"name": "put_on_sale", "params": {"reason": "old"}}]}]
+
+        with self.assertRaises(AssertionError):
+            compile_rules(rules, ProductVariables, ProductActions)
+
+    def test_invalid_condition_value_fails_to_compile(self):
+        rules = [
+            {
+                "conditions": {
+                    "name": "last_order",
+                    "operator": "after_than",
+                    "value": "not a date",
+                },
+                "actions": [],
+            }
+        ]
+
+        with self.assertRaisesRegex(AssertionError, "not a valid datetime"):
+            compile_rules(rules, ProductVariables, ProductActions)
+
+    def test_invalid_rule_fails_to_compile(self):
+        rules = [{"conditions": {"name": "unknown", "operator": "equal_to"}}]
+
+        with self.assertRaises(AssertionError):
+            compile_rules(rules, ProductVariables, ProductActions)
+
+    def test_empty_group_fails_to_compile(self):
+        rules = [{"conditions": {"all": []}, "actions": []}]
+
+        with self.assertRaises(AssertionError):
+            compile_rules(rules, ProductVariables, ProductActions)
+
+    def test_variable_index(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        self.assertEqual(rule_set.rules_for_variable("current_inventory"), [0])
+        self.assertEqual(rule_set.rules_for_variable("tags"), [1])
+        self.assertEqual(rule_set.rules_for_variable("unknown"), [])
+
+    def test_content_hash_ignores_key_order(self):
+        self.assertEqual(
+            content_hash([{"actions": [], "conditions": {"all": []}}]),
+            content_hash([{"conditions": {"all": []}, "actions": []}]),
+        )
+        self.assertNotEqual(content_hash(RULES), content_hash(RULES[::-1]))
+
+
+class IncrementalUpdateTests(TestCase):
+    def setUp(self):
+        self.rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+    def assert_same_as_compiled(self, rule_list):
+        expected = compile_rules(rule_list, ProductVariables, ProductActions)
+        self.assertEqual(self.rule_set.rule_list, expected.rule_list)
+        self.assertEqual(
+            {k: sorted(v) for k, v in self.rule_set.variable_index.items()},
+            {k: sorted(v) for k, v in self.rule_set_index(expected).items()},
+        )
+        self.assertEqual(
+            set(self.rule_set.condition_index), set(expected.condition_index)
+        )
+        self.assertEqual(self.rule_set.content_hash, expected.content_hash)
+        for product_kwargs in PRODUCTS:
+            self.assertEqual(
+                run_compiled(self.rule_set, product_kwargs),
+                run_interpreted(rule_list, product_kwargs),
+            )
+
+    def rule_set_index(self, expected):
+        # Map the ids of `expected` to the ids of the rule set under test
+        ids = dict(zip(expected.rule_ids, self.rule_set.rule_ids))
+        return {
+            name: [ids[rule_id] for rule_id in rule_ids]
+            for name, rule_ids in expected.variable_index.items()
+        }
+
+    def test_add_rule(self):
+        rule_id = self.rule_set.add_rule(RULES[0])
+
+        self.assertEqual(rule_id, 4)
+        self.assertEqual(self.rule_set.rules_for_variable("current_inventory"), [0, 4])
+        self.assert_same_as_compiled(RULES + RULES[:1])
+
+    def test_add_rule_with_id(self):
+        rule = dict(RULES[0], id="inventory")
+
+        self.assertEqual(self.rule_set.add_rule(rule), "inventory")
+        self.assertEqual(self.rule_set.rule_ids, [0, 1, 2, 3, "inventory"])
+        with self.assertRaisesRegex(AssertionError, "Duplicate rule id"):
+            self.rule_set.add_rule(rule)
+
+    def test_add_invalid_rule(self):
+        with self.assertRaises(AssertionError):
+            self.rule_set.add_rule({"conditions": {"name": "unknown"}, "actions": []})
+        self.assertEqual(len(self.rule_set), len(RULES))
+
+    def test_remove_rule(self):
+        self.rule_set.remove_rule(1)
+
+        self.assertEqual(self.rule_set.rule_ids, [0, 2, 3])
+        self.assertEqual(self.rule_set.rules_for_variable("tags"), [])
+        self.assertNotIn("tags", self.rule_set.variable_index)
+        self.assert_same_as_compiled([RULES[0], RULES[2], RULES[3]])
+
+    def test_remove_unknown_rule(self):
+        with self.assertRaisesRegex(AssertionError, "Unknown rule id 10"):
+            self.rule_set.remove_rule(10)
+
+    def test_removed_ids_are_not_reused(self):
+        self.rule_set.remove_rule(3)
+
+        self.assertEqual(self.rule_set.add_rule(RULES[3]), 4)
+
+    def test_replace_rule(self):
+        old = self.rule_set.replace_rule(0, RULES[1])
+
+        self.assertEqual(old.rule, RULES[0])
+        self.assertEqual(self.rule_set.rule_ids, [0, 1, 2, 3])
+        self.assertEqual(self.rule_set.rules_for_variable("tags"), [1, 0])
+        self.assert_same_as_compiled([RULES[1], RULES[1], RULES[2], RULES[3]])
+
+    def test_replace_rule_with_invalid_rule(self):
+        with self.assertRaises(AssertionError):
+            self.rule_set.replace_rule(0, {"conditions": {"all": []}, "actions": []})
+        self.assertEqual(self.rule_set.get_rule(0).rule, RULES[0])
+
+    def test_shared_conditions(self):
+        self.rule_set.add_rule(
+            {
+                "conditions": {
+                    "all": [
+                        {
+                            "name": "current_inventory",
+                            "operator": "greater_than",
+                            "value": 5.0,
+                        },
+                        {
+                            "name": "current_inventory",
+                            "operator": "greater_than",
+                            "value": 5,
+                        },
+                    ]
+                },
+                "actions": [],
+            }
+        )
+        condition = self.rule_set.get_rule(0).conditions.children[0]
+
+        self.assertEqual(self.rule_set.rules_for_condition(condition), [0, 4])
+        self.rule_set.remove_rule(0)
+        self.assertEqual(self.rule_set.rules_for_condition(condition), [4])
+        self.rule_set.remove_rule(4)
+        self.assertNotIn(condition.key, self.rule_set.condition_index)
+
+
+class PriorityTests(TestCase):
+    def setUp(self):
+        self.rules = [
+            dict(rule, priority=priority)
+            for rule, priority in zip(RULES, [0, 5, 5, 10])
+        ]
+        self.rule_set = compile_rules(self.rules, ProductVariables, ProductActions)
+
+    def test_compiled_rules_match_interpreter(self):
+        for product_kwargs in PRODUCTS:
+            for stop_on_first_trigger in (False, True):
+                self.assertEqual(
+                    run_compiled(
+                        self.rule_set, product_kwargs, stop_on_first_trigger, True
+                    ),
+                    run_interpreted(
+                        self.rules, product_kwargs, stop_on_first_trigger, True
+                    ),
+                )
+
+    def test_stop_on_first_trigger(self):
+        results, calls = run_compiled(self.rule_set, PRODUCTS[0], True, True)
+
+        self.assertEqual(results, [False, False, False, True])
+        self.assertEqual(calls, [("log", "always")])
+
+    def test_order_follows_edits(self):
+        self.rule_set.replace_rule(3, dict(RULES[3], priority=-1))
+
+        results, calls = run_compiled(self.rule_set, dict(price=1), by_priority=True)
+        self.assertEqual(
+            [call[:3] for call in calls],
+            [
+                ("log", "holiday"),
+                ("put_on_sale", 0.5, "old"),
+                ("put_on_sale", 0.25, "sale"),
+                ("log", "always"),
+            ],
+        )
+
+        self.rule_set.add_rule(dict(RULES[1], priority=20))
+        results, calls = run_compiled(self.rule_set, dict(price=1), True, True)
+        self.assertEqual(results, [False] * 4 + [True])
+
+    def test_run_candidates(self):
+        product = Product(price=1)
+
+        results = self.rule_set.run_candidates(
+            [0, 1], ProductVariables(product), ProductActions(product), True
+        )
+
+        self.assertEqual(results, [False, True, False, False])
+        self.assertEqual(product.calls, [("log", "holiday")])
+
+    def test_invalid_priority(self):
+        with self.assertRaises(AssertionError):
+            compile_rules(
+                [dict(RULES[3], priority="high")], ProductVariables, ProductActions
+            )
+
+
+class EvaluateTests(TestCase):
+    def setUp(self):
+        self.rules = [dict(rule, priority=i % 2) for i, rule in enumerate(RULES)]
+        self.rule_set = compile_rules(self.rules, ProductVariables, ProductActions)
+
+    def test_evaluate_then_commit_matches_run_all(self):
+        for product_kwargs in PRODUCTS:
+            for stop_on_first_trigger in (False, True):
+                for by_priority in (False, True):
+                    expected = run_interpreted(
+                        self.rules, product_kwargs, stop_on_first_trigger, by_priority
+                    )
+                    for evaluate in (
+                        partial(
+                            engine.evaluate, self.rules, actions_class=ProductActions
+                        ),
+                        self.rule_set.evaluate,
+                    ):
+                        product = Product(**product_kwargs)
+                        plan = evaluate(
+                            ProductVariables(product),
+                            stop_on_first_trigger=stop_on_first_trigger,
+                            by_priority=by_priority,
+                        )
+                        self.assertEqual(product.calls, [])
+                        results = engine.commit(plan, ProductActions(product))
+                        self.assertEqual((results, product.calls), expected)
+
+    def test_plan(self):
+        plan = self.rule_set.evaluate(ProductVariables(Product(price=1)))
+
+        self.assertEqual(plan.results, (True, True, True, True))
+        self.assertEqual(
+            [(action.name, action.params) for action in plan.actions],
+            [
+                ("put_on_sale", (("percentage", 0.25), ("reason", "sale"))),
+                ("log", (("message", "holiday"),)),
+                ("put_on_sale", (("percentage", 0.5), ("reason", "old"))),
+                ("log", (("message", "always"),)),
+            ],
+        )
+        # Only actions receiving them keep the conditions
+        self.assertEqual(len(plan.actions[0].conditions), 2)
+        self.assertEqual(plan.actions[1].conditions, ())
+
+    def test_evaluate_checks_actions(self):
+        rules = [{"actions": [{"name": "log", "params": {}}]}]
+
+        with self.assertRaises(AssertionError):
+            engine.evaluate(rules, ProductVariables(Product()), ProductActions)
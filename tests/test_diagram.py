@@ -0,0 +1,117 @@
+from decimal import Decimal
+from unittest import TestCase
+
+from benchmarks.generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+from business_rules import engine
+from business_rules.compiler import compile_rules
+from business_rules.diagram import DecisionDiagramRuleSet, _implied_value
+
+from .differential import PRIORITIZED_RULES, MatchesInterpreterTests
+from .test_compiler import (
+    Product,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+
+def threshold_rules(thresholds):
+    return [
+        {
+            "conditions": {
+                "name": "price",
+                "operator": "greater_than",
+                "value": threshold,
+            },
+            "actions": [{"name": "log", "params": {"message": str(threshold)}}],
+        }
+        for threshold in thresholds
+    ]
+
+
+class DecisionDiagramRuleSetTests(MatchesInterpreterTests, TestCase):
+    # Single conditions on few variables, which the diagram handles without
+    # falling back to the compiled rules
+    generated_rules = {
+        "rule_count": 300,
+        "depth": 0,
+        "operator_mix": {"numeric": 3, "boolean": 1},
+        "variables_per_type": 1,
+    }
+    generated_facts = 30
+
+    def build(self, rule_set):
+        diagram_rules = DecisionDiagramRuleSet(rule_set)
+        self.assertFalse(diagram_rules.uses_fallback)
+        return [diagram_rules]
+
+    def test_rules_do_not_use_the_fallback(self):
+        diagram_rules = DecisionDiagramRuleSet(
+            compile_rules(PRIORITIZED_RULES, ProductVariables, ProductActions)
+        )
+
+        self.assertFalse(diagram_rules.uses_fallback)
+
+    def test_thresholds(self):
+        rules = threshold_rules(range(0, 100, 5))
+        diagram_rules = DecisionDiagramRuleSet(
+            compile_rules(rules, ProductVariables, ProductActions)
+        )
+
+        # One node per threshold, a binary search finds the price
+        self.assertEqual(diagram_rules.node_count, 20)
+        report = diagram_rules.report()
+        self.assertEqual(report["naive_expected_tests"], 20)
+        self.assertLess(report["expected_tests"], 6)
+        for price in (-1, 0, 7, 99, 100):
+            self.assertEqual(
+                run_compiled(diagram_rules, dict(price=price)),
+                run_interpreted(rules, dict(price=price)),
+            )
+
+    def test_report_with_samples(self):
+        rules = threshold_rules(range(0, 100, 5))
+        diagram_rules = DecisionDiagramRuleSet(
+            compile_rules(rules, ProductVariables, ProductActions)
+        )
+        samples = [ProductVariables(Product(price=price)) for price in (3, 52)]
+
+        report = diagram_rules.report(samples)
+
+        self.assertEqual(report["naive_expected_tests"], 20)
+        self.assertLessEqual(report["expected_tests"], 6)
+
+    def test_fallback(self):
+        variables_class = make_variables_class()
+        rules = generate_rules(50, depth=2, seed=5)
+        diagram_rules = DecisionDiagramRuleSet(
+            compile_rules(rules, variables_class, SyntheticActions), max_nodes=100
+        )
+
+        self.assertTrue(diagram_rules.uses_fallback)
+        self.assertIsNone(diagram_rules.report()["expected_tests"])
+        for fact in generate_facts(10):
+            self.assertEqual(
+                diagram_rules.run_all(variables_class(fact), SyntheticActions(fact)),
+                engine.run_all(rules, variables_class(fact), SyntheticActions(fact)),
+            )
+
+    def test_implied_value(self):
+        greater_than_5 = (Decimal(5), False, None, False)
+        greater_than_3 = (Decimal(3), False, None, False)
+        at_most_5 = (None, False, Decimal(5), True)
+        equal_to_4 = (Decimal(4), True, Decimal(4), True)
+
+        self.assertTrue(_implied_value(greater_than_5, True, greater_than_3))
+        self.assertIsNone(_implied_value(greater_than_3, True, greater_than_5))
+        self.assertFalse(_implied_value(greater_than_3, False, greater_than_5))
+        self.assertFalse(_implied_value(greater_than_5, True, at_most_5))
+        self.assertTrue(_implied_value(greater_than_5, False, at_most_5))
+        self.assertFalse(_implied_value(greater_than_5, True, equal_to_4))
+        self.assertIsNone(_implied_value(greater_than_3, True, equal_to_4))
@@ -1,10 +1,13 @@
+from functools import partial
 from mock import patch, MagicMock
 from business_rules import engine
 from business_rules import fields
 from business_rules.actions import BaseActions, ActionParam, rule_action
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
 from business_rules.fields import FIELD_TEXT, FIELD_NUMERIC
-from business_rules.models import ConditionResult
-from business_rules.operators import StringType
+from business_rules.models import ActionCall, ConditionResult
+from business_rules.operators import NumericType, StringType
 from business_rules.variables import BaseVariables
 from unittest import TestCase
 
@@ -89,6 +92,77 @@ class EngineTests(TestCase):
         )
         self.assertEqual(engine.do_actions.call_count, 0)
 
+    @patch.object(engine, "run", return_value=True)
+    def test_run_all_by_priority(self, *args):
+        rule1 = {"conditions": "condition1", "actions": "action name 1"}
+        rule2 = {"conditions": "condition2", "actions": "action name 2", "priority": 2}
+        rule3 = {"conditions": "condition3", "actions": "action name 3", "priority": 2}
+
+        variables = BaseVariables()
+        actions = BaseActions()
+
+        results = engine.run_all(
+            [rule1, rule2, rule3], variables, actions, by_priority=True
+        )
+
+        self.assertEqual(results, [True, True, True])
+        self.assertEqual(
+            [call[0][0] for call in engine.run.call_args_list], [rule2, rule3, rule1]
+        )
+
+        engine.run.reset_mock()
+        results = engine.run_all(
+            [rule1, rule2, rule3],
+            variables,
+            actions,
+            stop_on_first_trigger=True,
+            by_priority=True,
+        )
+
+        self.assertEqual(results, [False, True, False])
+        engine.run.assert_called_once_with(rule2, variables, actions)
+
+    def test_run_without_condition_results(self):
+        action_mock = MagicMock()
+
+        class SomeActions(BaseActions):
+            @rule_action()
+            def some_action(self):
+                action_mock()
+
+        conditions = {
+            "all": [{"name": "true_variable", "operator": "is_true", "value": ""}]
+        }
+        rule = {"conditions": conditions, "actions": [{"name": "some_action"}]}
+
+        with patch.object(engine, "check_conditions_recursively") as check_mock:
+            result = engine.run(rule, TrueVariables(), SomeActions())
+
+        self.assertTrue(result)
+        self.assertEqual(check_mock.call_count, 0)
+        action_mock.assert_called_once_with()
+
+    def test_run_with_condition_results(self):
+        action_mock = MagicMock()
+
+        class SomeActions(BaseActions):
+            @rule_action()
+            def some_action(self, **kwargs):
+                action_mock(kwargs["conditions"])
+
+        condition = {"name": "true_variable", "operator": "is_true", "value": ""}
+        rule = {
+            "conditions": {"all": [condition]},
+            "actions": [{"name": "some_action"}],
+        }
+
+        result = engine.run(rule, TrueVariables(), SomeActions())
+
+        self.assertTrue(result)
+        action_mock.assert_called_once_with(
+            [ConditionResult(True, "true_variable", "is_true", "", {})]
+        )
+
     @patch.object(engine, "check_condition", return_value=(True,))
     def test_check_all_conditions_with_all_true(self, *args):
         conditions = {"all": [{"thing1": ""}, {"thing2": ""}]}
@@ -195,6 +269,30 @@ class EngineTests(TestCase):
             self.assertTrue(result)
             string_type.contains.assert_called_once_with("its mocked")
 
+    def test_operator_comparison_casts_argument(self):
+        self.assertTrue(
+            engine._do_operator_comparison(NumericType(2), "greater_than", 1.5)
+        )
+        self.assertTrue(
+            engine._do_operator_comparison(StringType("yo"), "non_empty", None)
+        )
+        with self.assertRaisesRegex(AssertionError, "not a valid numeric type"):
+            engine._do_operator_comparison(NumericType(2), "greater_than", "1")
+
+    def test_operator_replaced_on_the_type(self):
+        with patch.object(StringType, "equal_to", return_value="PATCHED"):
+            self.assertEqual(
+                engine._do_operator_comparison(StringType("yo"), "equal_to", "no"),
+                "PATCHED",
+            )
+        self.assertFalse(
+            engine._do_operator_comparison(StringType("yo"), "equal_to", "no")
+        )
+
+    def test_unknown_operator(self):
+        with self.assertRaisesRegex(AssertionError, "Operator unknown does not exist"):
+            engine._do_operator_comparison(StringType("yo"), "unknown", "yo")
+
     # ##################################### #
     # ############## Actions ############## #
     # ##################################### #
@@ -780,3 +878,148 @@ class TrueVariables(BaseVariables):
     @boolean_rule_variable
     def true_variable(self):
         return True
+
+
+class BatchActions(BaseActions):
+    batches = None
+
+    def __init__(self, fact):
+        self.fact = fact
+        self.calls = []
+
+    @rule_action(
+        params={
+            "quantity": FIELD_NUMERIC,
+            "reason": ActionParam(field_type=FIELD_TEXT, default_value="low"),
+        },
+        batch=True,
+    )
+    def order_more(cls, calls):
+        cls.batches.append(calls)
+
+    @rule_action(params={"message": FIELD_TEXT})
+    def log(self, message):
+        self.calls.append(message)
+
+
+class BatchActionsTests(TestCase):
+    rule = {
+        "conditions": {"name": "true_variable", "operator": "is_true", "value": ""},
+        "actions": [
+            {"name": "order_more", "params": {"quantity": 2}},
+            {"name": "log", "params": {"message": "ordered"}},
+        ],
+    }
+
+    def setUp(self):
+        BatchActions.batches = []
+
+    def test_batch_action_outside_a_batch(self):
+        actions = BatchActions("a")
+
+        engine.run_all([self.rule], TrueVariables(), actions)
+
+        self.assertEqual(
+            BatchActions.batches,
+            [[ActionCall(actions, {"quantity": 2, "reason": "low"}, self.rule)]],
+        )
+        self.assertEqual(actions.calls, ["ordered"])
+
+    def test_run_all_batch(self):
+        facts = [(TrueVariables(), BatchActions(fact)) for fact in "abc"]
+
+        results = engine.run_all_batch([self.rule, self.rule], facts)
+
+        self.assertEqual(results, [[True, True]] * 3)
+        self.assertEqual(len(BatchActions.batches), 1)
+        self.assertEqual(
+            [
+                (call.actions.fact, call.params["quantity"])
+                for call in BatchActions.batches[0]
+            ],
+            [("a", 2), ("a", 2), ("b", 2), ("b", 2), ("c", 2), ("c", 2)],
+        )
+        # Other actions run right away
+        self.assertEqual([actions.calls for _, actions in facts], [["ordered"] * 2] * 3)
+
+    def test_batch_actions_dropped_on_error(self):
+        with self.assertRaises(ValueError):
+            with engine.batch_actions():
+                engine.run_all([self.rule], TrueVariables(), BatchActions("a"))
+                raise ValueError()
+
+        self.assertEqual(BatchActions.batches, [])
+
+
+class IdempotentActions(BaseActions):
+    def __init__(self):
+        self.calls = []
+
+    @rule_action(params={"message": FIELD_TEXT}, idempotent=True)
+    def notify(self, message):
+        self.calls.append(("notify", message))
+
+    @rule_action(params={"message": FIELD_TEXT})
+    def log(self, message):
+        self.calls.append(("log", message))
+
+
+class IdempotentActionsTests(TestCase):
+    rules = [
+        {
+            "actions": [
+                {"name": "notify", "params": {"message": message}},
+                {"name": "log", "params": {"message": message}},
+            ]
+        }
+        for message in ("a", "b", "a")
+    ]
+
+    def test_idempotent_actions_run_once_per_run_all(self):
+        rule_set = compile_rules(self.rules, TrueVariables, IdempotentActions)
+        for run_all in (
+            partial(engine.run_all, self.rules),
+            rule_set.run_all,
+            CodegenRuleSet(rule_set).run_all,
+        ):
+            actions = IdempotentActions()
+            for _ in range(2):
+                self.assertEqual(run_all(TrueVariables(), actions), [True] * 3)
+
+            self.assertEqual(
+                actions.calls,
+                [
+                    ("notify", "a"),
+                    ("log", "a"),
+                    ("notify", "b"),
+                    ("log", "b"),
+                    ("log", "a"),
+                ]
+                * 2,
+            )
+
+    def test_outside_of_run_all(self):
+        actions = IdempotentActions()
+        for _ in range(2):
+            engine.run(self.rules[0], TrueVariables(), actions)
+
+        self.assertEqual(actions.calls, [("notify", "a"), ("log", "a")] * 2)
+
+    def test_idempotent_actions_are_coalesced_across_a_batch(self):
+        facts = [(TrueVariables(), IdempotentActions()) for _ in range(2)]
+
+        engine.run_all_batch(self.rules, facts)
+
+        self.assertEqual(
+            [actions.calls for _, actions in facts],
+            [
+                [
+                    ("notify", "a"),
+                    ("log", "a"),
+                    ("notify", "b"),
+                    ("log", "b"),
+                    ("log", "a"),
+                ],
+                [("log", "a"), ("log", "b"), ("log", "a")],
+            ],
+        )
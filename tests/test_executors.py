@@ -0,0 +1,139 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from business_rules import engine
+from business_rules.actions import BaseActions, rule_action
+from business_rules.executors import (
+    ActionExecutor,
+    AsyncioActionExecutor,
+    InlineActionExecutor,
+    ProcessPoolActionExecutor,
+    ThreadPoolActionExecutor,
+)
+from business_rules.fields import FIELD_NUMERIC, FIELD_TEXT
+from business_rules.variables import BaseVariables
+
+RULES = [{"actions": [{"name": "record", "params": {"step": i}}]} for i in range(5)]
+
+
+class RecordingActions(BaseActions):
+    def __init__(self, fact):
+        self.fact = fact
+        self.steps = []
+
+    @rule_action(params={"step": FIELD_NUMERIC})
+    def record(self, step):
+        # Later steps are faster, so they would finish first if run concurrently
+        time.sleep((5 - step) * 0.002)
+        self.steps.append(step)
+
+
+class FileActions(BaseActions):
+    def __init__(self, path):
+        self.path = path
+
+    @rule_action(params={"step": FIELD_NUMERIC})
+    def record(self, step):
+        with open(self.path, "a") as f:
+            f.write("{0} {1}\n".format(os.getpid(), step))
+
+
+class AsyncActions(RecordingActions):
+    @rule_action(params={"step": FIELD_NUMERIC})
+    async def record(self, step):
+        await asyncio.sleep((5 - step) * 0.002)
+        self.steps.append(step)
+
+
+class FailingActions(BaseActions):
+    @rule_action(params={"message": FIELD_TEXT})
+    def fail(self, message):
+        raise ValueError(message)
+
+
+def run_facts(executor, actions_class=RecordingActions, facts=range(4)):
+    all_actions = [actions_class(fact) for fact in facts]
+    with engine.executing(executor):
+        for actions in all_actions:
+            engine.run_all(RULES, BaseVariables(), actions)
+    return all_actions
+
+
+class ActionExecutorTests(TestCase):
+    def assert_ordered_per_fact(self, all_actions):
+        for actions in all_actions:
+            self.assertEqual(actions.steps, list(range(5)))
+
+    def test_inline(self):
+        all_actions = run_facts(InlineActionExecutor())
+
+        self.assert_ordered_per_fact(all_actions)
+        self.assertIsNone(engine._executor)
+
+    def test_thread_pool(self):
+        with ThreadPoolActionExecutor(workers=3, max_pending=2) as executor:
+            all_actions = run_facts(executor)
+
+        self.assert_ordered_per_fact(all_actions)
+        with self.assertRaises(AssertionError):
+            executor.submit(None, lambda: None)
+
+    def test_process_pool(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        paths = [os.path.join(directory, str(i)) for i in range(3)]
+
+        with ProcessPoolActionExecutor(workers=2) as executor:
+            run_facts(executor, FileActions, paths)
+
+        for path in paths:
+            with open(path) as f:
+                lines = [line.split() for line in f]
+            self.assertEqual([int(step) for _, step in lines], list(range(5)))
+            self.assertNotIn(str(os.getpid()), [pid for pid, _ in lines])
+
+    def test_asyncio(self):
+        with AsyncioActionExecutor(max_pending=3) as executor:
+            all_actions = run_facts(executor, AsyncActions)
+
+        self.assert_ordered_per_fact(all_actions)
+
+    def test_asyncio_with_a_running_loop(self):
+        loop = asyncio.new_event_loop()
+        thread = threading.Thread(target=loop.run_forever, daemon=True)
+        thread.start()
+        self.addCleanup(loop.close)
+        self.addCleanup(thread.join)
+        self.addCleanup(loop.call_soon_threadsafe, loop.stop)
+
+        with AsyncioActionExecutor(loop) as executor:
+            all_actions = run_facts(executor, AsyncActions)
+
+        self.assert_ordered_per_fact(all_actions)
+        self.assertTrue(loop.is_running())
+
+    def test_errors_are_raised_by_flush(self):
+        rules = [{"actions": [{"name": "fail", "params": {"message": "failed"}}]}]
+        for executor in (
+            ThreadPoolActionExecutor(workers=1),
+            AsyncioActionExecutor(),
+        ):
+            with executor:
+                engine.set_executor(executor)
+                try:
+                    engine.run_all(rules, BaseVariables(), FailingActions())
+                finally:
+                    engine.set_executor(None)
+                with self.assertRaisesRegex(ValueError, "failed"):
+                    executor.flush()
+                # Errors are only raised once
+                executor.flush()
+
+        with self.assertRaisesRegex(ValueError, "failed"):
+            with engine.executing(ActionExecutor()):
+                engine.run_all(rules, BaseVariables(), FailingActions())
@@ -0,0 +1,105 @@
+from unittest import TestCase
+
+from business_rules.compiler import compile_rules
+from business_rules.expression_index import ExpressionIndex
+
+from .differential import MatchesInterpreterTests
+from .test_compiler import PRODUCTS, RULES, Product, ProductActions, ProductVariables
+
+TARGETING_RULES = [
+    {
+        "conditions": {
+            "all": [
+                {"name": "tags", "operator": "contains", "value": "Holiday"},
+                {"name": "current_month", "operator": "equal_to", "value": "December"},
+                {"name": "price", "operator": "greater_than_or_equal_to", "value": 5},
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "holiday december"}}],
+    },
+    {
+        "conditions": {
+            "all": [
+                {"name": "tags", "operator": "contains", "value": "sport"},
+                {
+                    "all": [
+                        {"name": "price", "operator": "less_than", "value": 10},
+                        {"name": "price", "operator": "equal_to", "value": 4},
+                    ]
+                },
+            ]
+        },
+        "actions": [{"name": "put_on_sale", "params": {"percentage": 0.1}}],
+    },
+    {
+        "conditions": {"name": "on_sale", "operator": "is_true", "value": ""},
+        "actions": [{"name": "log", "params": {"message": "on sale"}}],
+    },
+    {
+        "conditions": {
+            "all": [
+                {
+                    "name": "current_inventory",
+                    "operator": "less_than_or_equal_to",
+                    "value": 3,
+                },
+                {"name": "current_month", "operator": "starts_with", "value": "Ma"},
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "low"}}],
+    },
+]
+
+TARGETING_PRODUCTS = PRODUCTS + [
+    dict(price=4, tags=["Sport", "sport", "holiday"]),
+    dict(price=5, tags=["HOLIDAY"]),
+    dict(inventory=3, month="March", price=10, tags=["sport"]),
+]
+
+
+class ExpressionIndexTests(MatchesInterpreterTests, TestCase):
+    rule_lists = [
+        [dict(rule, priority=i % 3) for i, rule in enumerate(rules)]
+        for rules in (RULES, TARGETING_RULES, RULES + TARGETING_RULES)
+    ]
+    products = TARGETING_PRODUCTS
+    generated_rules = {
+        "rule_count": 300,
+        "depth": 1,
+        "operator_mix": {"numeric": 3, "string": 2, "boolean": 1, "select": 2},
+        "seed": 3,
+    }
+    generated_facts = 30
+
+    def build(self, rule_set):
+        return [ExpressionIndex(rule_set)]
+
+    def test_candidates(self):
+        index = ExpressionIndex(
+            compile_rules(TARGETING_RULES, ProductVariables, ProductActions)
+        )
+        # The last rule has an indexed condition and one checked afterwards
+        self.assertEqual(
+            index.report(),
+            {
+                "rules": 4,
+                "unindexed_rules": 0,
+                "rules_by_size": {3: 2, 1: 2},
+                "variables": 5,
+            },
+        )
+        self.assertEqual(
+            index.candidates(ProductVariables(Product(price=4, tags=["sport"]))), [1, 2]
+        )
+        self.assertEqual(
+            index.candidates(ProductVariables(Product(inventory=1, month="May"))), [3]
+        )
+        self.assertEqual(index.candidates(ProductVariables(Product(price=7))), [])
+
+    def test_rules_that_are_not_conjunctions(self):
+        index = ExpressionIndex(compile_rules(RULES, ProductVariables, ProductActions))
+
+        # The `any` rule, the rule on a datetime and a variable receiving the
+        # rule and the rule without conditions are always candidates
+        self.assertEqual(index.unindexed, [1, 2, 3])
+        self.assertEqual(index.report()["rules_by_size"], {2: 1})
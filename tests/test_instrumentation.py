@@ -0,0 +1,130 @@
+from unittest import TestCase
+
+from mock import MagicMock
+
+from business_rules import engine
+from business_rules.compiler import compile_rules
+from business_rules.instrumentation import Instrumentation, ProfilingCollector
+from tests.test_compiler import (
+    RULES,
+    Product,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+
+class EngineInstrumentationTests(TestCase):
+    def assert_events(self, run):
+        instrumentation = MagicMock(spec=Instrumentation)
+
+        with engine.instrumented(instrumentation):
+            run()
+
+        self.assertEqual(instrumentation.rule_started.call_count, 4)
+        self.assertEqual(instrumentation.rule_finished.call_count, 4)
+        triggered = [c[0][1] for c in instrumentation.rule_finished.call_args_list]
+        self.assertEqual(triggered, [True, False, True, True])
+
+        conditions = [
+            (c[0][1]["name"], c[0][2])
+            for c in instrumentation.condition_evaluated.call_args_list
+        ]
+        self.assertEqual(
+            conditions,
+            [
+                ("current_inventory", True),
+                ("current_month", True),
+                ("price", False),
+                ("tags", False),
+                ("last_order", True),
+                ("inventory_plus", True),
+            ],
+        )
+
+        variables = [c[0][:2] for c in instrumentation.variable_computed.call_args_list]
+        self.assertEqual(variables[-1], ("inventory_plus", {"x": 2}))
+        self.assertEqual(len(variables), 6)
+
+        actions = [c[0][:2] for c in instrumentation.action_executed.call_args_list]
+        self.assertEqual(
+            actions,
+            [
+                ("put_on_sale", {"percentage": 0.25, "reason": "sale"}),
+                ("put_on_sale", {"percentage": 0.5, "reason": "old"}),
+                ("log", {"message": "always"}),
+            ],
+        )
+
+        # Nothing is sent once the context manager exits
+        run()
+        self.assertEqual(instrumentation.rule_started.call_count, 4)
+
+    def test_interpreter_events(self):
+        self.assert_events(lambda: run_interpreted(RULES, {}))
+
+    def test_compiled_events(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        self.assert_events(lambda: run_compiled(rule_set, {}))
+
+    def test_set_instrumentation_returns_previous(self):
+        first, second = Instrumentation(), Instrumentation()
+
+        self.assertIsNone(engine.set_instrumentation(first))
+        self.assertIs(engine.set_instrumentation(second), first)
+        self.assertIs(engine.set_instrumentation(None), second)
+
+
+class ProfilingCollectorTests(TestCase):
+    def test_report_with_engine(self):
+        collector = ProfilingCollector()
+        product = Product()
+
+        with engine.instrumented(collector):
+            for _ in range(3):
+                engine.run_all(
+                    RULES, ProductVariables(product), ProductActions(product)
+                )
+
+        report = collector.report()
+        self.assertEqual(len(report["rules"]), 4)
+        self.assertEqual(sum(r["calls"] for r in report["rules"]), 12)
+        self.assertEqual(sum(r["triggered"] for r in report["rules"]), 9)
+        self.assertEqual(len(report["conditions"]), 6)
+        self.assertEqual(sum(c["true"] for c in report["conditions"]), 12)
+        self.assertEqual(
+            sorted(a["name"] for a in report["actions"]), ["log", "put_on_sale"]
+        )
+
+    def test_report_top_n(self):
+        collector = ProfilingCollector()
+        condition = {"name": "price", "operator": "less_than", "value": 1}
+        for elapsed in (0.1, 0.3):
+            collector.condition_evaluated({}, condition, True, elapsed)
+        collector.condition_evaluated({}, dict(condition, value=2), False, 0.2)
+        collector.variable_computed("price", {}, 0.1, True)
+        collector.variable_computed("price", {}, 0.3, False)
+        collector.variable_computed("current_month", {}, 0.5, False)
+
+        report = collector.report(top_n=1)
+
+        self.assertEqual(len(report["conditions"]), 1)
+        top_condition = report["conditions"][0]
+        self.assertEqual(top_condition["value"], 1)
+        self.assertEqual(top_condition["calls"], 2)
+        self.assertEqual(top_condition["true"], 2)
+        self.assertAlmostEqual(top_condition["total_time"], 0.4)
+        self.assertAlmostEqual(top_condition["mean_time"], 0.2)
+        self.assertAlmostEqual(top_condition["max_time"], 0.3)
+        self.assertEqual(report["variables"][0]["name"], "current_month")
+        self.assertEqual(collector.report()["variables"][1]["cache_hits"], 1)
+
+    def test_reset(self):
+        collector = ProfilingCollector()
+        collector.action_executed("log", {}, 0.1)
+
+        collector.reset()
+
+        self.assertEqual(collector.report()["actions"], [])
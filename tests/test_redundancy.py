@@ -0,0 +1,253 @@
+from unittest import TestCase
+
+from mock import MagicMock
+
+from benchmarks.generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+from business_rules import engine
+from business_rules.compiler import compile_rules
+from business_rules.instrumentation import Instrumentation
+from business_rules.redundancy import analyze_redundancy, implies
+
+from .differential import assert_matches_interpreter
+from .test_compiler import PRODUCTS, ProductActions, ProductVariables, run_compiled
+
+
+def condition(name, operator, value=None, **kwargs):
+    return dict(kwargs, name=name, operator=operator, value=value)
+
+
+def rule(rule_id, conditions, message=None, **kwargs):
+    actions = [{"name": "log", "params": {"message": message or rule_id}}]
+    return dict(kwargs, id=rule_id, conditions=conditions, actions=actions)
+
+
+PRICE_ABOVE_5 = condition("price", "greater_than", 5)
+INVENTORY_PLUS_2 = condition("inventory_plus", "equal_to", 12, params={"x": 2})
+
+RULES = [
+    rule("broad", PRICE_ABOVE_5),
+    rule(
+        "narrow",
+        {
+            "all": [
+                condition("price", "greater_than_or_equal_to", 8),
+                condition("current_month", "equal_to", "December"),
+                condition("price", "less_than", 10),
+            ]
+        },
+        priority=1,
+    ),
+    rule("copy", PRICE_ABOVE_5),
+    rule("prefix", condition("current_month", "starts_with", "Ma")),
+    rule("month", {"any": [condition("current_month", "equal_to", "May")]}),
+    rule("recent", condition("last_order", "after_than", "2024-01-01")),
+    rule(
+        "more_recent", condition("last_order", "after_than_or_equal_to", "2024-01-10")
+    ),
+    rule("rule_variable", INVENTORY_PLUS_2),
+    rule("same_rule_variable", INVENTORY_PLUS_2),
+    rule(
+        "never",
+        {
+            "all": [
+                condition("current_inventory", "greater_than", 10),
+                condition("current_inventory", "less_than", 2),
+            ]
+        },
+    ),
+    {
+        "id": "sale",
+        "conditions": PRICE_ABOVE_5,
+        "actions": [{"name": "put_on_sale", "params": {"percentage": 0.1}}],
+    },
+]
+
+
+class ImpliesTests(TestCase):
+    def conditions(self, conditions):
+        rule_set = compile_rules(
+            [rule("rule", conditions)], ProductVariables, ProductActions
+        )
+        return rule_set.rules[0].conditions
+
+    def assertImplies(self, conditions, other_conditions, expected=True):
+        self.assertEqual(
+            implies(self.conditions(conditions), self.conditions(other_conditions)),
+            expected,
+        )
+
+    def test_intervals(self):
+        self.assertImplies(condition("price", "equal_to", 7), PRICE_ABOVE_5)
+        self.assertImplies(condition("price", "greater_than", 4), PRICE_ABOVE_5, False)
+        self.assertImplies(
+            {
+                "all": [
+                    condition("price", "greater_than", 4),
+                    condition("price", "less_than_or_equal_to", 5),
+                ]
+            },
+            condition("price", "less_than", 6),
+        )
+        self.assertImplies(
+            condition("last_order", "before_than", "2024-01-01"),
+            condition("last_order", "before_than_or_equal_to", "2024-01-01"),
+        )
+
+    def test_groups(self):
+        self.assertImplies(
+            {
+                "any": [
+                    condition("price", "greater_than", 6),
+                    condition("price", "equal_to", 5.5),
+                ]
+            },
+            PRICE_ABOVE_5,
+        )
+        self.assertImplies(
+            PRICE_ABOVE_5,
+            {
+                "any": [
+                    condition("on_sale", "is_true"),
+                    condition("price", "greater_than", 1),
+                ]
+            },
+        )
+        self.assertImplies(
+            {
+                "any": [
+                    condition("price", "greater_than", 6),
+                    condition("on_sale", "is_true"),
+                ]
+            },
+            PRICE_ABOVE_5,
+            False,
+        )
+
+    def test_equality_and_sets(self):
+        self.assertImplies(
+            condition("current_month", "equal_to", "December"),
+            condition("current_month", "ends_with", "ber"),
+        )
+        self.assertImplies(
+            condition("current_month", "equal_to", "May"),
+            condition("current_month", "contains", "u"),
+            False,
+        )
+        self.assertImplies(
+            condition("tags", "contains", "Holiday"),
+            condition("tags", "contains", "Holiday"),
+        )
+        self.assertImplies(
+            condition("price", "greater_than", 6),
+            condition("current_inventory", "greater_than", 5),
+            False,
+        )
+
+
+class RedundancyTests(TestCase):
+    def setUp(self):
+        self.rule_set = compile_rules(
+            RULES, ProductVariables, ProductActions, simplify=True
+        )
+
+    def test_analysis(self):
+        analysis = analyze_redundancy(self.rule_set)
+
+        self.assertEqual(analysis.never_true, ["never"])
+        self.assertEqual(analysis.duplicates, {"copy": "broad", "sale": "broad"})
+        self.assertEqual(
+            analysis.implied,
+            {"narrow": "broad", "month": "prefix", "more_recent": "recent"},
+        )
+
+        analysis = analyze_redundancy(self.rule_set, by_priority=True)
+        # `narrow` has a higher priority and runs first
+        self.assertEqual(analysis.implied, {"month": "prefix", "more_recent": "recent"})
+
+    def test_report(self):
+        report = self.rule_set.redundancy_report()
+
+        self.assertEqual(report["rules"], 11)
+        self.assertEqual(
+            list(report["unreachable_rules"]),
+            ["narrow", "copy", "month", "more_recent", "never", "sale"],
+        )
+        self.assertEqual(
+            report["unreachable_rules"]["narrow"],
+            "Rule broad runs before it and triggers whenever it does: "
+            "all(price greater_than_or_equal_to 8, current_month equal_to 'December', "
+            "price less_than 10) implies price greater_than 5",
+        )
+        self.assertEqual(
+            report["unreachable_rules"]["copy"],
+            "Same conditions as rule broad, which runs before it",
+        )
+        self.assertEqual(
+            report["unreachable_rules"]["never"], "Its conditions can never be true"
+        )
+        self.assertEqual(report["duplicate_rules"], ["copy", "sale"])
+
+    def test_engine_matches_interpreter(self):
+        products = PRODUCTS + [dict(price=9), dict(price=9, month="May")]
+        assert_matches_interpreter(self, self.rule_set, RULES, products)
+
+    def test_redundant_rules_are_not_run(self):
+        instrumentation = MagicMock(spec=Instrumentation)
+        with engine.instrumented(instrumentation):
+            run_compiled(self.rule_set, dict(price=1, month="June"))
+        run_rules = [
+            call[0][0]["id"] for call in instrumentation.rule_started.call_args_list
+        ]
+
+        # Rules are skipped when a rule they imply was false
+        self.assertEqual(
+            run_rules,
+            [
+                "broad",
+                "prefix",
+                "recent",
+                "more_recent",
+                "rule_variable",
+                "same_rule_variable",
+            ],
+        )
+
+    def test_changes_are_analyzed(self):
+        self.rule_set.remove_rule("broad")
+
+        self.assertEqual(
+            list(self.rule_set.redundancy_report()["unreachable_rules"]),
+            ["month", "more_recent", "never", "sale"],
+        )
+        self.assertEqual(
+            self.rule_set.redundancy_report()["unreachable_rules"]["sale"],
+            "Same conditions as rule copy, which runs before it",
+        )
+
+    def test_generated_rules_match_interpreter(self):
+        variables_class = make_variables_class()
+        rules = generate_rules(200, depth=2, seed=11)
+        rule_set = compile_rules(
+            rules, variables_class, SyntheticActions, simplify=True
+        )
+
+        for fact in generate_facts(20, seed=11):
+            for stop_on_first_trigger in (False, True):
+                self.assertEqual(
+                    rule_set.run_all(
+                        variables_class(fact),
+                        SyntheticActions(fact),
+                        stop_on_first_trigger=stop_on_first_trigger,
+                    ),
+                    engine.run_all(
+                        rules,
+                        variables_class(fact),
+                        SyntheticActions(fact),
+                        stop_on_first_trigger=stop_on_first_trigger,
+                    ),
+                )
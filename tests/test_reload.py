@@ -0,0 +1,144 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from unittest import TestCase
+
+from mock import patch
+
+from business_rules import reload
+from business_rules.reload import RuleSetHandle, load_rules_from_path
+from tests.test_compiler import RULES, Product, ProductActions, ProductVariables
+
+INVALID_RULES = [{"conditions": {"name": "unknown", "operator": "equal_to"}}]
+
+
+def wait_for(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        if time.monotonic() > deadline:
+            raise AssertionError("Timed out")
+        time.sleep(0.01)
+
+
+class RuleSetHandleTests(TestCase):
+    def setUp(self):
+        self.handle = RuleSetHandle(ProductVariables, ProductActions, RULES[:1])
+
+    def tearDown(self):
+        self.handle.close()
+
+    def run_rules(self):
+        product = Product()
+        return self.handle.run_all(ProductVariables(product), ProductActions(product))
+
+    def test_reload_publishes_new_rules(self):
+        old = self.handle.current
+
+        self.handle.reload(RULES)
+
+        self.assertIsNot(self.handle.current, old)
+        self.assertEqual(self.handle.version, 1)
+        self.assertEqual(self.run_rules(), [True, False, True, True])
+        # Readers holding the old rule set keep using it
+        self.assertEqual(len(old), 1)
+
+    def test_reload_same_rules_keeps_version(self):
+        current = self.handle.current
+
+        self.handle.reload(RULES[:1])
+
+        self.assertIs(self.handle.current, current)
+        self.assertEqual(self.handle.version, 0)
+
+    def test_reload_invalid_rules_keeps_current(self):
+        current = self.handle.current
+
+        with self.assertRaises(AssertionError):
+            self.handle.reload(INVALID_RULES)
+
+        self.assertIs(self.handle.current, current)
+
+    def test_overlapping_reloads_keep_the_last_started(self):
+        started, compiled = threading.Event(), threading.Event()
+        compile_rules = reload.compile_rules
+
+        def slow_compile_rules(rule_list, *args, **kwargs):
+            rule_set = compile_rules(rule_list, *args, **kwargs)
+            if len(rule_list) == 2:
+                # The first reload finishes compiling after the second one
+                started.set()
+                compiled.wait(5)
+            return rule_set
+
+        with patch.object(reload, "compile_rules", slow_compile_rules):
+            first = threading.Thread(target=self.handle.reload, args=(RULES[:2],))
+            first.start()
+            started.wait(5)
+            self.handle.reload(RULES)
+            compiled.set()
+            first.join()
+
+        self.assertEqual(len(self.handle.current), len(RULES))
+        self.assertEqual(self.handle.version, 1)
+
+    def test_reload_in_background(self):
+        future = self.handle.reload_in_background(lambda: RULES)
+
+        self.assertIs(future.result(timeout=5), self.handle.current)
+        self.assertEqual(len(self.handle.current), len(RULES))
+
+    def test_reload_in_background_error(self):
+        future = self.handle.reload_in_background(lambda: INVALID_RULES)
+
+        with self.assertRaises(AssertionError):
+            future.result(timeout=5)
+        self.assertIsInstance(self.handle.last_error, AssertionError)
+        self.assertEqual(len(self.handle.current), 1)
+
+
+class WatchTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.handle = RuleSetHandle(ProductVariables, ProductActions)
+
+    def tearDown(self):
+        self.handle.close()
+        shutil.rmtree(self.directory)
+
+    def write(self, name, rules):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            json.dump(rules, f)
+        return path
+
+    def test_load_rules_from_directory(self):
+        self.write("b.json", RULES[1])
+        self.write("a.json", RULES[:1])
+        self.write("ignored.txt", "not json")
+
+        self.assertEqual(load_rules_from_path(self.directory), RULES[:2])
+
+    def test_watch_file(self):
+        path = self.write("rules.json", RULES[:1])
+
+        self.handle.watch(path, interval=0.01)
+        self.assertEqual(len(self.handle.current), 1)
+
+        self.write("rules.json", RULES)
+        wait_for(lambda: len(self.handle.current) == len(RULES))
+
+    def test_watch_directory_keeps_rules_on_error(self):
+        self.write("a.json", RULES[:2])
+
+        self.handle.watch(self.directory, interval=0.01)
+        self.assertEqual(len(self.handle.current), 2)
+
+        self.write("b.json", INVALID_RULES)
+        wait_for(lambda: self.handle.last_error is not None)
+        self.assertEqual(len(self.handle.current), 2)
+
+        self.write("b.json", RULES[2:])
+        wait_for(lambda: len(self.handle.current) == len(RULES))
@@ -0,0 +1,88 @@
+from unittest import TestCase
+
+from business_rules.compiler import compile_rules
+from business_rules.result_cache import CachedRuleSet
+from business_rules.variables import numeric_rule_variable
+
+from .differential import PRIORITIZED_RULES, MatchesInterpreterTests
+from .test_compiler import (
+    PRODUCTS,
+    RULES,
+    Product,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+# Without the rule on a variable receiving the rule
+CACHEABLE_RULES = [rule for i, rule in enumerate(PRIORITIZED_RULES) if i != 2]
+
+
+class CachedRuleSetTests(MatchesInterpreterTests, TestCase):
+    rule_lists = (CACHEABLE_RULES,)
+    # The second run reads the outcomes cached by the first one
+    runs = 2
+
+    def setUp(self):
+        self.cached_rules = self.build(
+            compile_rules(CACHEABLE_RULES, ProductVariables, ProductActions)
+        )[0]
+
+    def build(self, rule_set):
+        return [CachedRuleSet(rule_set, max_size=2)]
+
+    def test_hits(self):
+        # Products differing only by a value the rules do not read look the same
+        run_compiled(self.cached_rules, dict(inventory=10, price=4))
+        run_compiled(self.cached_rules, dict(inventory=10, price=4))
+        self.assertEqual(
+            run_compiled(self.cached_rules, dict(inventory=10, price=4, month="May")),
+            run_interpreted(CACHEABLE_RULES, dict(inventory=10, price=4, month="May")),
+        )
+
+        self.assertEqual(
+            self.cached_rules.stats(),
+            {"hits": 1, "misses": 2, "uncacheable": 0, "size": 2, "max_size": 2},
+        )
+
+    def test_variables_are_computed_once_per_miss(self):
+        calls = []
+
+        class CountingVariables(ProductVariables):
+            @numeric_rule_variable()
+            def price(self):
+                calls.append(None)
+                return self.product.price
+
+        product = Product(price=2)
+        results = self.cached_rules.run_all(
+            CountingVariables(product), ProductActions(product)
+        )
+
+        self.assertEqual(results, run_interpreted(CACHEABLE_RULES, dict(price=2))[0])
+        self.assertEqual(self.cached_rules.stats()["misses"], 1)
+        self.assertEqual(len(calls), 1)
+
+    def test_least_recently_used_is_evicted(self):
+        for price in (1, 2, 1, 3, 1, 2):
+            run_compiled(self.cached_rules, dict(price=price))
+
+        stats = self.cached_rules.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 4, 2))
+
+        self.cached_rules.clear()
+        self.assertEqual(self.cached_rules.stats()["size"], 0)
+
+    def test_variables_receiving_the_rule_are_not_cached(self):
+        cached_rules = CachedRuleSet(
+            compile_rules(RULES, ProductVariables, ProductActions)
+        )
+
+        self.assertFalse(cached_rules.cacheable)
+        for _ in range(2):
+            self.assertEqual(
+                run_compiled(cached_rules, PRODUCTS[1]),
+                run_interpreted(RULES, PRODUCTS[1]),
+            )
+        self.assertEqual(cached_rules.stats()["uncacheable"], 2)
@@ -0,0 +1,217 @@
+from unittest import TestCase
+
+from mock import MagicMock
+
+from benchmarks.generators import (
+    SyntheticActions,
+    generate_facts,
+    generate_rules,
+    make_variables_class,
+)
+from business_rules import engine
+from business_rules.bitset import BitsetRuleSet
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import ALL, compile_rules
+from business_rules.diagram import DecisionDiagramRuleSet
+from business_rules.expression_index import ExpressionIndex
+from business_rules.instrumentation import Instrumentation
+from business_rules.simplify import describe, is_never_true
+
+from .differential import assert_matches_interpreter
+from .test_compiler import PRODUCTS, ProductActions, ProductVariables, run_compiled
+
+
+def condition(name, operator, value=None):
+    return {"name": name, "operator": operator, "value": value}
+
+
+def log(message):
+    return [{"name": "log", "params": {"message": message}}]
+
+
+INVENTORY_ABOVE_5 = condition("current_inventory", "greater_than", 5)
+DECEMBER = condition("current_month", "equal_to", "December")
+
+RULES = [
+    # Nested groups and duplicates
+    {
+        "conditions": {
+            "all": [
+                {"all": [INVENTORY_ABOVE_5, {"any": [DECEMBER]}]},
+                INVENTORY_ABOVE_5,
+            ]
+        },
+        "actions": log("nested"),
+    },
+    # Contradiction
+    {
+        "conditions": {
+            "all": [
+                condition("price", "greater_than", 10),
+                DECEMBER,
+                condition("price", "less_than", 5),
+            ]
+        },
+        "actions": log("never"),
+    },
+    # Always true
+    {
+        "conditions": {
+            "any": [
+                condition("price", "greater_than", 5),
+                condition("price", "less_than_or_equal_to", 5),
+            ]
+        },
+        "actions": log("always"),
+    },
+    # Implied conditions
+    {
+        "conditions": {
+            "all": [
+                condition("current_inventory", "greater_than", 3),
+                INVENTORY_ABOVE_5,
+                {
+                    "any": [
+                        condition("price", "less_than", 5),
+                        condition("price", "less_than", 7),
+                    ]
+                },
+            ]
+        },
+        "actions": log("implied"),
+    },
+    # Boolean contradiction in a branch of an `any` group
+    {
+        "conditions": {
+            "any": [
+                {
+                    "all": [
+                        condition("on_sale", "is_true"),
+                        condition("on_sale", "is_false"),
+                    ]
+                },
+                DECEMBER,
+            ]
+        },
+        "actions": log("december"),
+    },
+    # Actions receiving the conditions keep them all
+    {
+        "conditions": {
+            "all": [
+                INVENTORY_ABOVE_5,
+                INVENTORY_ABOVE_5,
+                {"any": [{"any": [DECEMBER]}]},
+            ]
+        },
+        "actions": [{"name": "put_on_sale", "params": {"percentage": 0.1}}],
+    },
+]
+
+
+class SimplifyTests(TestCase):
+    def setUp(self):
+        self.rule_set = compile_rules(
+            RULES, ProductVariables, ProductActions, simplify=True
+        )
+
+    def test_simplified_conditions(self):
+        conditions = [
+            describe(rule.conditions) for rule in self.rule_set.rules if rule.conditions
+        ]
+        self.assertEqual(
+            conditions,
+            [
+                (
+                    "all(current_inventory greater_than 5, "
+                    "current_month equal_to 'December')"
+                ),
+                "any()",
+                "all(current_inventory greater_than 5, price less_than 7)",
+                "current_month equal_to 'December'",
+                (
+                    "all(current_inventory greater_than 5, "
+                    "current_inventory greater_than 5, "
+                    "current_month equal_to 'December')"
+                ),
+            ],
+        )
+        self.assertIsNone(self.rule_set.rules[2].conditions)
+        self.assertTrue(is_never_true(self.rule_set.rules[1].conditions))
+
+    def test_report(self):
+        report = self.rule_set.simplification_report()
+
+        self.assertEqual(report["rules"], 6)
+        self.assertEqual(report["simplified_rules"], 6)
+        self.assertEqual(report["unsatisfiable_rules"], [1])
+        self.assertEqual(
+            report["changes"][1],
+            [
+                (
+                    "`all` group can never be true: "
+                    "price greater_than 10 and price less_than 5"
+                ),
+                "The rule can never trigger",
+            ],
+        )
+        self.assertEqual(
+            report["changes"][3],
+            [
+                "Removed price less_than 5, price less_than 7 is true whenever it is",
+                "Replaced an `any` group by its only condition",
+                (
+                    "Removed current_inventory greater_than 3, implied by "
+                    "current_inventory greater_than 5"
+                ),
+            ],
+        )
+        self.assertIn(
+            "`any` group is always true: price greater_than 5 or "
+            "price less_than_or_equal_to 5",
+            report["changes"][2],
+        )
+
+    def test_not_simplified_by_default(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+
+        self.assertEqual(rule_set.rules[0].conditions.kind, ALL)
+        self.assertEqual(len(rule_set.rules[0].conditions.children), 2)
+        self.assertEqual(rule_set.simplification_report()["simplified_rules"], 0)
+
+    def test_engines_match_interpreter(self):
+        rule_sets = [
+            self.rule_set,
+            BitsetRuleSet(self.rule_set),
+            DecisionDiagramRuleSet(self.rule_set),
+            ExpressionIndex(self.rule_set),
+            CodegenRuleSet(self.rule_set),
+        ]
+        products = PRODUCTS + [dict(price=20), dict(price=5, inventory=4)]
+        for rule_set in rule_sets:
+            assert_matches_interpreter(self, rule_set, RULES, products)
+
+    def test_fewer_conditions_evaluated(self):
+        counts = []
+        for simplify in (False, True):
+            rule_set = compile_rules(
+                RULES[:2], ProductVariables, ProductActions, simplify=simplify
+            )
+            instrumentation = MagicMock(spec=Instrumentation)
+            with engine.instrumented(instrumentation):
+                run_compiled(rule_set, dict(price=20))
+            counts.append(instrumentation.condition_evaluated.call_count)
+        self.assertEqual(counts, [6, 2])
+
+    def test_generated_rules_match_interpreter(self):
+        variables_class = make_variables_class()
+        rules = generate_rules(200, depth=3, seed=7)
+        rule_set = compile_rules(
+            rules, variables_class, SyntheticActions, simplify=True
+        )
+
+        for fact in generate_facts(20, seed=7):
+            self.assertEqual(
+                rule_set.run_all(variables_class(fact), SyntheticActions(fact)),
+                engine.run_all(rules, variables_class(fact), SyntheticActions(fact)),
+            )
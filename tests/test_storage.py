@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from mock import patch
+
+from business_rules import compiler, storage
+from business_rules.actions import rule_action
+from business_rules.compiler import compile_rules
+from business_rules.fields import FIELD_TEXT
+from business_rules.storage import load_rule_set, save_rule_set
+from business_rules.variables import numeric_rule_variable
+from tests.test_compiler import (
+    PRODUCTS,
+    RULES,
+    Product,
+    ProductActions,
+    ProductVariables,
+    run_compiled,
+    run_interpreted,
+)
+
+
+class StorageTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, "rules.brrs")
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_save_and_load(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+        save_rule_set(rule_set, self.path)
+
+        with patch.object(storage, "compile_rules") as compile_mock:
+            loaded = load_rule_set(self.path, ProductVariables, ProductActions)
+            self.assertEqual(compile_mock.call_count, 0)
+
+        self.assertEqual(loaded.content_hash, rule_set.content_hash)
+        self.assertIs(loaded.variables_class, ProductVariables)
+        self.assertEqual(loaded.variable_index, rule_set.variable_index)
+        for product_kwargs in PRODUCTS:
+            self.assertEqual(
+                run_compiled(loaded, product_kwargs),
+                run_interpreted(RULES, product_kwargs),
+            )
+
+    def test_load_compiles_again_when_variables_changed(self):
+        save_rule_set(compile_rules(RULES, ProductVariables, ProductActions), self.path)
+
+        class ChangedVariables(ProductVariables):
+            @numeric_rule_variable()
+            def new_variable(self):
+                return 1
+
+        with patch.object(
+            storage, "compile_rules", wraps=compiler.compile_rules
+        ) as compile_mock:
+            loaded = load_rule_set(self.path, ChangedVariables, ProductActions)
+            compile_mock.assert_called_once_with(
+                RULES, ChangedVariables, ProductActions, rule_ids=[0, 1, 2, 3]
+            )
+
+        self.assertIs(loaded.variables_class, ChangedVariables)
+        self.assertEqual(len(loaded), len(RULES))
+
+    def test_load_compiles_again_when_actions_changed(self):
+        save_rule_set(compile_rules(RULES, ProductVariables, ProductActions), self.path)
+
+        class ChangedActions(ProductActions):
+            # Same params, now receiving the rule and the conditions
+            @rule_action(params={"message": FIELD_TEXT})
+            def log(self, message, **kwargs):
+                self.product.calls.append(("log", message, sorted(kwargs)))
+
+        with patch.object(
+            storage, "compile_rules", wraps=compiler.compile_rules
+        ) as compile_mock:
+            loaded = load_rule_set(self.path, ProductVariables, ChangedActions)
+            self.assertEqual(compile_mock.call_count, 1)
+
+        product = Product(price=1)
+        loaded.run_all(ProductVariables(product), ChangedActions(product))
+        self.assertEqual(
+            [call for call in product.calls if call[0] == "log"],
+            [
+                ("log", "holiday", ["conditions", "rule"]),
+                ("log", "always", ["conditions", "rule"]),
+            ],
+        )
+
+    def test_load_compiles_again_when_format_changed(self):
+        save_rule_set(compile_rules(RULES, ProductVariables, ProductActions), self.path)
+
+        with patch.object(storage, "FORMAT_VERSION", storage.FORMAT_VERSION + 1):
+            with patch.object(
+                storage, "compile_rules", wraps=compiler.compile_rules
+            ) as compile_mock:
+                load_rule_set(self.path, ProductVariables, ProductActions)
+                self.assertEqual(compile_mock.call_count, 1)
+
+    def test_rule_ids_kept_when_compiling_again(self):
+        rule_set = compile_rules(RULES, ProductVariables, ProductActions)
+        rule_set.remove_rule(1)
+        rule_set.add_rule(RULES[1], rule_id="holiday")
+        save_rule_set(rule_set, self.path)
+
+        with patch.object(storage, "FORMAT_VERSION", storage.FORMAT_VERSION + 1):
+            loaded = load_rule_set(self.path, ProductVariables, ProductActions)
+
+        self.assertEqual(loaded.rule_ids, [0, 2, 3, "holiday"])
+
+    def test_load_invalid_file(self):
+        with open(self.path, "wb") as f:
+            f.write(b"[1, 2, 3] not a rule set")
+
+        with self.assertRaisesRegex(AssertionError, "not a compiled rule set"):
+            load_rule_set(self.path, ProductVariables, ProductActions)
+
+    def test_load_empty_or_truncated_file(self):
+        save_rule_set(compile_rules(RULES, ProductVariables, ProductActions), self.path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+
+        for content in (b"", data[:20], data[:-10]):
+            with open(self.path, "wb") as f:
+                f.write(content)
+
+            with self.assertRaisesRegex(AssertionError, "not a compiled rule set"):
+                load_rule_set(self.path, ProductVariables, ProductActions)
+
+    def test_load_corrupted_file(self):
+        save_rule_set(compile_rules(RULES, ProductVariables, ProductActions), self.path)
+        with open(self.path, "rb") as f:
+            data = f.read()
+        # Changes the message of a rule in the pickled rules only
+        position = data.rindex(b"holiday")
+        with open(self.path, "wb") as f:
+            f.write(data[:position] + b"holidax" + data[position + 7 :])
+
+        with self.assertRaisesRegex(AssertionError, "is corrupted"):
+            load_rule_set(self.path, ProductVariables, ProductActions)
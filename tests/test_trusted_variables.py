@@ -0,0 +1,111 @@
+from decimal import Decimal
+from unittest import TestCase
+
+from mock import patch
+
+from business_rules import engine
+from business_rules.codegen import CodegenRuleSet
+from business_rules.compiler import compile_rules
+from business_rules.operators import NumericType, StringType
+from business_rules.variables import (
+    BaseVariables,
+    numeric_rule_variable,
+    string_rule_variable,
+)
+
+from .test_compiler import ProductActions
+
+RULES = [
+    {
+        "conditions": {
+            "all": [
+                {"name": "price", "operator": "greater_than", "value": 5},
+                {"name": "month", "operator": "equal_to", "value": "May"},
+            ]
+        },
+        "actions": [{"name": "log", "params": {"message": "may"}}],
+    }
+]
+
+
+class TrustedVariables(BaseVariables):
+    def __init__(self, price=Decimal(10)):
+        self.price_value = price
+
+    @numeric_rule_variable(trusted=True)
+    def price(self):
+        return self.price_value
+
+    @string_rule_variable()
+    def month(self):
+        return "May"
+
+
+class Product(object):
+    def __init__(self):
+        self.calls = []
+
+
+def run_engines(price=Decimal(10)):
+    rule_set = compile_rules(RULES, TrustedVariables, ProductActions)
+    products = [Product() for _ in range(3)]
+    engine.run_all(RULES, TrustedVariables(price), ProductActions(products[0]))
+    rule_set.run_all(TrustedVariables(price), ProductActions(products[1]))
+    CodegenRuleSet(rule_set).run_all(
+        TrustedVariables(price), ProductActions(products[2])
+    )
+    return [product.calls for product in products]
+
+
+def patch_cast(field_type):
+    return patch.object(
+        field_type,
+        "_assert_valid_value_and_cast",
+        autospec=True,
+        side_effect=field_type.__dict__["_assert_valid_value_and_cast"],
+    )
+
+
+class TrustedVariablesTests(TestCase):
+    def test_trusted_variables_are_not_cast(self):
+        with patch_cast(NumericType) as numeric_cast:
+            with patch_cast(StringType) as string_cast:
+                calls = run_engines()
+
+        self.assertEqual(calls, [[("log", "may")]] * 3)
+        # Condition values are cast by compile_rules and the interpreter only
+        self.assertEqual(numeric_cast.call_count, 2)
+        self.assertEqual(string_cast.call_count, 5)
+
+    def test_trust_every_variable(self):
+        with patch_cast(StringType) as string_cast:
+            with engine.trusted_variables():
+                calls = run_engines()
+
+        self.assertEqual(calls, [[("log", "may")]] * 3)
+        self.assertEqual(string_cast.call_count, 2)
+        self.assertFalse(engine._trust_variables)
+
+    def test_sampled_validation(self):
+        with engine.trusted_variables(trusted=False, validate_every=1):
+            self.assertEqual(run_engines(Decimal(6)), [[("log", "may")]] * 3)
+
+            for price in (7, 6.5, "6"):
+                with self.assertRaisesRegex(
+                    AssertionError, "Trusted variable price returned"
+                ):
+                    run_engines(price)
+
+        with patch.object(engine, "_trusted_values", iter(range(1, 10))):
+            with engine.trusted_variables(trusted=False, validate_every=2):
+                # One value every two is validated
+                price = TrustedVariables.price
+                self.assertEqual(engine._variable_type(price, "price", "6").value, "6")
+                with self.assertRaises(AssertionError):
+                    engine._variable_type(price, "price", "6")
+        self.assertIsNone(engine._validate_every)
+
+    def test_invalid_validate_every(self):
+        with self.assertRaises(AssertionError):
+            engine.set_trusted_variables(True, validate_every=0)
+        self.assertFalse(engine._trust_variables)
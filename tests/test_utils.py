@@ -3,6 +3,7 @@ import pytest
 from business_rules import fields
 from business_rules import utils
 from business_rules.fields import FIELD_DATETIME, FIELD_TIME
+from business_rules.variables import BaseVariables, select_rule_variable
 from tests import actions, variables
 from tests.test_integration import SomeVariables, SomeActions
 
@@ -469,3 +470,77 @@ def test_validate_rule_contions_is_not_a_dictionary():
         utils.validate_rule_data(
             variables.TestVariables, actions.TestActions, invalid_rule
         )
+
+
+def test_validate_rule_priority():
+    rule = {"actions": [], "priority": 2.5}
+    assert utils.validate_rule_data(variables.TestVariables, actions.TestActions, rule)
+
+    for priority in ("high", None, True):
+        invalid_rule = {"actions": [], "priority": priority}
+        with pytest.raises(AssertionError):
+            utils.validate_rule_data(
+                variables.TestVariables, actions.TestActions, invalid_rule
+            )
+
+
+class LazyOptionsVariables(BaseVariables):
+    loads = 0
+
+    @classmethod
+    def load_options(cls):
+        cls.loads += 1
+        return ["option_{0}".format(i) for i in range(10)]
+
+    @select_rule_variable(options=lambda: LazyOptionsVariables.load_options())
+    def lazy_select_variable(self):
+        return []
+
+
+def test_export_rule_data_resolves_lazy_options():
+    all_data = utils.export_rule_data(LazyOptionsVariables, actions.TestActions)
+
+    assert all_data["variables"][0]["options"] == [
+        "option_{0}".format(i) for i in range(10)
+    ]
+
+
+def test_exported_options_are_copies():
+    all_data = utils.export_rule_data(LazyOptionsVariables, actions.TestActions)
+    all_data["variables"][0]["options"].append("extra")
+
+    all_data = utils.export_rule_data(LazyOptionsVariables, actions.TestActions)
+    assert "extra" not in all_data["variables"][0]["options"]
+
+
+def test_export_rule_data_with_options_limit():
+    loads = LazyOptionsVariables.loads
+
+    all_data = utils.export_rule_data(
+        LazyOptionsVariables, actions.TestActions, options_limit=0
+    )
+    assert all_data["variables"][0]["options"] == []
+    assert LazyOptionsVariables.loads == loads
+
+    all_data = utils.export_rule_data(
+        LazyOptionsVariables, actions.TestActions, options_limit=3
+    )
+    assert all_data["variables"][0]["options"] == ["option_0", "option_1", "option_2"]
+
+
+def test_export_variable_options():
+    page = utils.export_variable_options(
+        LazyOptionsVariables, "lazy_select_variable", offset=8, limit=5
+    )
+
+    assert page == {
+        "name": "lazy_select_variable",
+        "options": ["option_8", "option_9"],
+        "offset": 8,
+        "total": 10,
+    }
+
+
+def test_export_variable_options_unknown_variable():
+    with pytest.raises(AssertionError):
+        utils.export_variable_options(LazyOptionsVariables, "unknown")
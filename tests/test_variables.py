@@ -1,6 +1,8 @@
 from unittest import TestCase
+from mock import MagicMock, patch
 from business_rules.utils import fn_name_to_pretty_label
 from business_rules.variables import (
+    LazyOptions,
     rule_variable,
     numeric_rule_variable,
     string_rule_variable,
@@ -198,3 +200,41 @@ class RuleVariableTests(TestCase):
         self.assertTrue(getattr(datetime_variable, "is_rule_variable"))
         self.assertEqual(getattr(datetime_variable, "field_type"), TimeType)
         self.assertEqual(getattr(datetime_variable, "label"), "Custom Label")
+
+    def test_select_rule_variable_with_callable_options(self):
+        loader = MagicMock(return_value=["foo", "bar"])
+
+        @select_rule_variable(options=loader)
+        def select_var():
+            pass
+
+        self.assertIsInstance(select_var.options, LazyOptions)
+        self.assertEqual(loader.call_count, 0)
+        self.assertEqual(select_var.options(), ["foo", "bar"])
+        self.assertEqual(select_var.options(), ["foo", "bar"])
+        self.assertEqual(loader.call_count, 1)
+
+
+class LazyOptionsTests(TestCase):
+    def test_options_reloaded_after_ttl(self):
+        loader = MagicMock(return_value=["foo"])
+        options = LazyOptions(loader, ttl=60)
+
+        with patch("business_rules.variables.time.monotonic", return_value=100):
+            options()
+            options()
+        self.assertEqual(loader.call_count, 1)
+
+        with patch("business_rules.variables.time.monotonic", return_value=161):
+            options()
+        self.assertEqual(loader.call_count, 2)
+
+    def test_invalidate(self):
+        loader = MagicMock(return_value=["foo"])
+        options = LazyOptions(loader)
+
+        options()
+        options.invalidate()
+        options()
+
+        self.assertEqual(loader.call_count, 2)